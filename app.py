@@ -4,10 +4,16 @@ import time
 import hashlib
 import logging
 import re
+import io
+import bisect
+import heapq
+import csv
+import json
+import threading
 import requests 
 from datetime import datetime, date, timedelta
 from contextlib import contextmanager
-from functools import wraps
+from functools import wraps, cached_property
 from contextlib import contextmanager
 
 from flask import (
@@ -20,13 +26,24 @@ from flask import (
     send_file,
     g,
     session,
-    flash
+    flash,
+    Response,
+    has_request_context
 )
+from flask.ctx import _AppCtxGlobals
+from flask.signals import before_render_template
 from werkzeug.utils import secure_filename
+from flask_caching import Cache
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from cliente_http import ClienteHTTP, CircuitoAbierto
+from telemetria_pool import QueuePoolMedido, TelemetriaPool
 import unicodedata
 
 from sqlalchemy import (
     create_engine,
+    event,
     Column,
     Integer,
     String,
@@ -35,20 +52,25 @@ from sqlalchemy import (
     Boolean,
     Text,
     Date,
+    DateTime,
     extract,
     func,
     case,
     Index,
+    UniqueConstraint,
     text,
+    select,
     and_,
-    or_
+    or_,
+    TextClause
 )
 from sqlalchemy.orm import (
+    Session,
     sessionmaker,
     declarative_base,
-    relationship
+    relationship,
+    contains_eager
 )
-from sqlalchemy.pool import QueuePool
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 
 # ======================================
@@ -58,6 +80,9 @@ class Config:
     # Flask
     SECRET_KEY = 'dev-secret-key-change-in-production-12345'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+    SESSION_COOKIE_HTTPONLY = True
+    SESSION_COOKIE_SAMESITE = 'Lax'
+    SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', '').lower() in ('1', 'true')  # Con HTTPS
     
     # Database
     DB_HOST = 'localhost'
@@ -66,6 +91,29 @@ class Config:
     DB_USER = 'root'
     DB_PASSWORD = 'Manu3l21'
     
+    # Réplica de lectura opcional (URL de SQLAlchemy: mysql+pymysql://... o sqlite:///...)
+    DB_REPLICA_URL = os.environ.get('DB_REPLICA_URL')
+    REPLICA_LECTURA_PROPIA = 10  # Segundos que se lee del primario tras una escritura
+    CACHE_TIMEOUT_REPLICA = 30   # Respuestas BI calculadas en la réplica: su atraso no queda fijo en cache
+    
+    # Pool de conexiones (primario y réplica MySQL)
+    POOL_TAMANO = int(os.environ.get('POOL_TAMANO', 10))
+    POOL_MAX_OVERFLOW = int(os.environ.get('POOL_MAX_OVERFLOW', 20))
+    POOL_REPLICA_TAMANO = int(os.environ.get('POOL_REPLICA_TAMANO', POOL_TAMANO))
+    POOL_REPLICA_MAX_OVERFLOW = int(os.environ.get('POOL_REPLICA_MAX_OVERFLOW', POOL_MAX_OVERFLOW))
+    POOL_TIMEOUT = 30
+    POOL_RECYCLE = 3600
+    # Dimensionamiento por concurrencia observada: 'off' o 'recomendar'. La
+    # recomendación se aplica en el despliegue (POOL_TAMANO, POOL_MAX_OVERFLOW)
+    POOL_AJUSTE = os.environ.get('POOL_AJUSTE', 'recomendar')
+    POOL_AJUSTE_MUESTRAS = 200          # Checkouts mínimos antes de recomendar
+    # Peticiones simultáneas por proceso del servidor WSGI (hilos o green threads); 0 = sin tope
+    POOL_CONCURRENCIA_SERVIDOR = int(os.environ.get('POOL_CONCURRENCIA_SERVIDOR', 0))
+    # Procesos con pool propio contra la misma BD (workers de todos los servidores)
+    POOL_PROCESOS = int(os.environ.get('POOL_PROCESOS', os.environ.get('WEB_CONCURRENCY', 1)))
+    DB_MAX_CONEXIONES = int(os.environ.get('DB_MAX_CONEXIONES', 0))  # 0 = consultar max_connections
+    POOL_FRACCION_CONEXIONES = 0.8      # Parte de max_connections para los pools de la app
+    
     # Paths
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
@@ -75,6 +123,63 @@ class Config:
     AREA_COMERCIAL_ID = 2  # CAMBIADO: area_id = 2 es comercial (no 5)
     RECLUTADOR_COMERCIAL_IDS = [5]  # reclutador_id = 5 es comercial
     
+    # Cache del dashboard BI (Redis si hay REDIS_URL, si no en memoria del proceso)
+    REDIS_URL = os.environ.get('REDIS_URL')
+    CACHE_TYPE = 'RedisCache' if REDIS_URL else 'SimpleCache'
+    CACHE_REDIS_URL = REDIS_URL
+    CACHE_KEY_PREFIX = 'alta_colaboradores:'
+    CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_TIMEOUT_ANIO_ACTUAL = 300
+    CACHE_TIMEOUT_ANIO_PASADO = 86400  # Cambian poco; al escribir se cambia la generación del año
+    
+    # Snapshot de catálogos del formulario: se recarga al cambiar la versión
+    # compartida o, como máximo, tras estos segundos (cambios de otros procesos
+    # sin Redis o hechos directamente en la BD)
+    CATALOGOS_TTL = 120
+    
+    # Índice en memoria de RFC/CURP/NSS/correo (segundos)
+    INDICE_IDENTIFICADORES_TTL = 300
+    INDICE_IDENTIFICADORES_SYNC = 15
+    
+    # Índice de búsqueda de colaboradores (segundos)
+    INDICE_BUSQUEDA_TTL = 600
+    INDICE_BUSQUEDA_SYNC = 15
+    
+    # Correo institucional
+    DOMINIO_CORREO = 'marnezdesarrollos.com'
+    CORREO_RESERVA_MINUTOS = 30  # Vigencia de un correo apartado durante el alta
+    
+    # Outbox de notificaciones (segundos)
+    NOTIFICACIONES_INTERVALO = 5        # Revisión periódica de pendientes
+    NOTIFICACIONES_MAX_INTENTOS = 6     # Después pasa a 'fallido' (dead-letter)
+    NOTIFICACIONES_BACKOFF_BASE = 30    # 30s, 60s, 120s, ...
+    NOTIFICACIONES_BACKOFF_MAX = 3600
+    
+    # Modo resumen: un solo mensaje con varias altas agrupadas por área
+    NOTIFICACIONES_DIGEST = os.environ.get('NOTIFICACIONES_DIGEST', '').lower() in ('1', 'true')
+    NOTIFICACIONES_DIGEST_VENTANA = 600  # Segundos máximos que espera la alta más antigua
+    NOTIFICACIONES_DIGEST_MAXIMO = 25    # Altas que disparan el envío sin esperar la ventana
+    
+    # Cliente HTTP saliente (webhooks)
+    HTTP_POOL_MAXSIZE = 10
+    WEBHOOK_TIMEOUT = (3.05, 10)        # (conexión, lectura) en segundos
+    CIRCUITO_UMBRAL_FALLOS = 5          # Fallos seguidos para abrir el circuito
+    CIRCUITO_ENFRIAMIENTO = 60          # Segundos sin llamar con el circuito abierto
+    
+    # Login: verificación scrypt fuera del hilo de la petición y límites de intentos
+    LOGIN_HASH_WORKERS = 4              # Verificaciones scrypt simultáneas (~32 MB c/u)
+    LOGIN_HASH_COLA = 32                # Verificaciones en espera antes de responder 503
+    LOGIN_HASH_TIMEOUT = 10             # Segundos máximos esperando la verificación
+    LOGIN_ESPERA_FALLO = 1              # Segundos que la cuenta rechaza intentos tras un fallo
+    LOGIN_LIMITE_IP = "30 per minute"
+    LOGIN_LIMITE_CUENTA = "5 per minute"  # Solo cuentan los intentos fallidos
+    RATELIMIT_STORAGE_URI = REDIS_URL or 'memory://'
+    RATELIMIT_HEADERS_ENABLED = True
+    
+    # Identidad en sesión
+    IDENTIDAD_CACHE_TTL = 60                # Segundos que se reutiliza el registro Usuario/Área
+    AREAS_GESTION_COLABORADORES = [3, 4]    # Áreas con acceso a la gestión de colaboradores
+    
     # Webhook URL para notificaciones (AGREGADO)
     WEBHOOK_URL = "https://default0b7c0ca9d73a42a2b3bb59b55deb67.a0.environment.api.powerplatform.com:443/powerautomate/automations/direct/workflows/646718e542c641c49f4daed2cd26c0b0/triggers/manual/paths/invoke?api-version=1&sp=%2Ftriggers%2Fmanual%2Frun&sv=1.0&sig=Wm3tX5Neq_YsX7XZhR-Y4fR2w__PGZlmhf3UJwsxrEU"
 
@@ -84,6 +189,9 @@ class Config:
 app = Flask(__name__)
 app.config.from_object(Config)
 
+cache = Cache(app)
+limiter = Limiter(get_remote_address, app=app)
+
 # Crear directorios necesarios
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['LOGS_FOLDER'], exist_ok=True)
@@ -109,28 +217,89 @@ DB_URL = f"mysql+pymysql://{app.config['DB_USER']}:{app.config['DB_PASSWORD']}@{
 engine = create_engine(
     DB_URL,
     echo=False,
-    poolclass=QueuePool,
-    pool_size=10,
-    max_overflow=20,
+    poolclass=QueuePoolMedido,
+    pool_size=app.config['POOL_TAMANO'],
+    max_overflow=app.config['POOL_MAX_OVERFLOW'],
     pool_pre_ping=True,
-    pool_recycle=3600,
-    pool_timeout=30,
+    pool_recycle=app.config['POOL_RECYCLE'],
+    pool_timeout=app.config['POOL_TIMEOUT'],
     connect_args={'connect_timeout': 10, 'charset': 'utf8mb4'}
 )
 
+# Telemetría por pool: espera de checkout, en uso/libres, timeouts, reciclajes, pre-ping
+telemetrias_pool = {
+    "primario": TelemetriaPool("primario", recycle=app.config['POOL_RECYCLE']).instrumentar(engine)
+}
+
+def crear_engine_replica(url):
+    """Engine de la réplica de lectura; None si no está configurada."""
+    if not url:
+        return None
+    if url.startswith("sqlite"):
+        return create_engine(url, echo=False)
+    return create_engine(
+        url,
+        echo=False,
+        poolclass=QueuePoolMedido,
+        pool_size=app.config['POOL_REPLICA_TAMANO'],
+        max_overflow=app.config['POOL_REPLICA_MAX_OVERFLOW'],
+        pool_pre_ping=True,
+        pool_recycle=app.config['POOL_RECYCLE'],
+        pool_timeout=app.config['POOL_TIMEOUT'],
+        connect_args={'connect_timeout': 10, 'charset': 'utf8mb4'}
+    )
+
+engine_replica = crear_engine_replica(app.config['DB_REPLICA_URL'])
+if engine_replica is not None:
+    telemetrias_pool["replica"] = TelemetriaPool(
+        "replica", recycle=app.config['POOL_RECYCLE']
+    ).instrumentar(engine_replica)
+
+def es_lectura(clause):
+    """True si la sentencia es un SELECT sin bloqueo (FOR UPDATE va al primario)."""
+    if clause is None:
+        return False
+    if getattr(clause, "is_select", False):
+        return getattr(clause, "_for_update_arg", None) is None
+    if isinstance(clause, TextClause):
+        return str(clause).lstrip().upper().startswith("SELECT")
+    return False
+
+class SesionEnrutada(Session):
+    """
+    Session que manda las lecturas a la réplica si se marcó con info["replica"].
+    El flush, las escrituras y cualquier lectura posterior a una escritura
+    en la misma sesión van al primario.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            engine_replica is not None
+            and self.info.get("replica")
+            and not self.info.get("escrituras_pendientes")
+            and es_lectura(clause)
+        ):
+            return engine_replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
 SessionLocal = sessionmaker(
+    class_=SesionEnrutada,
     autocommit=False,
     autoflush=False,
     bind=engine
 )
 
 @contextmanager
-def get_db():
+def get_db(replica=False):
     """Context manager for database sessions."""
     db = SessionLocal()
+    if replica:
+        db.info["replica"] = True
     try:
         yield db
-        db.commit()
+        # Solo lecturas: sin COMMIT; close() devuelve la conexión al pool
+        if tiene_escrituras(db):
+            db.commit()
     except Exception as e:
         db.rollback()
         logger.error(f"Database error: {e}", exc_info=True)
@@ -138,6 +307,120 @@ def get_db():
     finally:
         db.close()
 
+# ======================================
+# SESIÓN PEREZOSA Y DETECCIÓN DE ESCRITURAS
+# ======================================
+def tiene_escrituras(db):
+    """True si la sesión tiene cambios pendientes o ejecutó escrituras sin confirmar."""
+    return bool(db.new or db.dirty or db.deleted or db.info.get("escrituras_pendientes"))
+
+@event.listens_for(SessionLocal, "before_flush")
+def _marcar_escrituras_flush(db, flush_context, instancias):
+    # Antes del flush: sus lecturas internas (defaults, relaciones) van al primario
+    db.info["escrituras_pendientes"] = True
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _marcar_escrituras_execute(estado):
+    # INSERT/UPDATE/DELETE ejecutados directamente (upserts, bulk update, text())
+    if estado.is_select:
+        return
+    if estado.is_insert or estado.is_update or estado.is_delete \
+            or not str(estado.statement).lstrip().upper().startswith("SELECT"):
+        estado.session.info["escrituras_pendientes"] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _confirmar_escrituras(db):
+    # after_commit también se dispara al liberar un SAVEPOINT: solo cuenta
+    # cuando terminó la transacción externa (que aún figura activa en el evento)
+    if not db.in_nested_transaction() and db.info.pop("escrituras_pendientes", None):
+        registrar_escritura_propia()
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _limpiar_escrituras(db):
+    if not db.in_nested_transaction():
+        db.info.pop("escrituras_pendientes", None)
+
+class SesionPerezosa:
+    """
+    Proxy de sesión para g.db. La sesión (y la conexión del pool) se abre en el
+    primer uso; al liberar solo hace COMMIT si hubo escrituras.
+    """
+    
+    def __init__(self):
+        self._sesion = None
+    
+    def _obtener(self):
+        if self._sesion is None:
+            self._sesion = SessionLocal()
+            if g.get('leer_replica') and leer_de_replica():
+                self._sesion.info["replica"] = True
+                g.leido_de_replica = True
+        return self._sesion
+    
+    def __getattr__(self, nombre):
+        return getattr(self._obtener(), nombre)
+    
+    @property
+    def en_uso(self):
+        return self._sesion is not None
+    
+    def liberar(self):
+        """Confirma si hubo escrituras y devuelve la conexión. Un uso posterior abre otra sesión."""
+        sesion, self._sesion = self._sesion, None
+        if sesion is None:
+            return
+        try:
+            if tiene_escrituras(sesion):
+                # Los objetos conservan sus datos para el template tras cerrar
+                sesion.expire_on_commit = False
+                sesion.commit()
+        except Exception:
+            sesion.rollback()
+            raise
+        finally:
+            sesion.close()
+    
+    def descartar(self):
+        sesion, self._sesion = self._sesion, None
+        if sesion is not None:
+            try:
+                sesion.rollback()
+            finally:
+                sesion.close()
+
+# ======================================
+# RÉPLICA DE LECTURA
+# ======================================
+# Las vistas marcadas con @lectura_replica consultan la réplica. Tras una
+# escritura propia el usuario lee del primario durante REPLICA_LECTURA_PROPIA
+# segundos (read-your-writes), aunque cambie de worker: la marca va en la sesión.
+CLAVE_ULTIMA_ESCRITURA_BI = "replica:ultima_escritura_bi"
+
+def registrar_escritura_propia():
+    """Fija la lectura desde el primario para el usuario de la petición actual."""
+    if engine_replica is not None and has_request_context():
+        session['primario_hasta'] = time.time() + app.config['REPLICA_LECTURA_PROPIA']
+
+def leer_de_replica():
+    """True si la petición actual puede leer de la réplica sin perder escrituras recientes."""
+    if engine_replica is None:
+        return False
+    ahora = time.time()
+    if session.get('primario_hasta', 0) > ahora:
+        return False
+    # Tras invalidar la cache BI, otra petición no debe rellenarla con datos
+    # de una réplica que todavía no recibe el cambio
+    ultima = cache.get(CLAVE_ULTIMA_ESCRITURA_BI)
+    return not ultima or ahora - ultima > app.config['REPLICA_LECTURA_PROPIA']
+
+def lectura_replica(f):
+    """Marca la vista como de solo lectura: sus consultas pueden ir a la réplica."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.leer_replica = True
+        return f(*args, **kwargs)
+    return decorated_function
+
 Base = declarative_base()
 
 # ======================================
@@ -196,6 +479,7 @@ class Reclutador(Base):
     __tablename__ = "reclutadores"
     id = Column(Integer, primary_key=True)
     nombre = Column(String(150), unique=True, nullable=False)
+    nombre_normalizado = Column(String(150))  # Sin acentos y en minúsculas, para búsquedas
     colaboradores = relationship("Colaborador", back_populates="reclutador_rel")
 
 class Banco(Base):
@@ -215,6 +499,7 @@ class Colaborador(Base):
     # DATOS PERSONALES
     nombre = Column(String(100), nullable=False)
     apellido = Column(String(100), nullable=False)
+    nombre_normalizado = Column(String(201))  # "nombre apellido" sin acentos y en minúsculas
     correo = Column(String(150), unique=True, nullable=False)
     correo_coordinador = Column(String(150))
     edad = Column(Integer)
@@ -227,6 +512,7 @@ class Colaborador(Base):
     curp = Column(String(18), unique=True, nullable=False)
     nss = Column(String(15), unique=True, nullable=False)
     fecha_alta = Column(Date, nullable=False)
+    fecha_actualizacion = Column(DateTime, default=datetime.now, onupdate=datetime.now)  # Sincroniza índices en memoria
     
     # LABORALES
     sueldo = Column(Integer)
@@ -325,6 +611,50 @@ class Documento(Base):
     tamano = Column(Integer)
     fecha_subida = Column(Date, default=datetime.now)
     colaborador = relationship("Colaborador", back_populates="documentos")
+
+class ResumenMensual(Base):
+    """Hechos pre-agregados por mes para el dashboard (mantenidos incrementalmente)."""
+    __tablename__ = "resumen_mensual"
+    id = Column(Integer, primary_key=True)
+    anio = Column(Integer, nullable=False)
+    mes = Column(Integer, nullable=False)
+    area_id = Column(Integer, nullable=False)
+    reclutador_id = Column(Integer, nullable=False, default=0)  # 0 = sin reclutador
+    baja = Column(Boolean, nullable=False, default=False)
+    
+    # altas: colaboradores con fecha_alta en el mes (en ese estado de baja)
+    # bajas: colaboradores con fecha_baja en el mes (solo filas con baja = True)
+    altas = Column(Integer, nullable=False, default=0)
+    bajas = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint('anio', 'mes', 'area_id', 'reclutador_id', 'baja', name='uq_resumen_mensual_clave'),
+    )
+
+class NotificacionOutbox(Base):
+    """Notificación por enviar, escrita en la misma transacción que el alta."""
+    __tablename__ = "notificaciones_outbox"
+    id = Column(Integer, primary_key=True)
+    tipo = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON que se envía al webhook
+    estado = Column(String(20), nullable=False, default="pendiente")  # pendiente | enviado | fallido
+    intentos = Column(Integer, nullable=False, default=0)
+    proximo_intento = Column(DateTime, nullable=False, default=datetime.now)
+    ultimo_error = Column(Text)
+    creado_en = Column(DateTime, default=datetime.now)
+    enviado_en = Column(DateTime)
+    
+    __table_args__ = (
+        Index('idx_outbox_estado_proximo', 'estado', 'proximo_intento'),
+    )
+
+class ReservaCorreo(Base):
+    """Correo institucional apartado mientras se captura un alta (evita carreras)."""
+    __tablename__ = "reservas_correo"
+    id = Column(Integer, primary_key=True)
+    correo = Column(String(150), unique=True, nullable=False)
+    expira_en = Column(DateTime, nullable=False, index=True)
+    creado_en = Column(DateTime, default=datetime.now)
 # ======================================
 # MODELOS DE USUARIO/AUTENTICACIÓN
 # ======================================
@@ -468,11 +798,105 @@ def crear_usuarios_con_hash_correcto():
 # ======================================
 from werkzeug.security import check_password_hash, generate_password_hash  # <-- AGREGAR ESTO
 
+# Identidad compacta guardada en la sesión firmada al hacer login. Si cambia
+# su formato se sube la versión y las sesiones anteriores se descartan.
+VERSION_IDENTIDAD = 1
+
+PERMISOS = {
+    'admin': 1 << 0,
+    'colaboradores': 1 << 1
+}
+
+class Identidad:
+    """Usuario de la petición (g.usuario). Los templates leen sus atributos."""
+    __slots__ = ('id', 'correo', 'area_id', 'rol', 'permisos')
+    
+    def __init__(self, id=None, correo=None, area_id=None, rol=None, permisos=0):
+        self.id = id
+        self.correo = correo
+        self.area_id = area_id
+        self.rol = rol
+        self.permisos = permisos
+    
+    @property
+    def autenticado(self):
+        return self.id is not None
+    
+    def tiene_permiso(self, permiso):
+        return bool(self.permisos & PERMISOS[permiso])
+    
+    def a_sesion(self):
+        return {"v": VERSION_IDENTIDAD, "id": self.id, "c": self.correo,
+                "a": self.area_id, "r": self.rol, "p": self.permisos}
+    
+    @classmethod
+    def desde_sesion(cls, datos):
+        if not isinstance(datos, dict) or datos.get("v") != VERSION_IDENTIDAD:
+            return None
+        return cls(datos["id"], datos["c"], datos["a"], datos["r"], datos["p"])
+    
+    @classmethod
+    def desde_usuario(cls, usuario):
+        permisos = 0
+        if usuario.rol == 'admin':
+            permisos |= PERMISOS['admin']
+        if usuario.area_id in app.config['AREAS_GESTION_COLABORADORES']:
+            permisos |= PERMISOS['colaboradores']
+        return cls(usuario.id, usuario.correo, usuario.area_id, usuario.rol, permisos)
+
+ANONIMO = Identidad()
+
+class GlobalesApp(_AppCtxGlobals):
+    """g con g.usuario perezoso: solo se lee la sesión si alguien lo usa."""
+    
+    @cached_property
+    def usuario(self):
+        return Identidad.desde_sesion(session.get('identidad')) or ANONIMO
+
+app.app_ctx_globals_class = GlobalesApp
+
+# Cache en proceso de los usuarios con sesión: id -> (expira, (activo, area_id, rol))
+_cache_usuarios = {}
+
+def registro_usuario(usuario_id):
+    """Estado vigente del usuario; consulta la BD a lo más una vez por IDENTIDAD_CACHE_TTL."""
+    ahora = time.monotonic()
+    en_cache = _cache_usuarios.get(usuario_id)
+    if en_cache and en_cache[0] > ahora:
+        return en_cache[1]
+    
+    with get_db() as db:
+        fila = db.query(Usuario.activo, Usuario.area_id, Usuario.rol)\
+            .join(Area, Usuario.area_id == Area.id)\
+            .filter(Usuario.id == usuario_id)\
+            .first()
+    
+    registro = (bool(fila.activo), fila.area_id, fila.rol) if fila else None
+    _cache_usuarios[usuario_id] = (ahora + app.config['IDENTIDAD_CACHE_TTL'], registro)
+    return registro
+
+def sesion_vigente():
+    """
+    True si hay sesión y el usuario sigue activo con la misma área y rol.
+    Si cambió, la sesión se cierra para que vuelva a iniciar sesión.
+    """
+    identidad = g.usuario
+    if not identidad.autenticado:
+        return False
+    
+    registro = registro_usuario(identidad.id)
+    if registro != (True, identidad.area_id, identidad.rol):
+        logger.warning(f"Sesión invalidada para usuario {identidad.id}: cuenta modificada o inactiva")
+        session.clear()
+        g.usuario = ANONIMO
+        return False
+    return True
+
 def login_required(f):
     """Decorador para requerir inicio de sesión."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'usuario_id' not in session:
+        if not sesion_vigente():
             flash("Debes iniciar sesión para acceder a esta página", "warning")
             return redirect(url_for('login'))
         return f(*args, **kwargs)
@@ -484,12 +908,12 @@ def area_required(area_ids):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             # Primero verificar login
-            if 'usuario_id' not in session:
+            if not sesion_vigente():
                 flash("Debes iniciar sesión para acceder a esta página", "warning")
                 return redirect(url_for('login'))
             
             # Luego verificar área
-            if session.get('usuario_area_id') not in area_ids:
+            if g.usuario.area_id not in area_ids:
                 flash("No tienes permisos para acceder a esta página", "error")
                 return redirect(url_for('dashboard'))
             
@@ -562,45 +986,294 @@ def crear_usuarios_con_hash_correcto():
 # DECORADORES
 # ======================================
 def require_db(f):
+    """Expone g.db como sesión perezosa: sin conexión hasta la primera consulta."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        with get_db() as db:
-            g.db = db
-            return f(*args, **kwargs)
+        db = SesionPerezosa()
+        g.db = db
+        try:
+            respuesta = f(*args, **kwargs)
+            db.liberar()
+            return respuesta
+        except Exception as e:
+            db.descartar()
+            logger.error(f"Database error: {e}", exc_info=True)
+            raise
     return decorated_function
 
+@before_render_template.connect_via(app)
+def _liberar_db_antes_de_renderizar(sender, template, context, **extra):
+    # La conexión vuelve al pool antes de renderizar, no al terminar la petición
+    db = g.get('db')
+    if isinstance(db, SesionPerezosa):
+        db.liberar()
+
+# ======================================
+# CACHE DEL DASHBOARD BI
+# ======================================
+# Endpoints cacheados por (endpoint, año, generación, mes). Invalidar un año es
+# cambiar su generación: una petición que calculó con datos previos al commit
+# guarda su resultado bajo la generación vieja, que ya nadie consulta.
+def clave_generacion_bi(year):
+    return f"bi:generacion:{year}"
+
+def generacion_bi(year):
+    """Generación vigente de los datos BI de un año."""
+    clave = clave_generacion_bi(year)
+    generacion = cache.get(clave)
+    if generacion is None:
+        # Si se perdió (reinicio, desalojo) se crea otra nueva: nunca reaparece una vieja
+        cache.add(clave, time.time_ns(), timeout=0)
+        generacion = cache.get(clave)
+    return generacion
+
+def clave_cache_bi(endpoint, year, month=None):
+    """Clave de cache para un endpoint BI y periodo en la generación vigente del año."""
+    return f"bi:{endpoint}:{year}:{generacion_bi(year)}:{month or 'todos'}"
+
+def timeout_cache_bi(year):
+    """
+    Los años pasados cambian poco (bajas y ediciones): expiran en un día. Lo
+    calculado en la réplica dura poco: pudo leerse antes de que llegara una
+    escritura que ya cambió la generación.
+    """
+    if g.get('leido_de_replica'):
+        return app.config['CACHE_TIMEOUT_REPLICA']
+    if year < date.today().year:
+        return app.config['CACHE_TIMEOUT_ANIO_PASADO']
+    return app.config['CACHE_TIMEOUT_ANIO_ACTUAL']
+
+def cache_bi(endpoint):
+    """Decorador que cachea la respuesta JSON de un endpoint BI por año/mes."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            year = request.args.get("year", type=int, default=date.today().year)
+            month = request.args.get("month", type=int)
+            clave = clave_cache_bi(endpoint, year, month)
+            
+            datos = cache.get(clave)
+            if datos is not None:
+                return app.response_class(datos, mimetype="application/json")
+            
+            respuesta = app.make_response(f(*args, **kwargs))
+            
+            # Solo se cachean respuestas exitosas
+            if respuesta.status_code == 200 and respuesta.is_json:
+                cache.set(clave, respuesta.get_data(), timeout=timeout_cache_bi(year))
+            
+            return respuesta
+        return decorated_function
+    return decorator
+
+def invalidar_cache_bi(anios):
+    """Cambia la generación de los años indicados; sus entradas viejas expiran solas."""
+    if anios:
+        cache.set_many({clave_generacion_bi(anio): time.time_ns() for anio in anios}, timeout=0)
+        logger.info(f"Cache BI invalidada para años: {sorted(anios)}")
+
+def marcar_anios_modificados(db, anios):
+    """Registra en la sesión los años a invalidar cuando la transacción haga commit."""
+    db.info.setdefault("anios_bi_modificados", set()).update(anios)
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidar_cache_tras_commit(db):
+    anios = db.info.pop("anios_bi_modificados", None)
+    if anios:
+        invalidar_cache_bi(anios)
+        if engine_replica is not None:
+            cache.set(CLAVE_ULTIMA_ESCRITURA_BI, time.time(), timeout=app.config['REPLICA_LECTURA_PROPIA'] * 2)
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_anios_tras_rollback(db):
+    db.info.pop("anios_bi_modificados", None)
+
+# ======================================
+# SNAPSHOT DE CATÁLOGOS DEL FORMULARIO
+# ======================================
+CATALOGOS_FORMULARIO = (Area, Puesto, RecursoTI, Programa, Banco, Reclutador, MetodoPago)
+CLAVE_VERSION_CATALOGOS = "catalogos:version"
+
+# Copia por proceso; se recarga cuando cambia la versión compartida o vence CATALOGOS_TTL
+_snapshot_catalogos = {"version": None, "datos": None, "cargado_en": 0}
+_snapshot_catalogos_lock = threading.Lock()
+
+def version_catalogos():
+    """Versión vigente de los catálogos (compartida entre procesos solo si el cache es Redis)."""
+    version = cache.get(CLAVE_VERSION_CATALOGOS)
+    if version is None:
+        # Cache reiniciado o expulsado: nueva versión para forzar la recarga
+        cache.add(CLAVE_VERSION_CATALOGOS, time.time_ns(), timeout=0)
+        version = cache.get(CLAVE_VERSION_CATALOGOS)
+    return version
+
+def invalidar_catalogos():
+    cache.set(CLAVE_VERSION_CATALOGOS, time.time_ns(), timeout=0)
+    logger.info("Catálogos del formulario invalidados")
+
+def _filas_catalogo(db, modelo):
+    return [
+        {"id": fila.id, "nombre": fila.nombre}
+        for fila in db.query(modelo.id, modelo.nombre).order_by(modelo.nombre)
+    ]
+
+def cargar_catalogos(db):
+    """Carga todos los catálogos del formulario con una consulta por tabla."""
+    areas = _filas_catalogo(db, Area)
+    
+    # Puestos de todas las áreas en una sola consulta, agrupados en memoria
+    puestos_por_area = {area["id"]: [] for area in areas}
+    puestos = db.query(Puesto.id, Puesto.nombre, Puesto.area_id).order_by(Puesto.nombre)
+    for puesto in puestos:
+        puestos_por_area.setdefault(puesto.area_id, []).append(
+            {"id": puesto.id, "nombre": puesto.nombre}
+        )
+    
+    return {
+        'areas': areas,
+        'recursos': _filas_catalogo(db, RecursoTI),
+        'programas': _filas_catalogo(db, Programa),
+        'bancos': _filas_catalogo(db, Banco),
+        'reclutadores': _filas_catalogo(db, Reclutador),
+        'metodos_pago': _filas_catalogo(db, MetodoPago),
+        'puestos_por_area': puestos_por_area
+    }
+
+def _snapshot_vigente(version):
+    snapshot = _snapshot_catalogos
+    return (
+        snapshot["datos"] is not None
+        and snapshot["version"] == version
+        and time.monotonic() - snapshot["cargado_en"] <= app.config['CATALOGOS_TTL']
+    )
+
+def obtener_catalogos(db):
+    """Snapshot de catálogos; solo consulta la BD si la versión cambió o venció el TTL."""
+    version = version_catalogos()
+    if _snapshot_vigente(version):
+        return _snapshot_catalogos["datos"]
+    
+    with _snapshot_catalogos_lock:
+        if not _snapshot_vigente(version):
+            _snapshot_catalogos["datos"] = cargar_catalogos(db)
+            _snapshot_catalogos["version"] = version
+            _snapshot_catalogos["cargado_en"] = time.monotonic()
+            logger.info(f"Snapshot de catálogos cargado (versión {version})")
+        return _snapshot_catalogos["datos"]
+
+@event.listens_for(SessionLocal, "before_flush")
+def _detectar_cambio_catalogos(db, flush_context, instances):
+    cambios = db.new | db.dirty | db.deleted
+    if any(isinstance(obj, CATALOGOS_FORMULARIO) for obj in cambios):
+        db.info["catalogos_modificados"] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidar_catalogos_tras_commit(db):
+    if db.info.pop("catalogos_modificados", None):
+        invalidar_catalogos()
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_catalogos_tras_rollback(db):
+    db.info.pop("catalogos_modificados", None)
+
 # ======================================
 # MIDDLEWARE PARA VERIFICAR SESIÓN EN TODAS LAS RUTAS
 # ======================================
+# Rutas públicas que no requieren autenticación
+ENDPOINTS_PUBLICOS = frozenset(['login', 'static', 'alta', 'dashboard', 'cambio_area_colaborador'])
+
 @app.before_request
 def before_request():
-    """Verificar sesión antes de cada petición."""
-    # Rutas públicas que no requieren autenticación
-    public_routes = ['login', 'static', 'alta', 'dashboard', 'cambio_area_colaborador']
-    
-    if request.endpoint not in public_routes and 'usuario_id' not in session:
-        # Si no está autenticado y no es una ruta pública
-        if request.endpoint and 'colaboradores' in request.endpoint:
-            return jsonify({"error": "Requiere autenticación"}), 401
-    
-    # Pasar información del usuario a todas las templates
-    g.usuario = {
-        'id': session.get('usuario_id'),
-        'correo': session.get('usuario_correo'),
-        'area_id': session.get('usuario_area_id'),
-        'rol': session.get('usuario_rol'),
-        'autenticado': 'usuario_id' in session
-    }
+    """Verificar sesión antes de cada petición (g.usuario se resuelve bajo demanda)."""
+    if request.endpoint in ENDPOINTS_PUBLICOS or not request.endpoint:
+        return
+    
+    # Si no está autenticado y no es una ruta pública
+    if 'colaboradores' in request.endpoint and not g.usuario.autenticado:
+        return jsonify({"error": "Requiere autenticación"}), 401
+
+
+# ======================================
+# VERIFICACIÓN DE CONTRASEÑAS Y LÍMITES DE LOGIN
+# ======================================
+# scrypt (n=32768) usa ~32 MB y decenas de ms de CPU por intento: se verifica
+# en un pool acotado para que una ráfaga de logins no acapare los hilos.
+pool_verificacion = ThreadPoolExecutor(
+    max_workers=app.config['LOGIN_HASH_WORKERS'],
+    thread_name_prefix="verificacion-password"
+)
+_cupo_verificacion = threading.BoundedSemaphore(
+    app.config['LOGIN_HASH_WORKERS'] + app.config['LOGIN_HASH_COLA']
+)
+
+class ServidorOcupado(Exception):
+    """No hay cupo en el pool de verificación de contraseñas."""
+
+def eventlet_activo():
+    """True si el proceso corre con eventlet (servidor.py): los hilos son green threads."""
+    eventlet = sys.modules.get('eventlet')
+    return eventlet is not None and eventlet.patcher.is_monkey_patched('thread')
+
+def verificar_password_en_pool(password_hash, password):
+    """Ejecuta check_password_hash en el pool. Lanza ServidorOcupado si está saturado."""
+    if not _cupo_verificacion.acquire(blocking=False):
+        raise ServidorOcupado()
+    try:
+        if eventlet_activo():
+            # Un green thread no suelta la CPU durante scrypt: se corre en un hilo real
+            from eventlet import tpool
+            futuro = pool_verificacion.submit(tpool.execute, check_password_hash, password_hash, password)
+        else:
+            futuro = pool_verificacion.submit(check_password_hash, password_hash, password)
+    except Exception:
+        _cupo_verificacion.release()
+        raise
+    futuro.add_done_callback(lambda _: _cupo_verificacion.release())
+    try:
+        return futuro.result(timeout=app.config['LOGIN_HASH_TIMEOUT'])
+    except FuturesTimeoutError:
+        raise ServidorOcupado()
+
+def clave_cuenta_login():
+    """Clave de Flask-Limiter por cuenta (correo del formulario)."""
+    return "login:" + request.form.get('correo', '').strip().lower()
+
+def login_fallido(response):
+    # Solo descuentan del límite por cuenta los intentos que no iniciaron sesión
+    return response.status_code != 302
 
+def espera_login_restante(correo):
+    """Segundos que faltan para aceptar otro intento de la cuenta (0 = sin espera)."""
+    hasta = cache.get(f"login:espera:{correo}")
+    return max(0, hasta - time.time()) if hasta else 0
+
+def registrar_fallo_login(correo):
+    """En lugar de dormir el hilo, la cuenta rechaza intentos durante LOGIN_ESPERA_FALLO."""
+    espera = app.config['LOGIN_ESPERA_FALLO']
+    cache.set(f"login:espera:{correo}", time.time() + espera, timeout=int(espera) + 1)
+
+@app.errorhandler(429)
+def demasiados_intentos(e):
+    if request.endpoint == 'login':
+        flash("Demasiados intentos de inicio de sesión. Espera un momento e intenta de nuevo.", "warning")
+        return render_template("login.html"), 429
+    return jsonify({"error": "Demasiadas solicitudes"}), 429
 
 # ======================================
 # RUTAS DE AUTENTICACIÓN
 # ======================================
 @app.route("/login", methods=["GET", "POST"])
+@limiter.limit(lambda: app.config['LOGIN_LIMITE_IP'], methods=["POST"])
+@limiter.limit(
+    lambda: app.config['LOGIN_LIMITE_CUENTA'],
+    key_func=clave_cuenta_login,
+    methods=["POST"],
+    deduct_when=login_fallido
+)
 @require_db
 def login():
     """Página de inicio de sesión - CORREGIDA."""
-    if 'usuario_id' in session:
+    if g.usuario.autenticado:
         flash("Ya tienes una sesión activa", "info")
         return redirect(url_for('dashboard'))
     
@@ -610,6 +1283,11 @@ def login():
         
         logger.info(f"Intento de login para: {correo}")
         
+        if espera_login_restante(correo):
+            logger.warning(f"Intento de login durante la espera tras un fallo: {correo}")
+            flash("Credenciales incorrectas. Espera un momento antes de intentar de nuevo.", "danger")
+            return render_template("login.html"), 429
+        
         try:
             db = g.db
             
@@ -621,7 +1299,7 @@ def login():
             if not usuario:
                 logger.warning(f"Usuario no encontrado: {correo}")
                 flash("Credenciales incorrectas", "danger")
-                time.sleep(1)
+                registrar_fallo_login(correo)
                 return render_template("login.html")
             
             if not usuario.activo:
@@ -629,16 +1307,23 @@ def login():
                 flash("Tu cuenta está desactivada. Contacta al administrador.", "warning")
                 return render_template("login.html")
             
-            # Verificar contraseña
-            if not check_password_hash(usuario.password_hash, password):
+            # Verificar contraseña (en el pool acotado)
+            try:
+                password_valido = verificar_password_en_pool(usuario.password_hash, password)
+            except ServidorOcupado:
+                logger.warning(f"Pool de verificación saturado, login rechazado: {correo}")
+                flash("El servidor está ocupado. Intenta de nuevo en unos segundos.", "warning")
+                return render_template("login.html"), 503
+            
+            if not password_valido:
                 logger.warning(f"Contraseña incorrecta para: {correo}")
                 flash("Credenciales incorrectas", "danger")
-                time.sleep(1)
+                registrar_fallo_login(correo)
                 return render_template("login.html")
             
-            # Verificar que el área exista
-            area = db.query(Area).filter_by(id=usuario.area_id).first()
-            if not area:
+            # Verificar que el área exista (snapshot de catálogos, sin consulta)
+            areas = {area["id"] for area in obtener_catalogos(db)["areas"]}
+            if usuario.area_id not in areas:
                 logger.error(f"Área ID {usuario.area_id} no encontrada para usuario {usuario.id}")
                 flash("Error de configuración del usuario. Contacta al administrador.", "error")
                 return render_template("login.html")
@@ -647,12 +1332,14 @@ def login():
             usuario.ultimo_acceso = date.today()
             db.commit()
             
-            # Crear sesión
-            session['usuario_id'] = usuario.id
-            session['usuario_correo'] = usuario.correo
-            session['usuario_area_id'] = usuario.area_id
-            session['usuario_rol'] = usuario.rol
+            # Crear sesión con la identidad compacta
+            session.clear()
+            session['identidad'] = Identidad.desde_usuario(usuario).a_sesion()
             session.permanent = True
+            _cache_usuarios[usuario.id] = (
+                time.monotonic() + app.config['IDENTIDAD_CACHE_TTL'],
+                (True, usuario.area_id, usuario.rol)
+            )
             
             logger.info(f"Login exitoso: {usuario.correo} (Área: {usuario.area_id}, Rol: {usuario.rol})")
             
@@ -683,7 +1370,7 @@ def logout():
 def admin_usuarios():
     """Página de administración de usuarios (solo admin)."""
     # Verificar si es admin
-    if session.get('usuario_rol') != 'admin':
+    if not g.usuario.tiene_permiso('admin'):
         flash("No tienes permisos para acceder a esta página", "error")
         return redirect(url_for('dashboard'))
     
@@ -691,7 +1378,11 @@ def admin_usuarios():
         db = g.db
         
         # Obtener todos los usuarios
-        usuarios = db.query(Usuario).join(Area).order_by(Usuario.id.desc()).all()
+        usuarios = db.query(Usuario)\
+            .join(Area)\
+            .options(contains_eager(Usuario.area))\
+            .order_by(Usuario.id.desc())\
+            .all()
         
         # Obtener todas las áreas para el formulario
         areas = db.query(Area).order_by(Area.nombre).all()
@@ -715,7 +1406,7 @@ def api_crear_usuario():
     """API para crear un nuevo usuario - CORREGIDA."""
     try:
         # Verificar si es admin
-        if session.get('usuario_rol') != 'admin':
+        if not g.usuario.tiene_permiso('admin'):
             return jsonify({"error": "No autorizado"}), 403
         
         data = request.get_json()
@@ -840,26 +1531,9 @@ def alta():
     try:
         db = g.db
         
-        areas = db.query(Area).order_by(Area.nombre).all()
-        recursos = db.query(RecursoTI).order_by(RecursoTI.nombre).all()
-        programas = db.query(Programa).order_by(Programa.nombre).all()
-        bancos = db.query(Banco).order_by(Banco.nombre).all()
-        reclutadores = db.query(Reclutador).order_by(Reclutador.nombre).all()
-        metodos_pago = db.query(MetodoPago).order_by(MetodoPago.nombre).all()
-        
-        puestos_por_area = {}
-        for area in areas:
-            puestos = db.query(Puesto).filter_by(area_id=area.id).order_by(Puesto.nombre).all()
-            puestos_por_area[area.id] = [{"id": p.id, "nombre": p.nombre} for p in puestos]
-        
+        # Catálogos desde el snapshot en memoria (sin consultas si no cambiaron)
         form_data = {
-            'areas': areas,
-            'recursos': recursos,
-            'programas': programas,
-            'bancos': bancos,
-            'reclutadores': reclutadores,
-            'metodos_pago': metodos_pago,
-            'puestos_por_area': puestos_por_area,
+            **obtener_catalogos(db),
             'today': date.today().isoformat(),
             'AREA_COMERCIAL_ID': app.config['AREA_COMERCIAL_ID'],
             'RECLUTADOR_COMERCIAL_IDS': app.config['RECLUTADOR_COMERCIAL_IDS']
@@ -875,57 +1549,291 @@ def alta():
         flash(f"Error al cargar el formulario: {str(e)}", "error")
         return render_template("alta_colaborador.html", today=date.today().isoformat())
 
-def handle_alta_post(db):
-    """Maneja el POST del formulario de alta CON VALIDACIÓN RFC."""
-    try:
-        # NUEVA VALIDACIÓN: Verificar RFC antes de procesar
-        rfc = request.form.get("rfc", "").upper().strip()
-        curp = request.form.get("curp", "").upper().strip()
-        nss = request.form.get("nss", "").strip()
-        correo = request.form.get("correo", "").strip()
+# ======================================
+# VERIFICACIÓN DE DUPLICADOS (RFC/CURP/NSS/CORREO)
+# ======================================
+# Campo del formulario -> (columna, etiqueta para mensajes)
+CAMPOS_UNICOS = {
+    'rfc': (Colaborador.rfc, 'RFC'),
+    'curp': (Colaborador.curp, 'CURP'),
+    'nss': (Colaborador.nss, 'NSS'),
+    'correo': (Colaborador.correo, 'Correo')
+}
+
+def normalizar_claves_unicas(datos):
+    """Normaliza RFC/CURP (mayúsculas), NSS y correo. Omite los vacíos."""
+    claves = {}
+    for campo in CAMPOS_UNICOS:
+        valor = str(datos.get(campo) or '').strip()
+        if not valor:
+            continue
+        claves[campo] = valor.upper() if campo in ('rfc', 'curp') else valor
+    return claves
+
+def _clave_comparacion(valor):
+    # MySQL compara con collation case-insensitive
+    return (valor or '').strip().lower()
+
+def buscar_duplicados_lote(db, registros):
+    """
+    Verifica muchos registros candidatos en UNA sola consulta.
+    Regresa, para cada registro (en el mismo orden), la lista de duplicados
+    encontrados: [{'campo', 'valor', 'colaborador', 'colaborador_id'}].
+    También marca valores repetidos dentro del mismo lote.
+    """
+    candidatos = [normalizar_claves_unicas(r or {}) for r in registros]
+    
+    valores_por_campo = {campo: set() for campo in CAMPOS_UNICOS}
+    for claves in candidatos:
+        for campo, valor in claves.items():
+            valores_por_campo[campo].add(valor)
+    
+    condiciones = [
+        CAMPOS_UNICOS[campo][0].in_(valores)
+        for campo, valores in valores_por_campo.items()
+        if valores
+    ]
+    
+    # Índice {campo: {valor: (id, nombre completo)}} de lo que ya existe
+    existentes = {campo: {} for campo in CAMPOS_UNICOS}
+    if condiciones:
+        filas = db.query(
+            Colaborador.id,
+            Colaborador.nombre,
+            Colaborador.apellido,
+            Colaborador.rfc,
+            Colaborador.curp,
+            Colaborador.nss,
+            Colaborador.correo
+        ).filter(or_(*condiciones)).all()
         
-        # Verificar duplicados
+        for fila in filas:
+            for campo in CAMPOS_UNICOS:
+                existentes[campo][_clave_comparacion(getattr(fila, campo))] = (
+                    fila.id, f"{fila.nombre} {fila.apellido}"
+                )
+    
+    vistos_en_lote = {campo: {} for campo in CAMPOS_UNICOS}
+    resultados = []
+    
+    for indice, claves in enumerate(candidatos):
         duplicados = []
-        
-        # Verificar RFC
-        if rfc:
-            existe_rfc = db.query(Colaborador).filter_by(rfc=rfc).first()
-            if existe_rfc:
+        for campo, valor in claves.items():
+            etiqueta = CAMPOS_UNICOS[campo][1]
+            clave = _clave_comparacion(valor)
+            
+            if clave in existentes[campo]:
+                colaborador_id, nombre = existentes[campo][clave]
                 duplicados.append({
-                    'campo': 'RFC',
-                    'valor': rfc,
-                    'colaborador': f"{existe_rfc.nombre} {existe_rfc.apellido}"
+                    'campo': etiqueta,
+                    'valor': valor,
+                    'colaborador': nombre,
+                    'colaborador_id': colaborador_id
                 })
-        
-        # Verificar CURP
-        if curp:
-            existe_curp = db.query(Colaborador).filter_by(curp=curp).first()
-            if existe_curp:
+            elif clave in vistos_en_lote[campo]:
                 duplicados.append({
-                    'campo': 'CURP',
-                    'valor': curp,
-                    'colaborador': f"{existe_curp.nombre} {existe_curp.apellido}"
+                    'campo': etiqueta,
+                    'valor': valor,
+                    'colaborador': f"registro #{vistos_en_lote[campo][clave] + 1} del lote",
+                    'colaborador_id': None
                 })
+            else:
+                vistos_en_lote[campo][clave] = indice
         
-        # Verificar NSS
-        if nss:
-            existe_nss = db.query(Colaborador).filter_by(nss=nss).first()
-            if existe_nss:
-                duplicados.append({
-                    'campo': 'NSS',
-                    'valor': nss,
-                    'colaborador': f"{existe_nss.nombre} {existe_nss.apellido}"
-                })
+        resultados.append(duplicados)
+    
+    return resultados
+
+def buscar_duplicados(db, datos):
+    """Verifica RFC/CURP/NSS/correo de un solo registro en una consulta."""
+    return buscar_duplicados_lote(db, [datos])[0]
+
+# ======================================
+# ÍNDICE EN MEMORIA DE IDENTIFICADORES ÚNICOS
+# ======================================
+class IndiceIdentificadores:
+    """
+    Índice por proceso de los RFC/CURP/NSS/correos existentes, guardados como
+    hashes de 64 bits. Cada intervalo_sync segundos carga las altas (id nuevo) y
+    ediciones (fecha_actualizacion) hechas por otros procesos, así que una
+    ausencia en el índice puede ir hasta intervalo_sync segundos atrasada; si el
+    índice está más atrasado que eso, la ausencia se trata como desconocida y se
+    consulta la BD. La garantía final son las restricciones UNIQUE de la BD.
+    Una presencia siempre se confirma contra la BD, así que colisiones o valores
+    ya modificados nunca dan un falso positivo.
+    """
+    
+    MARGEN_SYNC = 60  # Segundos de traslape: transacciones lentas y relojes desfasados
+    
+    def __init__(self, ttl=300, intervalo_sync=15):
+        self.ttl = ttl                          # Reconstrucción completa (limpia valores viejos)
+        self.intervalo_sync = intervalo_sync    # Carga incremental de cambios de otros procesos
+        self._lock = threading.Lock()
+        self._recarga = threading.Lock()        # Una sola recarga a la vez por proceso
+        self._hashes = {campo: set() for campo in CAMPOS_UNICOS}
+        self._max_id = 0
+        self._marca_sync = None                 # fecha_actualizacion desde la que se buscan ediciones
+        self._cargado_en = None
+        self._sincronizado_en = None
+    
+    @staticmethod
+    def _hash(valor):
+        digest = hashlib.blake2b(_clave_comparacion(valor).encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big')
+    
+    def _consulta(self, db):
+        return db.query(
+            Colaborador.id,
+            Colaborador.rfc,
+            Colaborador.curp,
+            Colaborador.nss,
+            Colaborador.correo
+        )
+    
+    def _cargar_filas(self, filas, hashes):
+        max_id = 0
+        for fila in filas:
+            max_id = max(max_id, fila.id)
+            for campo in CAMPOS_UNICOS:
+                valor = getattr(fila, campo)
+                if valor:
+                    hashes[campo].add(self._hash(valor))
+        return max_id
+    
+    def reconstruir(self, db):
+        """Recarga el índice completo desde la BD."""
+        inicio = datetime.now()
+        hashes = {campo: set() for campo in CAMPOS_UNICOS}
+        max_id = self._cargar_filas(self._consulta(db).yield_per(1000), hashes)
+        
+        with self._lock:
+            self._hashes = hashes
+            self._max_id = max_id
+            self._marca_sync = inicio - timedelta(seconds=self.MARGEN_SYNC)
+            self._cargado_en = time.monotonic()
+            # Lo confirmado mientras se leía la tabla llega con la siguiente
+            # sincronización; hasta entonces las ausencias se consultan en la BD
+            self._sincronizado_en = None
+        
+        logger.info(f"Índice de identificadores cargado: {len(hashes['rfc'])} RFC, max id {max_id}")
+    
+    def sincronizar(self, db):
+        """Agrega altas (id mayor al último) y ediciones recientes de otros procesos."""
+        inicio = datetime.now()
+        filas = self._consulta(db).filter(Colaborador.id > self._max_id).all()
+        if self._marca_sync is not None:
+            filas += self._consulta(db).filter(Colaborador.fecha_actualizacion >= self._marca_sync).all()
+        
+        with self._lock:
+            self._max_id = max(self._max_id, self._cargar_filas(filas, self._hashes))
+            self._marca_sync = inicio - timedelta(seconds=self.MARGEN_SYNC)
+            self._sincronizado_en = time.monotonic()
+    
+    def _reconstruir_en_segundo_plano(self):
+        try:
+            with get_db() as db:
+                self.reconstruir(db)
+            # En otra transacción para ver lo confirmado durante la reconstrucción
+            with get_db() as db:
+                self.sincronizar(db)
+        except Exception as e:
+            logger.error(f"Error reconstruyendo índice de identificadores: {e}", exc_info=True)
+        finally:
+            self._recarga.release()
+    
+    def asegurar_fresco(self, db):
+        """
+        Sincroniza el índice si le toca. La reconstrucción completa corre en un
+        hilo aparte; mientras tanto, o si otra petición ya está recargando, no se
+        espera: puede_existir remite a la BD hasta que el índice esté al día.
+        """
+        ahora = time.monotonic()
+        reconstruir = self._cargado_en is None or ahora - self._cargado_en > self.ttl
+        if not reconstruir and self._sincronizado_en is not None \
+                and ahora - self._sincronizado_en <= self.intervalo_sync:
+            return
+        if not self._recarga.acquire(blocking=False):
+            return
         
-        # Verificar Correo
-        if correo:
-            existe_correo = db.query(Colaborador).filter_by(correo=correo).first()
-            if existe_correo:
-                duplicados.append({
-                    'campo': 'Correo',
-                    'valor': correo,
-                    'colaborador': f"{existe_correo.nombre} {existe_correo.apellido}"
-                })
+        if reconstruir:
+            threading.Thread(
+                target=self._reconstruir_en_segundo_plano,
+                name="indice-identificadores",
+                daemon=True
+            ).start()
+            return
+        
+        try:
+            self.sincronizar(db)
+        finally:
+            self._recarga.release()
+    
+    def agregar(self, colaborador):
+        """Registra los identificadores de un colaborador recién creado o actualizado."""
+        with self._lock:
+            for campo in CAMPOS_UNICOS:
+                valor = getattr(colaborador, campo, None)
+                if valor:
+                    self._hashes[campo].add(self._hash(valor))
+            if colaborador.id:
+                self._max_id = max(self._max_id, colaborador.id)
+    
+    def puede_existir(self, campo, valor):
+        """False = no existe (con el retraso de intervalo_sync); True = hay que confirmar en la BD."""
+        if self._sincronizado_en is None or time.monotonic() - self._sincronizado_en > self.intervalo_sync:
+            return True
+        return self._hash(valor) in self._hashes[campo]
+    
+    def verificar_consistencia(self, db):
+        """Compara el índice contra la BD. Regresa los valores de la BD que faltan por campo."""
+        hashes_bd = {campo: set() for campo in CAMPOS_UNICOS}
+        self._cargar_filas(self._consulta(db).yield_per(1000), hashes_bd)
+        
+        with self._lock:
+            faltantes = {
+                campo: len(hashes_bd[campo] - self._hashes[campo])
+                for campo in CAMPOS_UNICOS
+            }
+            sobrantes = {
+                campo: len(self._hashes[campo] - hashes_bd[campo])
+                for campo in CAMPOS_UNICOS
+            }
+        
+        return {"faltantes": faltantes, "sobrantes": sobrantes}
+
+indice_identificadores = IndiceIdentificadores(
+    ttl=app.config['INDICE_IDENTIFICADORES_TTL'],
+    intervalo_sync=app.config['INDICE_IDENTIFICADORES_SYNC']
+)
+
+def filtrar_con_indice(db, datos):
+    """Deja solo los campos que podrían existir según el índice en memoria."""
+    indice_identificadores.asegurar_fresco(db)
+    return {
+        campo: valor
+        for campo, valor in normalizar_claves_unicas(datos).items()
+        if indice_identificadores.puede_existir(campo, valor)
+    }
+
+@app.cli.command("verificar-indice-identificadores")
+def cli_verificar_indice_identificadores():
+    """Reconstruye el índice de identificadores y verifica que no haya deriva."""
+    with get_db() as db:
+        antes = indice_identificadores.verificar_consistencia(db)
+        indice_identificadores.reconstruir(db)
+        despues = indice_identificadores.verificar_consistencia(db)
+    
+    print(f"Antes de reconstruir: faltantes={antes['faltantes']} sobrantes={antes['sobrantes']}")
+    if any(despues["faltantes"].values()):
+        print(f"❌ El índice sigue inconsistente: {despues['faltantes']}")
+    else:
+        print("✅ Índice de identificadores consistente con colaboradores")
+
+def handle_alta_post(db):
+    """Maneja el POST del formulario de alta CON VALIDACIÓN RFC."""
+    try:
+        # Verificar duplicados (RFC, CURP, NSS y correo en una sola consulta)
+        duplicados = buscar_duplicados(db, request.form)
         
         # Si hay duplicados, retornar error JSON
         if duplicados:
@@ -968,12 +1876,9 @@ def handle_alta_post(db):
         area_id = int(request.form.get("area"))
         colaborador_id = crear_colaborador(db, area_id)
         
-        # Obtener datos del colaborador
+        # Obtener datos del colaborador (la notificación ya quedó en el outbox)
         colaborador = db.query(Colaborador).get(colaborador_id)
         
-        # Enviar notificación
-        enviar_notificacion_slack(colaborador, db)
-        
         success_msg = f"✅ Colaborador <strong>{colaborador.nombre} {colaborador.apellido}</strong> registrado exitosamente"
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -1154,9 +2059,13 @@ def crear_colaborador(db, area_id):
         motivo_baja=None
     )
     
+    asignar_nombre_normalizado(col)
+    
     db.add(col)
     db.flush()
     
+    liberar_reserva_correo(db, col.correo)
+    
     agregar_relaciones(db, col)
     
     try:
@@ -1164,8 +2073,17 @@ def crear_colaborador(db, area_id):
     except Exception as e:
         logger.warning(f"Error guardando documentos para colaborador {col.id}: {e}")
     
+    # Actualizar resumen mensual en la misma transacción
+    actualizar_resumen_mensual(db, None, estado_resumen(col))
+    
+    # La notificación se confirma junto con el alta y se envía en segundo plano
+    encolar_notificacion_alta(db, col)
+    
     db.commit()
     
+    despachador_notificaciones.despertar()
+    indice_identificadores.agregar(col)
+    
     logger.info(f"[OK] Colaborador creado: {col.nombre} {col.apellido} (ID: {col.id})")
     logger.info(f"     Rol comercial: {rol_comercial}")
     logger.info(f"     Número de comisiones: {numero_comisiones}")
@@ -1234,91 +2152,421 @@ def guardar_documentos(db, colaborador_id):
             db.add(doc)
 
 # ======================================
-# FUNCIÓN PARA ENVIAR NOTIFICACIÓN A SLACK (NUEVA)
+# NOTIFICACIONES DE ALTA (OUTBOX TRANSACCIONAL)
 # ======================================
-def enviar_notificacion_slack(colaborador, db):
-    """
-    Envía una notificación a Microsoft Teams (Power Automate Webhook)
-    cuando se crea un nuevo colaborador.
-    """
-    try:
-        # -----------------------------
-        # Obtener información adicional
-        # -----------------------------
-        area_nombre = "N/A"
-        puesto_nombre = "N/A"
+# El alta solo escribe la notificación en notificaciones_outbox dentro de su
+# transacción; el despachador en segundo plano la envía con reintentos.
 
-        if colaborador.area:
-            area_nombre = colaborador.area.nombre
+class ErrorNotificacion(Exception):
+    """El webhook rechazó la notificación o no respondió."""
 
-        if colaborador.puesto_id:
-            puesto = db.query(Puesto).filter_by(id=colaborador.puesto_id).first()
-            if puesto:
-                puesto_nombre = puesto.nombre
-
-        # -----------------------------
-        # Formatear datos
-        # -----------------------------
-        fecha_alta_str = (
-            colaborador.fecha_alta.strftime("%d/%m/%Y")
-            if colaborador.fecha_alta
-            else "N/A"
-        )
+def construir_notificacion_alta(colaborador, db):
+    """Arma el payload para Teams (Power Automate) de un nuevo colaborador."""
+    # -----------------------------
+    # Obtener información adicional
+    # -----------------------------
+    area_nombre = "N/A"
+    puesto_nombre = "N/A"
+
+    if colaborador.area:
+        area_nombre = colaborador.area.nombre
+
+    if colaborador.puesto_id:
+        puesto = db.query(Puesto).filter_by(id=colaborador.puesto_id).first()
+        if puesto:
+            puesto_nombre = puesto.nombre
+
+    # -----------------------------
+    # Formatear datos
+    # -----------------------------
+    fecha_alta_str = (
+        colaborador.fecha_alta.strftime("%d/%m/%Y")
+        if colaborador.fecha_alta
+        else "N/A"
+    )
+
+    sueldo_str = (
+        f"${colaborador.sueldo:,.2f}"
+        if colaborador.sueldo is not None
+        else "N/A"
+    )
+
+    # -----------------------------
+    # Crear mensaje (CON EMOJIS)
+    # -----------------------------
+    mensaje = (
+        f"👤 *Colaborador:* {colaborador.nombre} {colaborador.apellido}\n"
+        f"🏢 *Área:* {area_nombre}\n"
+        f"💼 *Puesto:* {puesto_nombre}\n"
+        f"📅 *Fecha de alta:* {fecha_alta_str}\n"
+        f"💰 *Sueldo:* {sueldo_str}\n"
+        f"📧 *Correo:* {colaborador.correo}"
+    )
+
+    return {
+        "titulo": "🚨 Solicitud de Alta de Colaborador",
+        "mensaje": mensaje,
+        # Datos estructurados para el modo resumen (no se envían al webhook)
+        "datos": {
+            "nombre": f"{colaborador.nombre} {colaborador.apellido}",
+            "area": area_nombre,
+            "puesto": puesto_nombre,
+            "fecha_alta": fecha_alta_str,
+            "correo": colaborador.correo
+        }
+    }
+
+def construir_resumen_altas(payloads):
+    """Un solo mensaje con las altas agrupadas por área."""
+    por_area = {}
+    for payload in payloads:
+        datos = payload.get("datos") or {"nombre": payload["mensaje"], "area": "N/A"}
+        por_area.setdefault(datos["area"], []).append(datos)
+
+    bloques = []
+    for area in sorted(por_area):
+        lineas = [f"🏢 *{area}* ({len(por_area[area])})"]
+        for datos in por_area[area]:
+            detalle = " | ".join(
+                valor for valor in (datos.get("puesto"), datos.get("fecha_alta"), datos.get("correo"))
+                if valor and valor != "N/A"
+            )
+            lineas.append(f"👤 {datos['nombre']}" + (f" - {detalle}" if detalle else ""))
+        bloques.append("\n".join(lineas))
+
+    return {
+        "titulo": f"🚨 Resumen de Altas de Colaboradores ({len(payloads)})",
+        "mensaje": "\n\n".join(bloques)
+    }
+
+def encolar_notificacion_alta(db, colaborador):
+    """Agrega la notificación del alta al outbox (sin commit: va con el alta)."""
+    db.add(NotificacionOutbox(
+        tipo="alta",
+        payload=json.dumps(construir_notificacion_alta(colaborador, db), ensure_ascii=False)
+    ))
+
+# Session compartida (keep-alive) con circuit breaker para el webhook de Teams
+cliente_webhooks = ClienteHTTP(
+    pool_maxsize=app.config['HTTP_POOL_MAXSIZE'],
+    timeouts={"teams": app.config['WEBHOOK_TIMEOUT']},
+    umbral_fallos=app.config['CIRCUITO_UMBRAL_FALLOS'],
+    enfriamiento=app.config['CIRCUITO_ENFRIAMIENTO']
+)
+
+def webhook_configurado():
+    """HTTPS obligatorio, salvo un servidor local (stub de pruebas) en http://."""
+    webhook_url = app.config.get("WEBHOOK_URL") or ""
+    return webhook_url.startswith(("https://", "http://127.0.0.1", "http://localhost"))
+
+def enviar_notificacion_slack(data):
+    """
+    Envía un payload a Microsoft Teams (Power Automate Webhook).
+    Lanza ErrorNotificacion si no se pudo entregar, o CircuitoAbierto si el
+    webhook viene fallando y está en enfriamiento.
+    """
+    if not webhook_configurado():
+        raise ErrorNotificacion("URL de webhook no configurada o inválida")
 
-        sueldo_str = (
-            f"${colaborador.sueldo:,.2f}"
-            if colaborador.sueldo is not None
-            else "N/A"
+    data = {"titulo": data["titulo"], "mensaje": data["mensaje"]}
+
+    try:
+        response = cliente_webhooks.post("teams", app.config["WEBHOOK_URL"], json=data)
+    except requests.RequestException as e:
+        raise ErrorNotificacion(f"Error de conexión: {e}") from e
+
+    # -----------------------------
+    # Teams responde 202 = OK
+    # -----------------------------
+    if response.status_code not in (200, 202):
+        raise ErrorNotificacion(f"{response.status_code} - {response.text[:500]}")
+
+    logger.info(f"[OK] Notificación enviada a Teams (Status {response.status_code})")
+
+def calcular_backoff(intentos):
+    """Espera exponencial antes del siguiente intento (en segundos)."""
+    base = app.config['NOTIFICACIONES_BACKOFF_BASE']
+    return min(base * 2 ** (intentos - 1), app.config['NOTIFICACIONES_BACKOFF_MAX'])
+
+def procesar_notificacion(notificacion_id):
+    """
+    Envía una notificación del outbox en su propia transacción. La fila se
+    bloquea (SKIP LOCKED) para que varios procesos no la envíen dos veces, y se
+    vuelve a revisar proximo_intento: otro proceso pudo haberla pospuesto
+    después de que se listó.
+    """
+    with get_db() as db:
+        consulta = db.query(NotificacionOutbox).filter(
+            NotificacionOutbox.id == notificacion_id,
+            NotificacionOutbox.estado == "pendiente",
+            NotificacionOutbox.proximo_intento <= datetime.now()
         )
+        if db.bind.dialect.name == "mysql":
+            consulta = consulta.with_for_update(skip_locked=True)
+        notificacion = consulta.first()
+        if not notificacion:
+            return None
+        
+        try:
+            enviar_notificacion_slack(json.loads(notificacion.payload))
+            notificacion.intentos += 1
+            notificacion.estado = "enviado"
+            notificacion.enviado_en = datetime.now()
+            notificacion.ultimo_error = None
+        except CircuitoAbierto as e:
+            posponer_por_circuito(notificacion, e)
+        except ErrorNotificacion as e:
+            registrar_fallo_notificacion(notificacion, e)
+        return notificacion.estado
+
+def posponer_por_circuito(notificacion, error):
+    # No se llamó al webhook: no cuenta como intento
+    notificacion.proximo_intento = datetime.now() + timedelta(seconds=error.reintentar_en)
+    notificacion.ultimo_error = str(error)
 
-        # -----------------------------
-        # Crear mensaje (CON EMOJIS)
-        # -----------------------------
-        mensaje = (
-            f"👤 *Colaborador:* {colaborador.nombre} {colaborador.apellido}\n"
-            f"🏢 *Área:* {area_nombre}\n"
-            f"💼 *Puesto:* {puesto_nombre}\n"
-            f"📅 *Fecha de alta:* {fecha_alta_str}\n"
-            f"💰 *Sueldo:* {sueldo_str}\n"
-            f"📧 *Correo:* {colaborador.correo}"
+def registrar_fallo_notificacion(notificacion, error):
+    """Suma el intento y programa el reintento, o pasa a 'fallido' (dead-letter)."""
+    notificacion.intentos += 1
+    notificacion.ultimo_error = str(error)
+    if notificacion.intentos >= app.config['NOTIFICACIONES_MAX_INTENTOS']:
+        notificacion.estado = "fallido"
+        logger.error(
+            f"[ERROR] Notificación {notificacion.id} ({notificacion.tipo}) marcada como fallida "
+            f"tras {notificacion.intentos} intentos: {error}"
+        )
+    else:
+        espera = calcular_backoff(notificacion.intentos)
+        notificacion.proximo_intento = datetime.now() + timedelta(seconds=espera)
+        logger.warning(
+            f"[WARNING] Notificación {notificacion.id} falló (intento {notificacion.intentos}), "
+            f"reintento en {espera}s: {error}"
         )
 
-        data = {
-            "titulo": "🚨 Solicitud de Alta de Colaborador",
-            "mensaje": mensaje
-        }
+def procesar_resumen_altas():
+    """
+    Modo resumen: junta las altas pendientes y las envía en un solo mensaje
+    cuando la más antigua cumple la ventana o se llega al máximo por mensaje.
+    """
+    maximo = app.config['NOTIFICACIONES_DIGEST_MAXIMO']
+    ahora = datetime.now()
+    
+    with get_db() as db:
+        consulta = db.query(NotificacionOutbox).filter(
+            NotificacionOutbox.tipo == "alta",
+            NotificacionOutbox.estado == "pendiente",
+            NotificacionOutbox.proximo_intento <= ahora
+        ).order_by(NotificacionOutbox.id).limit(maximo)
+        if db.bind.dialect.name == "mysql":
+            consulta = consulta.with_for_update(skip_locked=True)
+        lote = consulta.all()
+        
+        if not lote:
+            return {}
+        
+        espera = (ahora - min(n.creado_en for n in lote)).total_seconds()
+        if len(lote) < maximo and espera < app.config['NOTIFICACIONES_DIGEST_VENTANA']:
+            return {"en_espera": len(lote)}
+        
+        try:
+            enviar_notificacion_slack(construir_resumen_altas([json.loads(n.payload) for n in lote]))
+            for notificacion in lote:
+                notificacion.intentos += 1
+                notificacion.estado = "enviado"
+                notificacion.enviado_en = ahora
+                notificacion.ultimo_error = None
+        except CircuitoAbierto as e:
+            for notificacion in lote:
+                posponer_por_circuito(notificacion, e)
+        except ErrorNotificacion as e:
+            for notificacion in lote:
+                registrar_fallo_notificacion(notificacion, e)
+        
+        resultado = {}
+        for notificacion in lote:
+            resultado[notificacion.estado] = resultado.get(notificacion.estado, 0) + 1
+        return resultado
 
-        # -----------------------------
-        # Enviar al webhook de Teams
-        # -----------------------------
-        webhook_url = app.config.get("WEBHOOK_URL")
+def procesar_outbox(limite=50):
+    """Envía las notificaciones pendientes cuyo próximo intento ya venció."""
+    if not webhook_configurado():
+        return {}
+    
+    resultado = {}
+    digest = app.config['NOTIFICACIONES_DIGEST']
+    if digest and not cliente_webhooks.circuito_abierto("teams"):
+        resultado.update(procesar_resumen_altas())
+    
+    with get_db() as db:
+        consulta = db.query(NotificacionOutbox.id).filter(
+            NotificacionOutbox.estado == "pendiente",
+            NotificacionOutbox.proximo_intento <= datetime.now()
+        )
+        if digest:
+            # Las altas las maneja el resumen; aquí solo otros tipos
+            consulta = consulta.filter(NotificacionOutbox.tipo != "alta")
+        ids = [fila.id for fila in consulta.order_by(NotificacionOutbox.id).limit(limite)]
+    
+    for i, notificacion_id in enumerate(ids):
+        if cliente_webhooks.circuito_abierto("teams"):
+            # El resto espera a que termine el enfriamiento del circuito
+            resultado["pospuestas"] = len(ids) - i
+            break
+        estado = procesar_notificacion(notificacion_id)
+        if estado:
+            resultado[estado] = resultado.get(estado, 0) + 1
+    return resultado
 
-        if not webhook_url or not webhook_url.startswith("https://"):
-            logger.warning("[WARNING] URL de webhook no configurada o inválida")
+class DespachadorNotificaciones:
+    """Hilo en segundo plano que vacía el outbox periódicamente o al ser despertado."""
+    
+    def __init__(self, intervalo=5):
+        self.intervalo = intervalo
+        self._evento = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+    
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
             return
+        if not webhook_configurado():
+            logger.warning("[WARNING] URL de webhook no configurada; las notificaciones quedan en el outbox")
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ciclo, name="despachador-notificaciones", daemon=True)
+        self._hilo.start()
+        logger.info("Despachador de notificaciones iniciado")
+    
+    def detener(self, timeout=None):
+        self._detener.set()
+        self._evento.set()
+        if self._hilo:
+            self._hilo.join(timeout)
+    
+    def despertar(self):
+        """Pide un envío inmediato (p. ej. justo después del commit de un alta)."""
+        self._evento.set()
+    
+    def _ciclo(self):
+        while not self._detener.is_set():
+            self._evento.wait(self.intervalo)
+            self._evento.clear()
+            if self._detener.is_set():
+                break
+            try:
+                procesar_outbox()
+            except Exception as e:
+                logger.error(f"Error en el despachador de notificaciones: {e}", exc_info=True)
 
-        response = requests.post(webhook_url, json=data, timeout=10)
+despachador_notificaciones = DespachadorNotificaciones(
+    intervalo=app.config['NOTIFICACIONES_INTERVALO']
+)
 
-        # -----------------------------
-        # Teams responde 202 = OK
-        # -----------------------------
-        if response.status_code in (200, 202):
-            logger.info(
-                f"[OK] Notificación enviada a Teams "
-                f"(Status {response.status_code}) - "
-                f"{colaborador.nombre} {colaborador.apellido}"
-            )
-        else:
-            logger.error(
-                f"[ERROR] Error al enviar notificación a Teams: "
-                f"{response.status_code} - {response.text}"
-            )
+@app.cli.command("despachar-notificaciones")
+def cli_despachar_notificaciones():
+    """Envía ahora las notificaciones pendientes del outbox."""
+    print(f"Notificaciones procesadas: {procesar_outbox(limite=1000)}")
+
+@app.cli.command("reintentar-notificaciones")
+def cli_reintentar_notificaciones():
+    """Regresa las notificaciones fallidas (dead-letter) a pendientes."""
+    with get_db() as db:
+        total = db.query(NotificacionOutbox).filter(
+            NotificacionOutbox.estado == "fallido"
+        ).update({
+            NotificacionOutbox.estado: "pendiente",
+            NotificacionOutbox.intentos: 0,
+            NotificacionOutbox.proximo_intento: datetime.now()
+        }, synchronize_session=False)
+    print(f"✅ {total} notificaciones regresadas a pendiente")
 
+@app.route("/admin/metricas/http")
+@login_required
+@require_db
+def admin_metricas_http():
+    """Métricas del cliente HTTP saliente y del outbox (solo admin)."""
+    if not g.usuario.tiene_permiso('admin'):
+        return jsonify({"error": "No autorizado"}), 403
+    
+    try:
+        outbox = dict(g.db.query(
+            NotificacionOutbox.estado,
+            func.count(NotificacionOutbox.id)
+        ).group_by(NotificacionOutbox.estado).all())
+        
+        return jsonify({
+            "webhooks": cliente_webhooks.metricas(),
+            "outbox": outbox
+        })
     except Exception as e:
-        logger.error(
-            f"[ERROR] Excepción al enviar notificación a Teams: {e}",
-            exc_info=True
-        )
+        logger.error(f"Error obteniendo métricas HTTP: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+# ======================================
+# TELEMETRÍA DEL POOL DE CONEXIONES
+# ======================================
+# Variables de entorno que fijan el tamaño de cada pool en el despliegue
+VARIABLES_POOL = {
+    "primario": ("POOL_TAMANO", "POOL_MAX_OVERFLOW"),
+    "replica": ("POOL_REPLICA_TAMANO", "POOL_REPLICA_MAX_OVERFLOW")
+}
+
+# max_connections por engine, consultado una vez por proceso: la consulta toma
+# una conexión del mismo pool que se está midiendo
+_max_conexiones_bd = {}
+
+def max_conexiones_bd(engine):
+    """max_connections del servidor (o DB_MAX_CONEXIONES); None si no se puede saber."""
+    if app.config['DB_MAX_CONEXIONES']:
+        return app.config['DB_MAX_CONEXIONES']
+    if engine is None or engine.dialect.name != "mysql":
+        return None
+    if engine not in _max_conexiones_bd:
+        try:
+            with engine.connect() as conn:
+                fila = conn.execute(text("SHOW VARIABLES LIKE 'max_connections'")).first()
+        except SQLAlchemyError as e:
+            # Sin cachear: se reintenta en la siguiente consulta de métricas
+            logger.warning(f"No se pudo consultar max_connections: {e}")
+            return None
+        _max_conexiones_bd[engine] = int(fila[1]) if fila else None
+    return _max_conexiones_bd[engine]
+
+def recomendacion_pool(telemetria):
+    """Recomendación de tamaño para un pool según POOL_AJUSTE; None si está apagado."""
+    if app.config['POOL_AJUSTE'] == 'off':
+        return None
+    propuesta = telemetria.recomendar(
+        muestras_minimas=app.config['POOL_AJUSTE_MUESTRAS'],
+        concurrencia_servidor=app.config['POOL_CONCURRENCIA_SERVIDOR'] or None,
+        procesos=app.config['POOL_PROCESOS'],
+        max_conexiones=max_conexiones_bd(telemetria.engine),
+        fraccion_conexiones=app.config['POOL_FRACCION_CONEXIONES']
+    )
+    recomendacion = propuesta.get("recomendacion")
+    if recomendacion and telemetria.nombre in VARIABLES_POOL:
+        variable_tamano, variable_overflow = VARIABLES_POOL[telemetria.nombre]
+        propuesta["variables_entorno"] = {
+            variable_tamano: recomendacion["pool_size"],
+            variable_overflow: recomendacion["max_overflow"]
+        }
+    return propuesta
+
+@app.route("/admin/metricas/pool")
+@login_required
+def admin_metricas_pool():
+    """Métricas de los pools de conexiones y recomendación de tamaño (solo admin)."""
+    if not g.usuario.tiene_permiso('admin'):
+        return jsonify({"error": "No autorizado"}), 403
+    
+    try:
+        resultado = {}
+        for nombre, telemetria in telemetrias_pool.items():
+            datos = telemetria.metricas()
+            datos["dimensionamiento"] = recomendacion_pool(telemetria)
+            resultado[nombre] = datos
+        return jsonify({"modo_ajuste": app.config['POOL_AJUSTE'], "pools": resultado})
+    except Exception as e:
+        logger.error(f"Error obteniendo métricas del pool: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
 
 # ======================================
 # RUTA PARA PÁGINA DE CAMBIO DE ÁREA
@@ -1384,6 +2632,7 @@ def procesar_cambio_area(db):
         
         # Registrar cambio
         area_anterior = colaborador.area.nombre if colaborador.area else "N/A"
+        estado_anterior = estado_resumen(colaborador)
         
         # Actualizar área
         colaborador.area_id = nueva_area_id
@@ -1408,6 +2657,7 @@ def procesar_cambio_area(db):
         
         colaborador.comentarios = (colaborador.comentarios or "") + comentario
         
+        actualizar_resumen_mensual(db, estado_anterior, estado_resumen(colaborador))
         db.commit()
         
         flash(f"✅ Cambio de área procesado para <strong>{colaborador.nombre} {colaborador.apellido}</strong>", "success")
@@ -1476,21 +2726,13 @@ def verificar_duplicados():
             'nss': False
         }
         
-        if 'correo' in data and data['correo']:
-            existe = db.query(Colaborador).filter_by(correo=data['correo'].strip()).first()
-            resultados['correo'] = existe is not None
-        
-        if 'rfc' in data and data['rfc']:
-            existe = db.query(Colaborador).filter_by(rfc=data['rfc'].strip().upper()).first()
-            resultados['rfc'] = existe is not None
-        
-        if 'curp' in data and data['curp']:
-            existe = db.query(Colaborador).filter_by(curp=data['curp'].strip().upper()).first()
-            resultados['curp'] = existe is not None
+        # El índice en memoria descarta los valores que seguro no existen
+        candidatos = filtrar_con_indice(db, data or {})
         
-        if 'nss' in data and data['nss']:
-            existe = db.query(Colaborador).filter_by(nss=data['nss'].strip()).first()
-            resultados['nss'] = existe is not None
+        etiquetas = {etiqueta: campo for campo, (_, etiqueta) in CAMPOS_UNICOS.items()}
+        if candidatos:
+            for dup in buscar_duplicados(db, candidatos):
+                resultados[etiquetas[dup['campo']]] = True
         
         return jsonify({
             'success': True,
@@ -1506,6 +2748,39 @@ def verificar_duplicados():
 
 
 
+@app.route("/api/verificar-duplicados/lote", methods=["POST"])
+@require_db
+def verificar_duplicados_lote():
+    """API para validar muchos registros (p. ej. importación de Excel) en una sola consulta."""
+    try:
+        data = request.get_json() or {}
+        registros = data.get('registros') if isinstance(data, dict) else data
+        
+        if not isinstance(registros, list):
+            return jsonify({'success': False, 'error': 'Se esperaba una lista de registros'}), 400
+        
+        if len(registros) > 5000:
+            return jsonify({'success': False, 'error': 'Máximo 5000 registros por lote'}), 400
+        
+        resultados = buscar_duplicados_lote(g.db, registros)
+        
+        return jsonify({
+            'success': True,
+            'total': len(registros),
+            'con_duplicados': sum(1 for dups in resultados if dups),
+            'resultados': [
+                {'indice': indice, 'duplicado': bool(dups), 'duplicados': dups}
+                for indice, dups in enumerate(resultados)
+            ]
+        })
+        
+    except Exception as e:
+        logger.error(f"Error verificando duplicados en lote: {e}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route("/api/areas", methods=["GET"])
 @require_db
 def api_areas():
@@ -1566,8 +2841,10 @@ def api_verificar_rfc():
         
         db = g.db
         
-        # Buscar colaborador por RFC
-        colaborador = db.query(Colaborador).filter_by(rfc=rfc).first()
+        # Si el índice en memoria descarta el RFC no se consulta el detalle
+        colaborador = None
+        if filtrar_con_indice(db, {'rfc': rfc}):
+            colaborador = db.query(Colaborador).filter_by(rfc=rfc).first()
         
         if colaborador:
             # Obtener datos del área
@@ -1613,11 +2890,17 @@ def api_verificar_rfc():
 
 
 @app.route("/api/reclutadores/comercial")
+@cache_bi("reclutadores_comercial")
+@lectura_replica
 @require_db
 def api_reclutadores_comercial():
     """API para obtener reclutadores del área comercial - REVISADO."""
     year = request.args.get("year", type=int, default=date.today().year)
     
+    error = periodo_invalido(year)
+    if error:
+        return jsonify({"error": error}), 400
+    
     logger.info(f"API Reclutadores Comercial solicitada para año: {year}")
     
     try:
@@ -1633,7 +2916,8 @@ def api_reclutadores_comercial():
                 COUNT(c.id) as total
             FROM reclutadores r
             LEFT JOIN colaboradores c ON c.reclutador_id = r.id
-                AND YEAR(c.fecha_alta) = :year
+                AND c.fecha_alta >= :inicio
+                AND c.fecha_alta < :fin
                 AND c.baja = FALSE
                 AND (
                     c.area_id = :area_id 
@@ -1644,7 +2928,8 @@ def api_reclutadores_comercial():
                     SELECT 1 FROM colaboradores c2 
                     WHERE c2.reclutador_id = r.id 
                     AND c2.area_id = :area_id
-                    AND YEAR(c2.fecha_alta) = :year
+                    AND c2.fecha_alta >= :inicio
+                    AND c2.fecha_alta < :fin
                     AND c2.baja = FALSE
                 )
             GROUP BY r.id, r.nombre
@@ -1652,8 +2937,10 @@ def api_reclutadores_comercial():
             ORDER BY total DESC
         """)
         
+        inicio, fin = rango_periodo(year)
         resultados = db.execute(sql, {
-            'year': year,
+            'inicio': inicio,
+            'fin': fin,
             'area_id': app.config['AREA_COMERCIAL_ID'],
             'reclutador_ids': tuple(app.config['RECLUTADOR_COMERCIAL_IDS'])
         }).fetchall()
@@ -1674,66 +2961,143 @@ def api_reclutadores_comercial():
         logger.error(f"Error in reclutadores comercial API: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
     
+# ======================================
+# ASIGNACIÓN DE CORREO INSTITUCIONAL
+# ======================================
+def usuarios_correo(nombre, apellido):
+    """
+    Patrones de usuario para el correo, en orden de preferencia:
+    juan.perez, jperez, juanp, juan_perez (primer nombre y primer apellido).
+    """
+    def normalize(texto):
+        palabras = normalizar_texto(texto).split()
+        return re.sub(r'[^a-z0-9]', '', palabras[0]) if palabras else ""
+    
+    nombre_norm = normalize(nombre)
+    apellido_norm = normalize(apellido)
+    if not nombre_norm or not apellido_norm:
+        return []
+    
+    combinaciones = [
+        f"{nombre_norm}.{apellido_norm}",
+        f"{nombre_norm[0]}{apellido_norm}",
+        f"{nombre_norm}{apellido_norm[0]}",
+        f"{nombre_norm}_{apellido_norm}",
+    ]
+    return list(dict.fromkeys(combinaciones))
+
+def correos_ocupados(db, usuarios):
+    """
+    Correos ya usados por colaboradores o apartados vigentes que empiezan con
+    alguno de los usuarios. Una sola consulta por prefijo para todos los patrones.
+    """
+    dominio = app.config['DOMINIO_CORREO']
+    
+    def prefijos(columna):
+        return or_(*[columna.like(f"{usuario}%@{dominio}") for usuario in usuarios])
+    
+    consulta = select(Colaborador.correo).where(prefijos(Colaborador.correo)).union_all(
+        select(ReservaCorreo.correo).where(
+            prefijos(ReservaCorreo.correo),
+            ReservaCorreo.expira_en > datetime.now()
+        )
+    )
+    return {correo.lower() for correo in db.execute(consulta).scalars()}
+
+def primer_correo_libre(usuario, ocupados, excluir=()):
+    """usuario@dominio si está libre; si no, usuario.N con el menor N libre."""
+    dominio = app.config['DOMINIO_CORREO']
+    ocupados = set(ocupados) | set(excluir)
+    
+    correo = f"{usuario}@{dominio}"
+    if correo not in ocupados:
+        return correo
+    
+    patron = re.compile(rf"^{re.escape(usuario)}\.(\d+)@{re.escape(dominio)}$")
+    sufijos = {int(m.group(1)) for m in map(patron.match, ocupados) if m}
+    contador = 1
+    while contador in sufijos:
+        contador += 1
+    return f"{usuario}.{contador}@{dominio}"
+
+def reservar_correo(db, correo):
+    """Aparta el correo. Regresa la fecha de expiración o None si otro proceso lo tomó."""
+    ahora = datetime.now()
+    expira_en = ahora + timedelta(minutes=app.config['CORREO_RESERVA_MINUTOS'])
+    
+    try:
+        with db.begin_nested():
+            db.query(ReservaCorreo).filter(
+                ReservaCorreo.correo == correo,
+                ReservaCorreo.expira_en <= ahora
+            ).delete(synchronize_session=False)
+            db.add(ReservaCorreo(correo=correo, expira_en=expira_en))
+    except IntegrityError:
+        return None
+    return expira_en
+
+def liberar_reserva_correo(db, correo):
+    """Elimina el apartado de un correo ya asignado y los apartados vencidos."""
+    db.query(ReservaCorreo).filter(
+        or_(ReservaCorreo.correo == correo, ReservaCorreo.expira_en <= datetime.now())
+    ).delete(synchronize_session=False)
+
 # ======================================
 # API PARA GENERAR CORREO (MEJORADA)
 # ======================================
-@app.route("/api/generar-correo", methods=["GET"])
+@app.route("/api/generar-correo", methods=["GET", "POST"])
 @require_db
 def api_generar_correo():
-    """Genera correo institucional basado en nombre y apellido, verifica duplicados."""
+    """
+    Genera correo institucional basado en nombre y apellido, verifica duplicados.
+    Por POST con reservar=1 aparta el correo durante CORREO_RESERVA_MINUTOS;
+    el GET solo consulta (prefetch, reintentos o enlaces no deben apartar).
+    """
     try:
-        nombre = request.args.get('nombre', '').strip()
-        apellido = request.args.get('apellido', '').strip()
+        nombre = request.values.get('nombre', '').strip()
+        apellido = request.values.get('apellido', '').strip()
+        reservar = request.method == "POST" and request.form.get('reservar') in ('1', 'true')
+        if request.method == "GET" and request.args.get('reservar') in ('1', 'true'):
+            return jsonify({"error": "Para apartar el correo usa POST con reservar=1"}), 400
         
         if not nombre or not apellido:
             return jsonify({"error": "Nombre y apellido requeridos"}), 400
         
-        # Generar nombre de usuario
-        def generar_usuario(nombre, apellido):
-            # Normalizar texto
-            def normalize(text):
-                if not text:
-                    return ""
-                text = unicodedata.normalize('NFD', text)
-                text = text.encode('ascii', 'ignore').decode('utf-8')
-                return text.lower()
-            
-            nombre_norm = normalize(nombre.split()[0])  # Primer nombre
-            apellido_norm = normalize(apellido.split()[0])  # Primer apellido
-            
-            # Generar combinaciones posibles
-            combinaciones = [
-                f"{nombre_norm}.{apellido_norm}",
-                f"{nombre_norm[0]}{apellido_norm}",
-                f"{nombre_norm}{apellido_norm[0]}",
-                f"{nombre_norm}_{apellido_norm}",
-            ]
-            
-            return combinaciones[0]  # Usar primera combinación por defecto
-        
-        usuario = generar_usuario(nombre, apellido)
-        correo_propuesto = f"{usuario}@marnezdesarrollos.com"
+        usuarios = usuarios_correo(nombre, apellido)
+        if not usuarios:
+            return jsonify({"error": "Nombre y apellido deben contener letras"}), 400
         
         db = g.db
         
-        # Verificar si el correo ya existe
-        existe = db.query(Colaborador).filter_by(correo=correo_propuesto).first()
+        # Todas las variantes ocupadas de todos los patrones en una consulta
+        ocupados = correos_ocupados(db, usuarios)
         
-        if existe:
-            # Si existe, buscar variantes disponibles
-            contador = 1
-            while True:
-                correo_variante = f"{usuario}.{contador}@marnezdesarrollos.com"
-                existe_variante = db.query(Colaborador).filter_by(correo=correo_variante).first()
-                if not existe_variante:
-                    correo_propuesto = correo_variante
+        usuario = usuarios[0]
+        duplicado = f"{usuario}@{app.config['DOMINIO_CORREO']}" in ocupados
+        correo_propuesto = primer_correo_libre(usuario, ocupados)
+        
+        reservado_hasta = None
+        if reservar:
+            # Si otro alta lo apartó al mismo tiempo, probar el siguiente sufijo
+            descartados = set()
+            for _ in range(5):
+                reservado_hasta = reservar_correo(db, correo_propuesto)
+                if reservado_hasta:
                     break
-                contador += 1
+                descartados.add(correo_propuesto)
+                correo_propuesto = primer_correo_libre(usuario, ocupados, descartados)
+            if not reservado_hasta:
+                return jsonify({"error": "No se pudo apartar el correo, intenta de nuevo"}), 409
+        
+        # Otros patrones disponibles (jperez, juanp, juan_perez)
+        alternativas = [primer_correo_libre(alt, ocupados) for alt in usuarios[1:]]
         
         return jsonify({
             "correo": correo_propuesto,
-            "duplicado": existe is not None,
-            "sugerencia_alternativa": existe is not None
+            "duplicado": duplicado,
+            "sugerencia_alternativa": duplicado,
+            "alternativas": alternativas,
+            "reservado_hasta": reservado_hasta.isoformat() if reservado_hasta else None
         })
         
     except Exception as e:
@@ -1832,6 +3196,7 @@ def api_puestos_por_area(area_id):
 # API PARA BÚSQUEDA DE COLABORADORES EXISTENTES
 # ======================================
 @app.route("/api/buscar-colaborador", methods=["GET"])
+@lectura_replica
 @require_db
 def api_buscar_colaborador():
     """API para buscar colaborador por diferentes campos."""
@@ -1904,6 +3269,7 @@ def api_procesar_baja():
             return jsonify({"error": "El colaborador ya está dado de baja"}), 400
         
         # Procesar baja
+        estado_anterior = estado_resumen(colaborador)
         colaborador.baja = True
         colaborador.fecha_baja = datetime.strptime(data['fecha_baja'], "%Y-%m-%d").date()
         colaborador.motivo_baja = data['motivo']
@@ -1911,6 +3277,7 @@ def api_procesar_baja():
         if data.get('comentarios'):
             colaborador.comentarios = (colaborador.comentarios or "") + f"\n\n[BAJA] {data['comentarios']}"
         
+        actualizar_resumen_mensual(db, estado_anterior, estado_resumen(colaborador))
         db.commit()
         
         logger.info(f"Baja procesada para colaborador ID: {colaborador.id}")
@@ -1972,6 +3339,7 @@ def api_procesar_cambio_area():
         area_actual_id = colaborador.area_id
         puesto_actual = colaborador.puesto.nombre if colaborador.puesto else "N/A"
         sueldo_actual = colaborador.sueldo
+        estado_anterior = estado_resumen(colaborador)
         
         # ✅ ACTUALIZAR CORREO DEL COORDINADOR
         colaborador.correo_coordinador = nuevo_correo_coordinador
@@ -2020,6 +3388,7 @@ def api_procesar_cambio_area():
         
         colaborador.comentarios = (colaborador.comentarios or "") + comentario_cambio
         
+        actualizar_resumen_mensual(db, estado_anterior, estado_resumen(colaborador))
         db.commit()
         
         logger.info(f"Cambio de área procesado para colaborador ID: {colaborador.id}")
@@ -2044,9 +3413,284 @@ def api_procesar_cambio_area():
         db.rollback()
         return jsonify({"error": f"Error al procesar el cambio de área: {str(e)}"}), 500
 # ======================================
+# ÍNDICE DE BÚSQUEDA DE COLABORADORES
+# ======================================
+def normalizar_texto(texto):
+    """Minúsculas, sin acentos y con espacios simples (José  Núñez -> jose nunez)."""
+    texto = unicodedata.normalize('NFD', str(texto or ''))
+    texto = ''.join(c for c in texto if unicodedata.category(c) != 'Mn')
+    return ' '.join(texto.lower().split())
+
+def tokens_busqueda(*textos):
+    """Palabras normalizadas de los textos (el correo se parte en . _ - @)."""
+    tokens = []
+    for texto in textos:
+        for token in re.split(r'[^0-9a-z]+', normalizar_texto(texto)):
+            if token and token not in tokens:
+                tokens.append(token)
+    return tokens
+
+def datos_busqueda(colaborador):
+    """Campos que el índice guarda por colaborador para responder sin consultar la BD."""
+    return {
+        "nombre_completo": f"{colaborador.nombre} {colaborador.apellido}",
+        "correo": colaborador.correo,
+        "area_id": colaborador.area_id,
+        "activo": not colaborador.baja,
+        "fecha_alta": colaborador.fecha_alta.strftime("%Y-%m-%d") if colaborador.fecha_alta else "N/A"
+    }
+
+class IndiceBusquedaColaboradores:
+    """
+    Índice invertido en memoria por proceso: palabra normalizada -> ids.
+    Las palabras se mantienen ordenadas para resolver prefijos con bisect,
+    así cada tecla del autocompletado no recorre la tabla colaboradores.
+    Las altas y ediciones de otros procesos (fecha_actualizacion) llegan cada
+    intervalo_sync segundos; las propias se aplican al confirmarse.
+    """
+    
+    MARGEN_SYNC = 60  # Segundos de traslape: transacciones lentas y relojes desfasados
+    
+    def __init__(self, ttl=600, intervalo_sync=15):
+        self.ttl = ttl                          # Reconstrucción completa (quita registros eliminados)
+        self.intervalo_sync = intervalo_sync    # Carga incremental de altas y ediciones de otros procesos
+        self._lock = threading.Lock()
+        self._recarga = threading.Lock()        # Una sola recarga a la vez por proceso
+        self._docs = {}         # id -> (tokens, datos)
+        self._postings = {}     # token -> set(ids)
+        self._tokens = []       # tokens ordenados para búsqueda por prefijo
+        self._max_id = 0
+        self._marca_sync = None                 # fecha_actualizacion desde la que se buscan ediciones
+        self._pendientes = None                 # Cambios propios recibidos durante una reconstrucción
+        self._cargado_en = None
+        self._sincronizado_en = None
+    
+    def _consulta(self, db):
+        return db.query(
+            Colaborador.id,
+            Colaborador.nombre,
+            Colaborador.apellido,
+            Colaborador.correo,
+            Colaborador.baja,
+            Colaborador.area_id,
+            Colaborador.fecha_alta
+        )
+    
+    def _agregar_doc(self, colaborador_id, datos):
+        # Requiere el lock tomado
+        self._quitar_doc(colaborador_id)
+        tokens = tokens_busqueda(datos["nombre_completo"], datos["correo"])
+        self._docs[colaborador_id] = (tokens, datos)
+        for token in tokens:
+            ids = self._postings.get(token)
+            if ids is None:
+                ids = self._postings[token] = set()
+                bisect.insort(self._tokens, token)
+            ids.add(colaborador_id)
+        self._max_id = max(self._max_id, colaborador_id)
+    
+    def _quitar_doc(self, colaborador_id):
+        # Requiere el lock tomado
+        doc = self._docs.pop(colaborador_id, None)
+        if not doc:
+            return
+        for token in doc[0]:
+            ids = self._postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(colaborador_id)
+            if not ids:
+                del self._postings[token]
+                del self._tokens[bisect.bisect_left(self._tokens, token)]
+    
+    def reconstruir(self, db):
+        """
+        Recarga el índice completo desde la BD. Los cambios propios confirmados
+        mientras se lee la tabla se guardan y se vuelven a aplicar sobre el
+        snapshot nuevo; los de otros procesos llegan con la siguiente
+        sincronización, que parte de la hora de inicio de la reconstrucción.
+        """
+        inicio = datetime.now()
+        with self._lock:
+            self._pendientes = {}
+        
+        try:
+            nuevo = IndiceBusquedaColaboradores(self.ttl, self.intervalo_sync)
+            for fila in self._consulta(db).yield_per(1000):
+                tokens = tokens_busqueda(f"{fila.nombre} {fila.apellido}", fila.correo)
+                nuevo._docs[fila.id] = (tokens, datos_busqueda(fila))
+                for token in tokens:
+                    nuevo._postings.setdefault(token, set()).add(fila.id)
+                nuevo._max_id = max(nuevo._max_id, fila.id)
+        except Exception:
+            with self._lock:
+                self._pendientes = None
+            raise
+        
+        with self._lock:
+            self._docs = nuevo._docs
+            self._postings = nuevo._postings
+            self._tokens = sorted(nuevo._postings)
+            self._max_id = nuevo._max_id
+            pendientes, self._pendientes = self._pendientes, None
+            self._aplicar(pendientes)
+            self._marca_sync = inicio - timedelta(seconds=self.MARGEN_SYNC)
+            self._cargado_en = self._sincronizado_en = time.monotonic()
+        
+        logger.info(f"Índice de búsqueda cargado: {len(self._docs)} colaboradores, {len(self._tokens)} términos")
+    
+    def sincronizar(self, db):
+        """Carga altas (id mayor al último) y ediciones recientes de otros procesos."""
+        inicio = datetime.now()
+        filas = self._consulta(db).filter(Colaborador.id > self._max_id).all()
+        if self._marca_sync is not None:
+            filas += self._consulta(db).filter(Colaborador.fecha_actualizacion >= self._marca_sync).all()
+        
+        with self._lock:
+            for fila in filas:
+                self._agregar_doc(fila.id, datos_busqueda(fila))
+            self._marca_sync = inicio - timedelta(seconds=self.MARGEN_SYNC)
+            self._sincronizado_en = time.monotonic()
+    
+    def _reconstruir_en_segundo_plano(self):
+        try:
+            with get_db() as db:
+                self.reconstruir(db)
+            # En otra transacción para ver lo confirmado durante la reconstrucción
+            with get_db() as db:
+                self.sincronizar(db)
+        except Exception as e:
+            logger.error(f"Error reconstruyendo índice de búsqueda: {e}", exc_info=True)
+        finally:
+            self._recarga.release()
+    
+    def asegurar_fresco(self):
+        """
+        Carga, reconstruye o sincroniza el índice según su antigüedad, siempre
+        desde el primario (la réplica puede ir atrasada). Solo la primera carga
+        hace esperar; las reconstrucciones siguientes corren en un hilo aparte
+        y mientras tanto se sigue buscando en el índice anterior.
+        """
+        if self._cargado_en is None:
+            with self._recarga:
+                # Otra petición pudo terminar la carga mientras se esperaba el lock
+                if self._cargado_en is None:
+                    with get_db() as db:
+                        self.reconstruir(db)
+            return
+        
+        ahora = time.monotonic()
+        reconstruir = ahora - self._cargado_en > self.ttl
+        if not reconstruir and ahora - self._sincronizado_en <= self.intervalo_sync:
+            return
+        if not self._recarga.acquire(blocking=False):
+            return
+        
+        if reconstruir:
+            threading.Thread(
+                target=self._reconstruir_en_segundo_plano,
+                name="indice-busqueda",
+                daemon=True
+            ).start()
+            return
+        
+        try:
+            with get_db() as db:
+                self.sincronizar(db)
+        finally:
+            self._recarga.release()
+    
+    def _aplicar(self, cambios):
+        # Requiere el lock tomado
+        for colaborador_id, datos in cambios.items():
+            if datos is None:
+                self._quitar_doc(colaborador_id)
+            else:
+                self._agregar_doc(colaborador_id, datos)
+    
+    def actualizar(self, cambios):
+        """Aplica {id: datos} (None = eliminado) de escrituras confirmadas en este proceso."""
+        with self._lock:
+            if self._pendientes is not None:
+                # Se reconstruye: se aplican también sobre el snapshot nuevo
+                self._pendientes.update(cambios)
+            if self._cargado_en is not None:
+                self._aplicar(cambios)
+    
+    def _coincidencias(self, termino):
+        """ids que tienen una palabra con ese prefijo; 3 puntos si es exacta, 2 si es prefijo."""
+        puntajes = {}
+        i = bisect.bisect_left(self._tokens, termino)
+        while i < len(self._tokens) and self._tokens[i].startswith(termino):
+            token = self._tokens[i]
+            peso = 3 if token == termino else 2
+            for colaborador_id in self._postings[token]:
+                if puntajes.get(colaborador_id, 0) < peso:
+                    puntajes[colaborador_id] = peso
+            i += 1
+        return puntajes
+    
+    def buscar(self, consulta, limite=10):
+        """
+        Todos los términos deben coincidir por prefijo con alguna palabra del
+        nombre o correo. Ordena por relevancia, luego activos y luego más recientes.
+        """
+        terminos = tokens_busqueda(consulta)
+        
+        with self._lock:
+            puntajes = None
+            for termino in terminos:
+                actuales = self._coincidencias(termino)
+                if puntajes is None:
+                    puntajes = actuales
+                else:
+                    puntajes = {i: p + actuales[i] for i, p in puntajes.items() if i in actuales}
+                if not puntajes:
+                    break
+            puntajes = puntajes or {}
+            
+            # Búsqueda por ID exacto
+            consulta = consulta.strip()
+            if consulta.isdigit() and int(consulta) in self._docs:
+                puntajes[int(consulta)] = puntajes.get(int(consulta), 0) + 10
+            
+            mejores = heapq.nlargest(
+                limite,
+                puntajes.items(),
+                key=lambda item: (item[1], self._docs[item[0]][1]["activo"], item[0])
+            )
+            return [dict(self._docs[i][1], id=i) for i, _ in mejores]
+
+indice_busqueda = IndiceBusquedaColaboradores(
+    ttl=app.config['INDICE_BUSQUEDA_TTL'],
+    intervalo_sync=app.config['INDICE_BUSQUEDA_SYNC']
+)
+
+@event.listens_for(SessionLocal, "after_flush")
+def _capturar_colaboradores_busqueda(db, flush_context):
+    # Se copian los datos aquí: tras el commit los objetos quedan expirados
+    cambios = None
+    for obj in db.new | db.dirty | db.deleted:
+        if isinstance(obj, Colaborador):
+            if cambios is None:
+                cambios = db.info.setdefault("colaboradores_busqueda", {})
+            cambios[obj.id] = None if obj in db.deleted else datos_busqueda(obj)
+
+@event.listens_for(SessionLocal, "after_commit")
+def _actualizar_indice_busqueda_tras_commit(db):
+    cambios = db.info.pop("colaboradores_busqueda", None)
+    if cambios:
+        indice_busqueda.actualizar(cambios)
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_busqueda_tras_rollback(db):
+    db.info.pop("colaboradores_busqueda", None)
+
+# ======================================
 # API PARA BUSCAR COLABORADOR POR TEXTO
 # ======================================
 @app.route("/api/buscar-colaboradores", methods=["GET"])
+@lectura_replica
 @require_db
 def api_buscar_colaboradores():
     """API para buscar colaboradores por nombre, correo o ID."""
@@ -2058,41 +3702,19 @@ def api_buscar_colaboradores():
         
         db = g.db
         
-        # Buscar por ID si es numérico
-        if query.isdigit():
-            colaboradores = db.query(Colaborador)\
-                .filter(
-                    or_(
-                        Colaborador.id == int(query),
-                        Colaborador.nombre.ilike(f"%{query}%"),
-                        Colaborador.apellido.ilike(f"%{query}%"),
-                        Colaborador.correo.ilike(f"%{query}%")
-                    )
-                )\
-                .limit(10)\
-                .all()
-        else:
-            # Buscar por texto
-            colaboradores = db.query(Colaborador)\
-                .filter(
-                    or_(
-                        Colaborador.nombre.ilike(f"%{query}%"),
-                        Colaborador.apellido.ilike(f"%{query}%"),
-                        Colaborador.correo.ilike(f"%{query}%")
-                    )
-                )\
-                .limit(10)\
-                .all()
+        # Índice en memoria: sin acentos, por prefijo y ordenado por relevancia
+        indice_busqueda.asegurar_fresco()
+        areas = {area["id"]: area["nombre"] for area in obtener_catalogos(db)["areas"]}
         
         resultados = []
-        for col in colaboradores:
+        for col in indice_busqueda.buscar(query, limite=10):
             resultados.append({
-                "id": col.id,
-                "nombre_completo": f"{col.nombre} {col.apellido}",
-                "correo": col.correo,
-                "area": col.area.nombre if col.area else "N/A",
-                "activo": not col.baja,
-                "fecha_alta": col.fecha_alta.strftime("%Y-%m-%d") if col.fecha_alta else "N/A"
+                "id": col["id"],
+                "nombre_completo": col["nombre_completo"],
+                "correo": col["correo"],
+                "area": areas.get(col["area_id"], "N/A"),
+                "activo": col["activo"],
+                "fecha_alta": col["fecha_alta"]
             })
         
         return jsonify({"resultados": resultados})
@@ -2101,114 +3723,374 @@ def api_buscar_colaboradores():
         logger.error(f"Error buscando colaboradores: {e}", exc_info=True)
         return jsonify({"resultados": []})
 
+# ======================================
+# RESUMEN MENSUAL (HECHOS PRE-AGREGADOS)
+# ======================================
+def estado_resumen(colaborador):
+    """Captura los campos del colaborador que afectan a resumen_mensual."""
+    return (
+        colaborador.fecha_alta,
+        colaborador.fecha_baja,
+        colaborador.baja,
+        colaborador.area_id,
+        colaborador.reclutador_id
+    )
+
+def _aportes_resumen(estado):
+    """Aportes de un colaborador al resumen: {clave: [altas, bajas]}."""
+    aportes = {}
+    if estado is None:
+        return aportes
+    
+    fecha_alta, fecha_baja, baja, area_id, reclutador_id = estado
+    area_id = int(area_id)
+    reclutador_id = int(reclutador_id or 0)
+    baja = bool(baja)  # baja NULL se considera activo
+    
+    if fecha_alta:
+        clave = (fecha_alta.year, fecha_alta.month, area_id, reclutador_id, baja)
+        aportes.setdefault(clave, [0, 0])[0] += 1
+    
+    if baja and fecha_baja:
+        clave = (fecha_baja.year, fecha_baja.month, area_id, reclutador_id, True)
+        aportes.setdefault(clave, [0, 0])[1] += 1
+    
+    return aportes
+
+def _upsert_resumen(db, clave, d_altas, d_bajas):
+    """Suma deltas a una fila del resumen de forma atómica (INSERT ... ON DUPLICATE/CONFLICT)."""
+    anio, mes, area_id, reclutador_id, baja = clave
+    valores = {
+        "anio": anio,
+        "mes": mes,
+        "area_id": area_id,
+        "reclutador_id": reclutador_id,
+        "baja": baja,
+        "altas": d_altas,
+        "bajas": d_bajas
+    }
+    
+    if db.get_bind().dialect.name == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(ResumenMensual).values(**valores)
+        stmt = stmt.on_duplicate_key_update(
+            altas=ResumenMensual.altas + stmt.inserted.altas,
+            bajas=ResumenMensual.bajas + stmt.inserted.bajas
+        )
+    else:
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        stmt = sqlite_insert(ResumenMensual).values(**valores)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['anio', 'mes', 'area_id', 'reclutador_id', 'baja'],
+            set_={
+                "altas": ResumenMensual.altas + stmt.excluded.altas,
+                "bajas": ResumenMensual.bajas + stmt.excluded.bajas
+            }
+        )
+    
+    db.execute(stmt)
+
+def actualizar_resumen_mensual(db, antes, despues):
+    """
+    Aplica al resumen la diferencia entre dos estados de un colaborador
+    (antes=None para altas nuevas). Debe llamarse antes del commit para que
+    el resumen quede en la misma transacción que el cambio.
+    """
+    deltas = {}
+    for signo, estado in ((-1, antes), (1, despues)):
+        for clave, (altas, bajas) in _aportes_resumen(estado).items():
+            delta = deltas.setdefault(clave, [0, 0])
+            delta[0] += signo * altas
+            delta[1] += signo * bajas
+    
+    anios = set()
+    for clave, (d_altas, d_bajas) in deltas.items():
+        if d_altas or d_bajas:
+            _upsert_resumen(db, clave, d_altas, d_bajas)
+            anios.add(clave[0])
+    
+    # El cache BI de esos años se invalida al hacer commit
+    marcar_anios_modificados(db, anios)
+
+def calcular_resumen_desde_colaboradores(db):
+    """Recalcula el resumen completo desde colaboradores: {clave: [altas, bajas]}."""
+    reclutador = func.coalesce(Colaborador.reclutador_id, 0)
+    baja = func.coalesce(Colaborador.baja, False)
+    anio_alta = extract("year", Colaborador.fecha_alta)
+    mes_alta = extract("month", Colaborador.fecha_alta)
+    anio_baja = extract("year", Colaborador.fecha_baja)
+    mes_baja = extract("month", Colaborador.fecha_baja)
+    
+    resumen = {}
+    
+    filas_altas = db.query(
+        anio_alta, mes_alta, Colaborador.area_id, reclutador, baja, func.count(Colaborador.id)
+    ).filter(
+        Colaborador.fecha_alta.isnot(None)
+    ).group_by(anio_alta, mes_alta, Colaborador.area_id, reclutador, baja).all()
+    
+    for anio, mes, area_id, reclutador_id, es_baja, total in filas_altas:
+        clave = (int(anio), int(mes), int(area_id), int(reclutador_id), bool(es_baja))
+        resumen.setdefault(clave, [0, 0])[0] += total
+    
+    filas_bajas = db.query(
+        anio_baja, mes_baja, Colaborador.area_id, reclutador, func.count(Colaborador.id)
+    ).filter(
+        Colaborador.baja == True,
+        Colaborador.fecha_baja.isnot(None)
+    ).group_by(anio_baja, mes_baja, Colaborador.area_id, reclutador).all()
+    
+    for anio, mes, area_id, reclutador_id, total in filas_bajas:
+        clave = (int(anio), int(mes), int(area_id), int(reclutador_id), True)
+        resumen.setdefault(clave, [0, 0])[1] += total
+    
+    return resumen
+
+def verificar_resumen_mensual(db):
+    """Compara resumen_mensual contra colaboradores. Regresa la lista de diferencias."""
+    esperado = calcular_resumen_desde_colaboradores(db)
+    
+    actual = {}
+    for fila in db.query(ResumenMensual).all():
+        if fila.altas or fila.bajas:
+            clave = (fila.anio, fila.mes, fila.area_id, fila.reclutador_id, bool(fila.baja))
+            actual[clave] = [fila.altas, fila.bajas]
+    
+    diferencias = []
+    for clave in sorted(set(esperado) | set(actual)):
+        if esperado.get(clave, [0, 0]) != actual.get(clave, [0, 0]):
+            diferencias.append({
+                "clave": clave,
+                "esperado": esperado.get(clave, [0, 0]),
+                "actual": actual.get(clave, [0, 0])
+            })
+    
+    return diferencias
+
+def reconstruir_resumen_mensual():
+    """Recalcula resumen_mensual desde cero y lo verifica contra colaboradores."""
+    with get_db() as db:
+        resumen = calcular_resumen_desde_colaboradores(db)
+        
+        db.query(ResumenMensual).delete(synchronize_session=False)
+        db.add_all([
+            ResumenMensual(
+                anio=anio,
+                mes=mes,
+                area_id=area_id,
+                reclutador_id=reclutador_id,
+                baja=baja,
+                altas=altas,
+                bajas=bajas
+            )
+            for (anio, mes, area_id, reclutador_id, baja), (altas, bajas) in resumen.items()
+        ])
+        db.flush()
+        
+        diferencias = verificar_resumen_mensual(db)
+    
+    cache.clear()
+    logger.info(f"Resumen mensual reconstruido: {len(resumen)} filas, {len(diferencias)} diferencias")
+    return len(resumen), diferencias
+
+@app.cli.command("reconstruir-resumen")
+def cli_reconstruir_resumen():
+    """Recalcula resumen_mensual desde cero y lo verifica."""
+    filas, diferencias = reconstruir_resumen_mensual()
+    print(f"✓ resumen_mensual reconstruido con {filas} filas")
+    
+    if diferencias:
+        print(f"❌ {len(diferencias)} diferencias contra colaboradores:")
+        for dif in diferencias:
+            print(f"   {dif['clave']}: esperado={dif['esperado']} actual={dif['actual']}")
+    else:
+        print("✅ Resumen consistente con colaboradores")
+
+# ======================================
+# AGREGACIONES BI (SOBRE RESUMEN MENSUAL)
+# ======================================
+MESES = ["Ene", "Feb", "Mar", "Abr", "May", "Jun",
+         "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+
+ANIO_MINIMO, ANIO_MAXIMO = 1900, 2999
+
+def periodo_invalido(year, month=None):
+    """Mensaje de error si el año o el mes están fuera de rango; None si son válidos."""
+    if not ANIO_MINIMO <= year <= ANIO_MAXIMO:
+        return f"year debe estar entre {ANIO_MINIMO} y {ANIO_MAXIMO}"
+    if month is not None and not 1 <= month <= 12:
+        return "month debe estar entre 1 y 12"
+    return None
+
+def rango_periodo(year, month=None):
+    """Rango semiabierto [inicio, fin) de un año completo o de un mes."""
+    if month:
+        inicio = date(year, month, 1)
+        fin = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    else:
+        inicio = date(year, 1, 1)
+        fin = date(year + 1, 1, 1)
+    return inicio, fin
+
+def filtro_periodo(columna, year, month=None):
+    """
+    Filtros sargables para un periodo: columna >= inicio AND columna < fin.
+    A diferencia de extract(year/month), permiten usar el índice de la columna.
+    """
+    inicio, fin = rango_periodo(year, month)
+    return [columna >= inicio, columna < fin]
+
+def _celda_contrataciones():
+    """Celda vacía del pivote mes × segmento × estado."""
+    return {
+        "gestion": 0,
+        "gestion_activos": 0,
+        "comercial": 0,
+        "comercial_activos": 0
+    }
+
+def filtro_resumen(year, month=None):
+    """Filtros de periodo sobre resumen_mensual."""
+    filtros = [ResumenMensual.anio == year]
+    if month:
+        filtros.append(ResumenMensual.mes == month)
+    return filtros
+
+def _segmento_comercial_resumen():
+    """Comercial para bajas: área comercial o reclutador comercial."""
+    return or_(
+        ResumenMensual.area_id == app.config['AREA_COMERCIAL_ID'],
+        ResumenMensual.reclutador_id.in_(app.config['RECLUTADOR_COMERCIAL_IDS'])
+    )
+
+def agregar_contrataciones_por_mes(db, year, month=None):
+    """
+    Cuenta contrataciones del año agrupando por mes, segmento (comercial/gestión)
+    y estado de baja en UNA sola consulta sobre resumen_mensual.
+    Regresa {mes_num: celda}.
+    """
+    es_comercial = case(
+        (ResumenMensual.area_id == app.config['AREA_COMERCIAL_ID'], 1),
+        else_=0
+    ).label("es_comercial")
+    
+    filas = db.query(
+        ResumenMensual.mes,
+        es_comercial,
+        ResumenMensual.baja,
+        func.sum(ResumenMensual.altas).label("total")
+    ).filter(
+        *filtro_resumen(year, month)
+    ).group_by(ResumenMensual.mes, es_comercial, ResumenMensual.baja).all()
+    
+    # Pivotear en Python
+    pivote = {}
+    for fila in filas:
+        total = int(fila.total or 0)
+        celda = pivote.setdefault(int(fila.mes), _celda_contrataciones())
+        segmento = "comercial" if fila.es_comercial else "gestion"
+        celda[segmento] += total
+        if not fila.baja:
+            celda[f"{segmento}_activos"] += total
+    
+    return pivote
+
+def agregar_bajas_por_mes(db, year, month=None):
+    """Cuenta bajas por mes de fecha_baja y segmento en una sola consulta. Regresa {mes_num: celda}."""
+    es_comercial = case((_segmento_comercial_resumen(), 1), else_=0).label("es_comercial")
+    
+    filas = db.query(
+        ResumenMensual.mes,
+        es_comercial,
+        func.sum(ResumenMensual.bajas).label("total")
+    ).filter(
+        *filtro_resumen(year, month),
+        ResumenMensual.baja == True
+    ).group_by(ResumenMensual.mes, es_comercial).all()
+    
+    pivote = {}
+    for fila in filas:
+        celda = pivote.setdefault(int(fila.mes), {"gestion": 0, "comercial": 0})
+        celda["comercial" if fila.es_comercial else "gestion"] += int(fila.total or 0)
+    
+    return pivote
+
+def _sumar_si(condicion, valor=1):
+    """SUM(CASE WHEN condicion THEN valor ELSE 0 END) para conteos condicionales."""
+    return func.coalesce(func.sum(case((condicion, valor), else_=0)), 0)
+
+def calcular_kpis(db, year, month=None):
+    """
+    Calcula todos los contadores de KPIs en UNA sola consulta usando
+    agregados condicionales sobre resumen_mensual (por año/mes de alta).
+    """
+    es_comercial = ResumenMensual.area_id == app.config['AREA_COMERCIAL_ID']
+    es_gestion = ResumenMensual.area_id != app.config['AREA_COMERCIAL_ID']
+    altas = ResumenMensual.altas
+    
+    query = db.query(
+        func.coalesce(func.sum(altas), 0).label("total"),
+        _sumar_si(ResumenMensual.baja == False, altas).label("activos"),
+        _sumar_si(es_comercial, altas).label("comercial"),
+        _sumar_si(es_gestion, altas).label("gestion"),
+        _sumar_si(and_(ResumenMensual.baja == True, es_comercial), altas).label("bajas_comercial"),
+        _sumar_si(and_(ResumenMensual.baja == True, es_gestion), altas).label("bajas_gestion")
+    ).filter(*filtro_resumen(year, month))
+    
+    fila = query.one()
+    
+    return {
+        "total": int(fila.total or 0),
+        "activos": int(fila.activos or 0),
+        "comercial": int(fila.comercial or 0),
+        "gestion": int(fila.gestion or 0),
+        "bajas_comercial": int(fila.bajas_comercial or 0),
+        "bajas_gestion": int(fila.bajas_gestion or 0)
+    }
+
 # ======================================
 # API - DASHBOARD DATOS
 # ======================================
 
 @app.route("/api/kpis")
+@cache_bi("kpis")
+@lectura_replica
 @require_db
 def api_kpis():
     """API para KPIs del dashboard."""
     year = request.args.get("year", type=int, default=date.today().year)
     month = request.args.get("month", type=int)
     
+    error = periodo_invalido(year, month)
+    if error:
+        return jsonify({"error": error}), 400
+    
     logger.info(f"API KPIs solicitada para año: {year}, mes: {month}")
     
     try:
         db = g.db
         
-        # Filtros base para TODAS las contrataciones (incluyendo bajas)
-        filters_total = [
-            extract("year", Colaborador.fecha_alta) == year
-        ]
-        
-        # Filtros para contrataciones ACTIVAS (sin baja)
-        filters_activos = [
-            extract("year", Colaborador.fecha_alta) == year,
-            Colaborador.baja == False
-        ]
-        
-        # Filtro para COMERCIAL: area_id = 2
-        filters_comercial = Colaborador.area_id == app.config['AREA_COMERCIAL_ID']
-        
-        # Filtro para GESTIÓN: NO comercial (area_id != 2)
-        filters_gestion = Colaborador.area_id != app.config['AREA_COMERCIAL_ID']
-        
-        # Agregar filtro de mes si se especifica
-        if month:
-            filters_total.append(extract("month", Colaborador.fecha_alta) == month)
-            filters_activos.append(extract("month", Colaborador.fecha_alta) == month)
-        
-        # TOTAL de contrataciones (INCLUYENDO BAJAS)
-        total_contrataciones = db.query(func.count(Colaborador.id))\
-            .filter(*filters_total)\
-            .scalar() or 0
-        
-        # Contrataciones ACTIVAS (sin baja)
-        total_activos = db.query(func.count(Colaborador.id))\
-            .filter(*filters_activos)\
-            .scalar() or 0
-        
-        # Contrataciones COMERCIALES (area_id = 2) - TOTAL (INCLUYENDO BAJAS)
-        total_comercial = db.query(func.count(Colaborador.id))\
-            .filter(
-                *filters_total,
-                filters_comercial
-            )\
-            .scalar() or 0
-        
-        # Contrataciones GESTIÓN (no comercial) - TOTAL (INCLUYENDO BAJAS)
-        total_gestion = db.query(func.count(Colaborador.id))\
-            .filter(
-                *filters_total,
-                filters_gestion
-            )\
-            .scalar() or 0
-        
-        # Bajas comerciales - MODIFICADO: Contar por año de alta
-        filters_baja_comercial = [
-            Colaborador.baja == True,
-            extract("year", Colaborador.fecha_alta) == year,  # Cambiado: usar fecha_alta
-            filters_comercial
-        ]
-        
-        # Bajas gestión - MODIFICADO: Contar por año de alta
-        filters_baja_gestion = [
-            Colaborador.baja == True,
-            extract("year", Colaborador.fecha_alta) == year,  # Cambiado: usar fecha_alta
-            filters_gestion
-        ]
+        # Todos los contadores en una sola consulta (bajas se cuentan por año de alta)
+        kpis = calcular_kpis(db, year, month)
         
-        if month:
-            # También filtrar por mes de alta para bajas
-            filters_baja_comercial.append(extract("month", Colaborador.fecha_alta) == month)
-            filters_baja_gestion.append(extract("month", Colaborador.fecha_alta) == month)
-        
-        # Bajas comerciales
-        bajas_comercial = db.query(func.count(Colaborador.id))\
-            .filter(*filters_baja_comercial)\
-            .scalar() or 0
-        
-        # Bajas gestión
-        bajas_gestion = db.query(func.count(Colaborador.id))\
-            .filter(*filters_baja_gestion)\
-            .scalar() or 0
+        total_contrataciones = kpis["total"]     # Incluye bajas
+        total_activos = kpis["activos"]          # Solo activos
         
         # Tasa de retención (basada en activos vs total)
         retencion = 0
         if total_contrataciones > 0:
             retencion = round(total_activos / total_contrataciones * 100, 1)
         
-        logger.info(f"KPIs calculados: total={total_contrataciones}, activos={total_activos}, comercial={total_comercial}, gestion={total_gestion}")
-        logger.info(f"Bajas: comercial={bajas_comercial}, gestion={bajas_gestion}")
+        logger.info(f"KPIs calculados: total={total_contrataciones}, activos={total_activos}, comercial={kpis['comercial']}, gestion={kpis['gestion']}")
+        logger.info(f"Bajas: comercial={kpis['bajas_comercial']}, gestion={kpis['bajas_gestion']}")
         
         return jsonify({
             "total": total_contrataciones,          # Incluye bajas
             "activos": total_activos,               # Solo activos
-            "comercial": total_comercial,           # Comercial TOTAL (incluye bajas)
-            "gestion": total_gestion,               # Gestión TOTAL (incluye bajas)
-            "bajas_comercial": bajas_comercial,
-            "bajas_gestion": bajas_gestion,
+            "comercial": kpis["comercial"],         # Comercial TOTAL (incluye bajas)
+            "gestion": kpis["gestion"],             # Gestión TOTAL (incluye bajas)
+            "bajas_comercial": kpis["bajas_comercial"],
+            "bajas_gestion": kpis["bajas_gestion"],
             "retencion": retencion,
             "year": year,
             "month": month if month else "todos"
@@ -2220,308 +4102,43 @@ def api_kpis():
 
 
 @app.route("/api/contrataciones")
+@cache_bi("contrataciones")
+@lectura_replica
 @require_db
 def api_contrataciones():
     """API para obtener contrataciones por mes."""
     year = request.args.get("year", type=int, default=date.today().year)
     month = request.args.get("month", type=int)
     
-    logger.info(f"API Contrataciones solicitada para año: {year}, mes: {month}")
-    
-    try:
-        db = g.db
-        
-        meses = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", 
-                "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
-        
-        resultados = []
-        
-        # Si se especifica un mes, solo devolver ese mes
-        if month:
-            mes_range = [month]
-        else:
-            mes_range = range(1, 13)
-        
-        # Definir filtros para comercial y gestión
-        filtro_comercial = Colaborador.area_id == app.config['AREA_COMERCIAL_ID']
-        filtro_gestion = Colaborador.area_id != app.config['AREA_COMERCIAL_ID']
-        
-        for mes_num in mes_range:
-            # Filtros para TOTAL de contrataciones (INCLUYENDO BAJAS)
-            filters_total = [
-                extract("year", Colaborador.fecha_alta) == year,
-                extract("month", Colaborador.fecha_alta) == mes_num
-            ]
-            
-            # Filtros para contrataciones ACTIVAS (sin baja)
-            filters_activos = [
-                extract("year", Colaborador.fecha_alta) == year,
-                extract("month", Colaborador.fecha_alta) == mes_num,
-                Colaborador.baja == False
-            ]
-            
-            # Contrataciones de GESTIÓN - TOTAL (incluye bajas)
-            gestion_total = db.query(func.count(Colaborador.id))\
-                .filter(
-                    *filters_total,
-                    filtro_gestion
-                )\
-                .scalar() or 0
-            
-            # Contrataciones de COMERCIAL - TOTAL (incluye bajas)
-            comercial_total = db.query(func.count(Colaborador.id))\
-                .filter(
-                    *filters_total,
-                    filtro_comercial
-                )\
-                .scalar() or 0
-            
-            # Contrataciones de GESTIÓN - ACTIVAS (sin baja)
-            gestion_activos = db.query(func.count(Colaborador.id))\
-                .filter(
-                    *filters_activos,
-                    filtro_gestion
-                )\
-                .scalar() or 0
-            
-            # Contrataciones de COMERCIAL - ACTIVAS (sin baja)
-            comercial_activos = db.query(func.count(Colaborador.id))\
-                .filter(
-                    *filters_activos,
-                    filtro_comercial
-                )\
-                .scalar() or 0
-            
-            # Total de contrataciones para este mes (TODAS, incluyendo bajas)
-            total_mes_con_bajas = gestion_total + comercial_total
-            
-            # Total de contrataciones ACTIVAS para este mes
-            total_mes_activos = gestion_activos + comercial_activos
-            
-            resultados.append({
-                "mes": meses[mes_num - 1],
-                "gestion": gestion_total,          # Total gestión (incluye bajas)
-                "gestion_activos": gestion_activos, # Gestión activos
-                "comercial": comercial_total,       # Total comercial (incluye bajas)
-                "comercial_activos": comercial_activos, # Comercial activos
-                "total_activos": total_mes_activos,
-                "total_con_bajas": total_mes_con_bajas,
-                "mes_num": mes_num
-            })
-        
-        logger.info(f"Contrataciones para {year}: {len(resultados)} registros")
-        
-        # Si se filtró por un mes específico, devolver solo ese mes
-        if month and len(resultados) > 0:
-            return jsonify(resultados[0])
-        
-        return jsonify(resultados)
-        
-    except Exception as e:
-        logger.error(f"Error in contrataciones API: {e}", exc_info=True)
-        return jsonify({"error": "Error al obtener contrataciones"}), 500
-
-
-
-
-    """API para obtener contrataciones por mes."""
-    year = request.args.get("year", type=int, default=date.today().year)
-    month = request.args.get("month", type=int)
+    error = periodo_invalido(year, month)
+    if error:
+        return jsonify({"error": error}), 400
     
     logger.info(f"API Contrataciones solicitada para año: {year}, mes: {month}")
     
     try:
         db = g.db
         
-        meses = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", 
-                "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
-        
-        resultados = []
-        
-        if month:
-            mes_range = [month]
-        else:
-            mes_range = range(1, 13)
-        
-        filtro_comercial = or_(
-            Colaborador.area_id == app.config['AREA_COMERCIAL_ID'],
-            Colaborador.reclutador_id.in_(app.config['RECLUTADOR_COMERCIAL_IDS'])
-        )
-        
-        filtro_gestion = and_(
-            Colaborador.area_id != app.config['AREA_COMERCIAL_ID'],
-            or_(
-                Colaborador.reclutador_id.is_(None),
-                ~Colaborador.reclutador_id.in_(app.config['RECLUTADOR_COMERCIAL_IDS'])
-            )
-        )
-        
-        for mes_num in mes_range:
-            # Filtros para TOTAL de contrataciones (INCLUYENDO BAJAS) - REMOVIENDO EL FILTRO "baja == False"
-            filters_total = [
-                extract("year", Colaborador.fecha_alta) == year,
-                extract("month", Colaborador.fecha_alta) == mes_num
-            ]
-            
-            # Filtros para contrataciones ACTIVAS (sin baja)
-            filters_activos = [
-                extract("year", Colaborador.fecha_alta) == year,
-                extract("month", Colaborador.fecha_alta) == mes_num,
-                Colaborador.baja == False
-            ]
-            
-            # Contrataciones de GESTIÓN - TOTAL (incluye bajas)
-            gestion_total = db.query(func.count(Colaborador.id))\
-                .filter(
-                    *filters_total,  # SIN FILTRO DE BAJA
-                    filtro_gestion
-                )\
-                .scalar() or 0
-            
-            # Contrataciones de COMERCIAL - TOTAL (incluye bajas)
-            comercial_total = db.query(func.count(Colaborador.id))\
-                .filter(
-                    *filters_total,  # SIN FILTRO DE BAJA
-                    filtro_comercial
-                )\
-                .scalar() or 0
-            
-            # Contrataciones de GESTIÓN - ACTIVAS (sin baja)
-            gestion_activos = db.query(func.count(Colaborador.id))\
-                .filter(
-                    *filters_activos,
-                    filtro_gestion
-                )\
-                .scalar() or 0
-            
-            # Contrataciones de COMERCIAL - ACTIVAS (sin baja)
-            comercial_activos = db.query(func.count(Colaborador.id))\
-                .filter(
-                    *filters_activos,
-                    filtro_comercial
-                )\
-                .scalar() or 0
-            
-            total_mes_con_bajas = gestion_total + comercial_total
-            total_mes_activos = gestion_activos + comercial_activos
-            
-            resultados.append({
-                "mes": meses[mes_num - 1],
-                "gestion": gestion_total,          # Total gestión (INCLUYE BAJAS)
-                "gestion_activos": gestion_activos, # Gestión solo activos
-                "comercial": comercial_total,       # Total comercial (INCLUYE BAJAS)
-                "comercial_activos": comercial_activos, # Comercial solo activos
-                "total_activos": total_mes_activos,
-                "total_con_bajas": total_mes_con_bajas,
-                "mes_num": mes_num
-            })
-        
-        logger.info(f"Contrataciones para {year}: {len(resultados)} registros")
-        
-        if month and len(resultados) > 0:
-            return jsonify(resultados[0])
-        
-        return jsonify(resultados)
-        
-    except Exception as e:
-        logger.error(f"Error in contrataciones API: {e}", exc_info=True)
-        return jsonify({"error": "Error al obtener contrataciones"}), 500
-
-
-    """API para obtener contrataciones por mes."""
-    year = request.args.get("year", type=int, default=date.today().year)
-    month = request.args.get("month", type=int)
-    
-    logger.info(f"API Contrataciones solicitada para año: {year}, mes: {month}")
-    
-    try:
-        db = g.db
-        
-        meses = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", 
-                "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
-        
-        resultados = []
-        
         # Si se especifica un mes, solo devolver ese mes
         if month:
             mes_range = [month]
         else:
             mes_range = range(1, 13)
         
-        # Definir filtros para comercial y gestión
-        filtro_comercial = or_(
-            Colaborador.area_id == app.config['AREA_COMERCIAL_ID'],
-            Colaborador.reclutador_id.in_(app.config['RECLUTADOR_COMERCIAL_IDS'])
-        )
-        
-        filtro_gestion = and_(
-            Colaborador.area_id != app.config['AREA_COMERCIAL_ID'],
-            or_(
-                Colaborador.reclutador_id.is_(None),
-                ~Colaborador.reclutador_id.in_(app.config['RECLUTADOR_COMERCIAL_IDS'])
-            )
-        )
+        pivote = agregar_contrataciones_por_mes(db, year, month)
         
+        resultados = []
         for mes_num in mes_range:
-            # Filtros para TOTAL de contrataciones (INCLUYENDO BAJAS)
-            filters_total = [
-                extract("year", Colaborador.fecha_alta) == year,
-                extract("month", Colaborador.fecha_alta) == mes_num
-            ]
-            
-            # Filtros para contrataciones ACTIVAS (sin baja)
-            filters_activos = [
-                extract("year", Colaborador.fecha_alta) == year,
-                extract("month", Colaborador.fecha_alta) == mes_num,
-                Colaborador.baja == False
-            ]
-            
-            # Contrataciones de GESTIÓN - TOTAL (incluye bajas)
-            gestion_total = db.query(func.count(Colaborador.id))\
-                .filter(
-                    *filters_total,
-                    filtro_gestion
-                )\
-                .scalar() or 0
-            
-            # Contrataciones de COMERCIAL - TOTAL (incluye bajas)
-            comercial_total = db.query(func.count(Colaborador.id))\
-                .filter(
-                    *filters_total,
-                    filtro_comercial
-                )\
-                .scalar() or 0
-            
-            # Contrataciones de GESTIÓN - ACTIVAS (sin baja)
-            gestion_activos = db.query(func.count(Colaborador.id))\
-                .filter(
-                    *filters_activos,
-                    filtro_gestion
-                )\
-                .scalar() or 0
-            
-            # Contrataciones de COMERCIAL - ACTIVAS (sin baja)
-            comercial_activos = db.query(func.count(Colaborador.id))\
-                .filter(
-                    *filters_activos,
-                    filtro_comercial
-                )\
-                .scalar() or 0
-            
-            # Total de contrataciones para este mes (TODAS, incluyendo bajas)
-            total_mes_con_bajas = gestion_total + comercial_total
-            
-            # Total de contrataciones ACTIVAS para este mes
-            total_mes_activos = gestion_activos + comercial_activos
+            celda = pivote.get(mes_num, _celda_contrataciones())
             
             resultados.append({
-                "mes": meses[mes_num - 1],
-                "gestion": gestion_total,          # Total gestión (incluye bajas)
-                "gestion_activos": gestion_activos, # Gestión activos
-                "comercial": comercial_total,       # Total comercial (incluye bajas)
-                "comercial_activos": comercial_activos, # Comercial activos
-                "total_activos": total_mes_activos,
-                "total_con_bajas": total_mes_con_bajas,
+                "mes": MESES[mes_num - 1],
+                "gestion": celda["gestion"],                    # Total gestión (incluye bajas)
+                "gestion_activos": celda["gestion_activos"],    # Gestión activos
+                "comercial": celda["comercial"],                # Total comercial (incluye bajas)
+                "comercial_activos": celda["comercial_activos"],  # Comercial activos
+                "total_activos": celda["gestion_activos"] + celda["comercial_activos"],
+                "total_con_bajas": celda["gestion"] + celda["comercial"],
                 "mes_num": mes_num
             })
         
@@ -2538,72 +4155,41 @@ def api_contrataciones():
         return jsonify({"error": "Error al obtener contrataciones"}), 500
 
 @app.route("/api/bajas")
+@cache_bi("bajas")
+@lectura_replica
 @require_db
 def api_bajas():
     """API para obtener bajas por mes."""
     year = request.args.get("year", type=int, default=date.today().year)
     month = request.args.get("month", type=int)
     
+    error = periodo_invalido(year, month)
+    if error:
+        return jsonify({"error": error}), 400
+    
     logger.info(f"API Bajas solicitada para año: {year}, mes: {month}")
     
     try:
         db = g.db
         
-        meses = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", 
-                "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
-        
-        resultados = []
-        
-        # Filtros para comercial y gestión
-        filtro_comercial = or_(
-            Colaborador.area_id == app.config['AREA_COMERCIAL_ID'],
-            Colaborador.reclutador_id.in_(app.config['RECLUTADOR_COMERCIAL_IDS'])
-        )
-        
-        filtro_gestion = and_(
-            Colaborador.area_id != app.config['AREA_COMERCIAL_ID'],
-            or_(
-                Colaborador.reclutador_id.is_(None),
-                ~Colaborador.reclutador_id.in_(app.config['RECLUTADOR_COMERCIAL_IDS'])
-            )
-        )
-        
         # Si se especifica un mes, solo devolver ese mes
         if month:
             mes_range = [month]
         else:
             mes_range = range(1, 13)
         
+        # Comercial = área comercial o reclutador comercial; gestión = el resto
+        pivote = agregar_bajas_por_mes(db, year, month)
+        
+        resultados = []
         for mes_num in mes_range:
-            # Filtros base para bajas del mes
-            filters_mes = [
-                Colaborador.baja == True,
-                Colaborador.fecha_baja.isnot(None),
-                extract("year", Colaborador.fecha_baja) == year,
-                extract("month", Colaborador.fecha_baja) == mes_num
-            ]
-            
-            # Bajas de GESTIÓN (no comercial)
-            gestion = db.query(func.count(Colaborador.id))\
-                .filter(
-                    *filters_mes,
-                    filtro_gestion
-                )\
-                .scalar() or 0
-            
-            # Bajas de COMERCIAL (comercial)
-            comercial = db.query(func.count(Colaborador.id))\
-                .filter(
-                    *filters_mes,
-                    filtro_comercial
-                )\
-                .scalar() or 0
+            celda = pivote.get(mes_num, {"gestion": 0, "comercial": 0})
             
             resultados.append({
-                "mes": meses[mes_num - 1],
-                "gestion": gestion,
-                "comercial": comercial,
-                "total": gestion + comercial,
+                "mes": MESES[mes_num - 1],
+                "gestion": celda["gestion"],
+                "comercial": celda["comercial"],
+                "total": celda["gestion"] + celda["comercial"],
                 "mes_num": mes_num
             })
         
@@ -2619,143 +4205,209 @@ def api_bajas():
         logger.error(f"Error in bajas API: {e}", exc_info=True)
         return jsonify({"error": "Error al obtener bajas"}), 500
 
+MAX_ANIOS_COMPARATIVA = 30
+
+def rango_anios(inicio, fin):
+    """Años de inicio a fin (en cualquier orden), validados antes de generar el rango."""
+    for year in (inicio, fin):
+        error = periodo_invalido(year)
+        if error:
+            raise ValueError(error)
+    if abs(fin - inicio) + 1 > MAX_ANIOS_COMPARATIVA:
+        raise ValueError(f"Máximo {MAX_ANIOS_COMPARATIVA} años por comparativa")
+    return range(min(inicio, fin), max(inicio, fin) + 1)
+
+def parse_anios_comparativa():
+    """
+    Obtiene los años a comparar desde la query string. Acepta:
+    years[]=2023&years[]=2024, years=2019,2021,2024, years=2015-2025
+    o desde=2015&hasta=2025. Por defecto, los últimos tres años.
+    """
+    years = set(request.args.getlist("years[]", type=int))
+    
+    for valor in request.args.getlist("years"):
+        for parte in valor.split(","):
+            parte = parte.strip()
+            if not parte:
+                continue
+            extremos = [x.strip() for x in parte.split("-", 1)]
+            if not all(x.isdigit() for x in extremos):
+                raise ValueError(f"'{parte}' no es un año ni un rango AAAA-AAAA")
+            if len(extremos) == 2:
+                years.update(rango_anios(int(extremos[0]), int(extremos[1])))
+            else:
+                years.add(int(extremos[0]))
+            if len(years) > MAX_ANIOS_COMPARATIVA:
+                raise ValueError(f"Máximo {MAX_ANIOS_COMPARATIVA} años por comparativa")
+    
+    desde = request.args.get("desde", type=int)
+    hasta = request.args.get("hasta", type=int)
+    if desde is not None or hasta is not None:
+        desde = desde if desde is not None else hasta
+        hasta = hasta if hasta is not None else date.today().year
+        years.update(rango_anios(desde, hasta))
+    
+    if not years:
+        current_year = date.today().year
+        years = {current_year - 2, current_year - 1, current_year}
+    
+    if len(years) > MAX_ANIOS_COMPARATIVA:
+        raise ValueError(f"Máximo {MAX_ANIOS_COMPARATIVA} años por comparativa")
+    for year in years:
+        error = periodo_invalido(year)
+        if error:
+            raise ValueError(error)
+    
+    return sorted(years)
+
+def agregar_comparativa_anios(db, years):
+    """
+    Serie mensual (total/comercial/gestión, incluyendo bajas) de varios años
+    en UNA sola consulta agrupada. Regresa {year: [12 meses]}.
+    """
+    es_comercial = case((_segmento_comercial_resumen(), 1), else_=0).label("es_comercial")
+    
+    filas = db.query(
+        ResumenMensual.anio,
+        ResumenMensual.mes,
+        es_comercial,
+        func.sum(ResumenMensual.altas).label("total")
+    ).filter(
+        ResumenMensual.anio.in_(years)
+    ).group_by(ResumenMensual.anio, ResumenMensual.mes, es_comercial).all()
+    
+    conteos = {}
+    for fila in filas:
+        celda = conteos.setdefault((int(fila.anio), int(fila.mes)), {"comercial": 0, "gestion": 0})
+        celda["comercial" if fila.es_comercial else "gestion"] += int(fila.total or 0)
+    
+    comparativa = {}
+    for year in years:
+        datos_year = []
+        for mes_num in range(1, 13):
+            celda = conteos.get((year, mes_num), {"comercial": 0, "gestion": 0})
+            datos_year.append({
+                "mes": MESES[mes_num - 1],
+                "total": celda["comercial"] + celda["gestion"],  # TOTAL incluyendo bajas
+                "comercial": celda["comercial"],                  # Comercial incluyendo bajas
+                "gestion": celda["gestion"],                      # Gestión incluyendo bajas
+                "mes_num": mes_num
+            })
+        comparativa[year] = datos_year
+    
+    return comparativa
+
 @app.route("/api/contrataciones/comparativa")
+@lectura_replica
 @require_db
 def api_contrataciones_comparativa():
     """API para comparativa entre años."""
-    years = request.args.getlist("years[]", type=int)
-    
-    if not years:
-        current_year = date.today().year
-        years = [current_year - 2, current_year - 1, current_year]
+    try:
+        years = parse_anios_comparativa()
+    except ValueError as e:
+        return jsonify({"error": f"Años inválidos: {e}"}), 400
     
     logger.info(f"API Comparativa solicitada para años: {years}")
     
     try:
         db = g.db
-        meses = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", 
-                "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
-        
-        filtro_comercial = or_(
-            Colaborador.area_id == app.config['AREA_COMERCIAL_ID'],
-            Colaborador.reclutador_id.in_(app.config['RECLUTADOR_COMERCIAL_IDS'])
-        )
-        
-        filtro_gestion = and_(
-            Colaborador.area_id != app.config['AREA_COMERCIAL_ID'],
-            or_(
-                Colaborador.reclutador_id.is_(None),
-                ~Colaborador.reclutador_id.in_(app.config['RECLUTADOR_COMERCIAL_IDS'])
-            )
-        )
         
         comparativa = {}
+        faltantes = []
         
+        # Cada año se cachea por separado para invalidarlo con precisión. Las
+        # claves se fijan antes de consultar para no guardar bajo una generación nueva
+        claves = {year: clave_cache_bi("comparativa", year) for year in years}
         for year in years:
-            datos_year = []
-            
-            for mes_num in range(1, 13):
-                # Total de contrataciones (INCLUYENDO BAJAS) - REMOVIENDO "baja == False"
-                total = db.query(func.count(Colaborador.id))\
-                    .filter(
-                        extract("year", Colaborador.fecha_alta) == year,
-                        extract("month", Colaborador.fecha_alta) == mes_num
-                        # REMOVED: Colaborador.baja == False
-                    )\
-                    .scalar() or 0
-                
-                # Contrataciones comerciales - TOTAL (INCLUYENDO BAJAS)
-                comercial = db.query(func.count(Colaborador.id))\
-                    .filter(
-                        extract("year", Colaborador.fecha_alta) == year,
-                        extract("month", Colaborador.fecha_alta) == mes_num,
-                        # REMOVED: Colaborador.baja == False,
-                        filtro_comercial
-                    )\
-                    .scalar() or 0
-                
-                # Contrataciones gestión - TOTAL (INCLUYENDO BAJAS)
-                gestion = db.query(func.count(Colaborador.id))\
-                    .filter(
-                        extract("year", Colaborador.fecha_alta) == year,
-                        extract("month", Colaborador.fecha_alta) == mes_num,
-                        # REMOVED: Colaborador.baja == False,
-                        filtro_gestion
-                    )\
-                    .scalar() or 0
-                
-                datos_year.append({
-                    "mes": meses[mes_num - 1],
-                    "total": total,        # TOTAL incluyendo bajas
-                    "comercial": comercial, # Comercial incluyendo bajas
-                    "gestion": gestion,    # Gestión incluyendo bajas
-                    "mes_num": mes_num
-                })
-            
-            comparativa[str(year)] = datos_year
+            datos_year = cache.get(claves[year])
+            if datos_year is not None:
+                comparativa[str(year)] = datos_year
+            else:
+                faltantes.append(year)
+        
+        # Todos los años faltantes en una sola consulta
+        if faltantes:
+            for year, datos_year in agregar_comparativa_anios(db, faltantes).items():
+                cache.set(claves[year], datos_year, timeout=timeout_cache_bi(year))
+                comparativa[str(year)] = datos_year
         
         return jsonify(comparativa)
         
     except Exception as e:
         logger.error(f"Error in comparativa API: {e}", exc_info=True)
         return jsonify({"error": "Error al obtener comparativa"}), 500
+
 @app.route("/api/contrataciones/reclutador")
+@cache_bi("reclutador")
+@lectura_replica
 @require_db
 def api_contrataciones_reclutador():
     """API para contrataciones por reclutador."""
     year = request.args.get("year", type=int, default=date.today().year)
     
+    error = periodo_invalido(year)
+    if error:
+        return jsonify({"error": error}), 400
+    
     logger.info(f"API Reclutadores solicitada para año: {year}")
     
     try:
         db = g.db
         
-        meses = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", 
-                "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
-        
-        # Obtener todos los reclutadores que tienen colaboradores en el año (INCLUYENDO BAJAS)
-        reclutadores = db.query(Reclutador)\
-            .join(Colaborador, Reclutador.id == Colaborador.reclutador_id)\
-            .filter(
-                extract("year", Colaborador.fecha_alta) == year
-            )\
-            .distinct()\
-            .order_by(Reclutador.nombre)\
-            .all()
+        # Matriz reclutador × mes × estado en una sola consulta (INCLUYENDO BAJAS).
+        # reclutador_id 0 en el resumen = sin reclutador asignado
+        filas = db.query(
+            ResumenMensual.reclutador_id,
+            Reclutador.nombre,
+            ResumenMensual.mes,
+            ResumenMensual.baja,
+            func.sum(ResumenMensual.altas).label("total")
+        ).outerjoin(
+            Reclutador, Reclutador.id == ResumenMensual.reclutador_id
+        ).filter(
+            *filtro_resumen(year)
+        ).group_by(
+            ResumenMensual.reclutador_id,
+            Reclutador.nombre,
+            ResumenMensual.mes,
+            ResumenMensual.baja
+        ).all()
         
-        resultados = []
+        # Pivotear: {reclutador_id: {"nombre": ..., "meses": {mes: [total, activos]}}}
+        matriz = {}
+        for fila in filas:
+            if fila.reclutador_id and fila.nombre is None:
+                continue  # Reclutador inexistente
+            
+            entrada = matriz.setdefault(fila.reclutador_id, {
+                "nombre": fila.nombre or "Sin reclutador asignado",
+                "meses": {}
+            })
+            celda = entrada["meses"].setdefault(int(fila.mes), [0, 0])
+            total = int(fila.total or 0)
+            celda[0] += total
+            if not fila.baja:
+                celda[1] += total
+        
+        # Reclutadores por nombre y al final "Sin reclutador asignado"
+        orden = sorted(
+            matriz.items(),
+            key=lambda item: (item[0] == 0, item[1]["nombre"] if item[0] else "")
+        )
         
-        for reclutador in reclutadores:
+        resultados = []
+        for reclutador_id, entrada in orden:
             contratos_por_mes = []
-            contratos_activos_por_mes = []
             total_anual = 0
             total_anual_activos = 0
             
             for mes_num in range(1, 13):
-                # Contar TOTAL de contrataciones por reclutador y mes (INCLUYENDO BAJAS)
-                total = db.query(func.count(Colaborador.id))\
-                    .filter(
-                        extract("year", Colaborador.fecha_alta) == year,
-                        extract("month", Colaborador.fecha_alta) == mes_num,
-                        Colaborador.reclutador_id == reclutador.id
-                    )\
-                    .scalar() or 0
-                
-                # Contar contrataciones ACTIVAS por reclutador y mes (sin baja)
-                total_activos = db.query(func.count(Colaborador.id))\
-                    .filter(
-                        extract("year", Colaborador.fecha_alta) == year,
-                        extract("month", Colaborador.fecha_alta) == mes_num,
-                        Colaborador.baja == False,  # Solo activos
-                        Colaborador.reclutador_id == reclutador.id
-                    )\
-                    .scalar() or 0
-                
+                total, total_activos = entrada["meses"].get(mes_num, [0, 0])
                 total_anual += total
                 total_anual_activos += total_activos
                 
                 contratos_por_mes.append({
-                    "mes": meses[mes_num - 1],
+                    "mes": MESES[mes_num - 1],
                     "total": total,
                     "total_activos": total_activos,
                     "mes_num": mes_num
@@ -2763,55 +4415,13 @@ def api_contrataciones_reclutador():
             
             if total_anual > 0:
                 resultados.append({
-                    "reclutador": reclutador.nombre,
-                    "reclutador_id": reclutador.id,
+                    "reclutador": entrada["nombre"],
+                    "reclutador_id": reclutador_id,
                     "contratos": contratos_por_mes,
                     "total_anual": total_anual,
                     "total_anual_activos": total_anual_activos
                 })
         
-        # También agregar contrataciones sin reclutador asignado (INCLUYENDO BAJAS)
-        contratos_sin_reclutador = []
-        total_sin_reclutador = 0
-        total_sin_reclutador_activos = 0
-        
-        for mes_num in range(1, 13):
-            total = db.query(func.count(Colaborador.id))\
-                .filter(
-                    extract("year", Colaborador.fecha_alta) == year,
-                    extract("month", Colaborador.fecha_alta) == mes_num,
-                    Colaborador.reclutador_id.is_(None)
-                )\
-                .scalar() or 0
-            
-            total_activos = db.query(func.count(Colaborador.id))\
-                .filter(
-                    extract("year", Colaborador.fecha_alta) == year,
-                    extract("month", Colaborador.fecha_alta) == mes_num,
-                    Colaborador.baja == False,  # Solo activos
-                    Colaborador.reclutador_id.is_(None)
-                )\
-                .scalar() or 0
-            
-            total_sin_reclutador += total
-            total_sin_reclutador_activos += total_activos
-            
-            contratos_sin_reclutador.append({
-                "mes": meses[mes_num - 1],
-                "total": total,
-                "total_activos": total_activos,
-                "mes_num": mes_num
-            })
-        
-        if total_sin_reclutador > 0:
-            resultados.append({
-                "reclutador": "Sin reclutador asignado",
-                "reclutador_id": 0,
-                "contratos": contratos_sin_reclutador,
-                "total_anual": total_sin_reclutador,
-                "total_anual_activos": total_sin_reclutador_activos
-            })
-        
         # Ordenar por total anual descendente
         resultados.sort(key=lambda x: x["total_anual"], reverse=True)
         
@@ -2824,52 +4434,51 @@ def api_contrataciones_reclutador():
         return jsonify({"error": "Error al obtener datos de reclutadores"}), 500
 
 @app.route("/api/contrataciones/detalle-reclutador/<int:reclutador_id>")
+@lectura_replica
 @require_db
 def api_contrataciones_detalle_reclutador(reclutador_id):
     """API para obtener detalle de contrataciones por reclutador específico."""
     year = request.args.get("year", type=int, default=date.today().year)
     
+    error = periodo_invalido(year)
+    if error:
+        return jsonify({"error": error}), 400
+    
     logger.info(f"API Detalle Reclutador {reclutador_id} solicitada para año: {year}")
     
     try:
         db = g.db
         
-        meses = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", 
-                "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
-        
-        # Verificar si es "Sin reclutador asignado"
+        # Verificar si es "Sin reclutador asignado" (reclutador_id 0 en el resumen)
         if reclutador_id == 0:
             reclutador_nombre = "Sin reclutador asignado"
-            reclutador_id_filter = None
         else:
             reclutador = db.query(Reclutador).filter_by(id=reclutador_id).first()
             if not reclutador:
                 return jsonify({"error": "Reclutador no encontrado"}), 404
             reclutador_nombre = reclutador.nombre
-            reclutador_id_filter = reclutador_id
+        
+        # Contrataciones activas por mes en una sola consulta
+        filas = db.query(
+            ResumenMensual.mes,
+            func.sum(ResumenMensual.altas).label("total")
+        ).filter(
+            *filtro_resumen(year),
+            ResumenMensual.baja == False,
+            ResumenMensual.reclutador_id == reclutador_id
+        ).group_by(ResumenMensual.mes).all()
+        
+        por_mes = {int(fila.mes): int(fila.total or 0) for fila in filas}
         
         contratos_por_mes = []
         total_anual = 0
         
         for mes_num in range(1, 13):
-            # Contar contrataciones por reclutador y mes (solo activos)
-            query = db.query(func.count(Colaborador.id))\
-                .filter(
-                    extract("year", Colaborador.fecha_alta) == year,
-                    extract("month", Colaborador.fecha_alta) == mes_num,
-                    Colaborador.baja == False
-                )
-            
-            if reclutador_id == 0:
-                query = query.filter(Colaborador.reclutador_id.is_(None))
-            else:
-                query = query.filter(Colaborador.reclutador_id == reclutador_id)
-            
-            total = query.scalar() or 0
+            total = por_mes.get(mes_num, 0)
             total_anual += total
             
             contratos_por_mes.append({
-                "mes": meses[mes_num - 1],
+                "mes": MESES[mes_num - 1],
                 "total": total,
                 "mes_num": mes_num
             })
@@ -2889,92 +4498,69 @@ def api_contrataciones_detalle_reclutador(reclutador_id):
         return jsonify({"error": "Error al obtener detalle del reclutador"}), 500
 
 @app.route("/api/contrataciones/mes-detalle/<int:mes>")
+@lectura_replica
 @require_db
 def api_contrataciones_mes_detalle(mes):
     """API para obtener detalle de contrataciones por mes específico."""
     year = request.args.get("year", type=int, default=date.today().year)
     
+    error = periodo_invalido(year, mes)
+    if error:
+        return jsonify({"error": error}), 400
+    
     logger.info(f"API Mes Detalle solicitada para mes: {mes}, año: {year}")
     
     try:
         db = g.db
         
-        # Obtener reclutadores con contrataciones en este mes (ACTIVOS)
-        sql = text("""
-            SELECT 
-                COALESCE(r.nombre, 'Sin reclutador asignado') as reclutador_nombre,
-                COALESCE(r.id, 0) as reclutador_id,
-                COUNT(c.id) as total
-            FROM colaboradores c
-            LEFT JOIN reclutadores r ON c.reclutador_id = r.id
-            WHERE YEAR(c.fecha_alta) = :year
-                AND MONTH(c.fecha_alta) = :mes
-                AND c.baja = FALSE
-            GROUP BY COALESCE(r.id, 0), COALESCE(r.nombre, 'Sin reclutador asignado')
-            HAVING COUNT(c.id) > 0
-            ORDER BY total DESC
-        """)
+        # Contrataciones ACTIVAS del mes por reclutador y segmento en una sola consulta
+        es_comercial = case(
+            (ResumenMensual.area_id == app.config['AREA_COMERCIAL_ID'], 1),
+            else_=0
+        ).label("es_comercial")
         
-        resultados = db.execute(sql, {'year': year, 'mes': mes}).fetchall()
-        
-        # Total del mes (ACTIVOS)
-        total_mes = db.query(func.count(Colaborador.id))\
-            .filter(
-                extract("year", Colaborador.fecha_alta) == year,
-                extract("month", Colaborador.fecha_alta) == mes,
-                Colaborador.baja == False
-            )\
-            .scalar() or 0
-        
-        # Total comercial (área_id = 2) - ACTIVOS
-        total_comercial = db.query(func.count(Colaborador.id))\
-            .filter(
-                extract("year", Colaborador.fecha_alta) == year,
-                extract("month", Colaborador.fecha_alta) == mes,
-                Colaborador.baja == False,
-                Colaborador.area_id == app.config['AREA_COMERCIAL_ID']
-            )\
-            .scalar() or 0
-        
-        # Total por área comercial (para detalle)
-        detalles_comercial = []
-        if total_comercial > 0:
-            sql_comercial = text("""
-                SELECT 
-                    COALESCE(r.nombre, 'Sin reclutador asignado') as reclutador_nombre,
-                    COALESCE(r.id, 0) as reclutador_id,
-                    COUNT(c.id) as total
-                FROM colaboradores c
-                LEFT JOIN reclutadores r ON c.reclutador_id = r.id
-                WHERE YEAR(c.fecha_alta) = :year
-                    AND MONTH(c.fecha_alta) = :mes
-                    AND c.baja = FALSE
-                    AND c.area_id = :area_id
-                GROUP BY COALESCE(r.id, 0), COALESCE(r.nombre, 'Sin reclutador asignado')
-                HAVING COUNT(c.id) > 0
-                ORDER BY total DESC
-            """)
-            
-            resultados_comercial = db.execute(sql_comercial, {
-                'year': year, 
-                'mes': mes,
-                'area_id': app.config['AREA_COMERCIAL_ID']
-            }).fetchall()
-            
-            for row in resultados_comercial:
-                detalles_comercial.append({
-                    "reclutador": row.reclutador_nombre,
-                    "reclutador_id": row.reclutador_id if row.reclutador_id != 0 else None,
-                    "total": row.total
+        filas = db.query(
+            ResumenMensual.reclutador_id,
+            es_comercial,
+            func.sum(ResumenMensual.altas).label("total")
+        ).filter(
+            *filtro_resumen(year, mes),
+            ResumenMensual.baja == False
+        ).group_by(ResumenMensual.reclutador_id, es_comercial).all()
+        
+        por_reclutador = {}
+        por_reclutador_comercial = {}
+        for fila in filas:
+            total = int(fila.total or 0)
+            por_reclutador[fila.reclutador_id] = por_reclutador.get(fila.reclutador_id, 0) + total
+            if fila.es_comercial:
+                por_reclutador_comercial[fila.reclutador_id] = por_reclutador_comercial.get(fila.reclutador_id, 0) + total
+        
+        # Nombres de reclutadores (reclutador_id 0 = sin reclutador)
+        ids = [rid for rid in por_reclutador if rid]
+        nombres = {}
+        if ids:
+            nombres = dict(db.query(Reclutador.id, Reclutador.nombre).filter(Reclutador.id.in_(ids)).all())
+        
+        def detallar(conteos):
+            detalle = []
+            for rid, total in sorted(conteos.items(), key=lambda item: item[1], reverse=True):
+                if total <= 0:
+                    continue
+                nombre = nombres.get(rid)
+                detalle.append({
+                    "reclutador": nombre or "Sin reclutador asignado",
+                    "reclutador_id": rid if nombre else None,
+                    "total": total
                 })
+            return detalle
         
-        detalles = []
-        for row in resultados:
-            detalles.append({
-                "reclutador": row.reclutador_nombre,
-                "reclutador_id": row.reclutador_id if row.reclutador_id != 0 else None,
-                "total": row.total
-            })
+        detalles = detallar(por_reclutador)
+        detalles_comercial = detallar(por_reclutador_comercial)
+        
+        # Total del mes y total comercial (área_id = 2) - ACTIVOS
+        total_mes = sum(por_reclutador.values())
+        total_comercial = sum(por_reclutador_comercial.values())
         
         return jsonify({
             "mes": mes,
@@ -2990,6 +4576,7 @@ def api_contrataciones_mes_detalle(mes):
         return jsonify({"error": "Error al obtener detalle del mes"}), 500
 
 @app.route("/api/buscar-reclutador")
+@lectura_replica
 @require_db
 def api_buscar_reclutador():
     """API para buscar ID de reclutador por nombre."""
@@ -3008,26 +4595,25 @@ def api_buscar_reclutador():
                 "nombre": reclutador.nombre
             })
         else:
-            # Intentar búsqueda sin acentos
-            def remove_accents(text):
-                if not text:
-                    return text
-                text = unicodedata.normalize('NFD', text)
-                text = text.encode('ascii', 'ignore').decode('utf-8')
-                return text.lower()
-            
-            nombre_sin_acentos = remove_accents(nombre)
+            # Búsqueda sin acentos sobre la columna normalizada: primero los que
+            # empiezan con el texto (usa el índice) y después los que lo contienen
+            # en otra parte del nombre (recorre reclutadores, un catálogo chico)
+            nombre_sin_acentos = normalizar_texto(nombre)
+            prefijo = Reclutador.nombre_normalizado.startswith(nombre_sin_acentos, autoescape=True)
             
-            all_reclutadores = db.query(Reclutador).all()
-            matches = []
+            encontrados = db.query(Reclutador.id, Reclutador.nombre)\
+                .filter(prefijo)\
+                .order_by(Reclutador.nombre)\
+                .all()
+            encontrados += db.query(Reclutador.id, Reclutador.nombre)\
+                .filter(
+                    Reclutador.nombre_normalizado.contains(nombre_sin_acentos, autoescape=True),
+                    ~prefijo
+                )\
+                .order_by(Reclutador.nombre)\
+                .all()
             
-            for r in all_reclutadores:
-                r_nombre_sin_acentos = remove_accents(r.nombre)
-                if nombre_sin_acentos in r_nombre_sin_acentos.lower():
-                    matches.append({
-                        "id": r.id,
-                        "nombre": r.nombre
-                    })
+            matches = [{"id": r.id, "nombre": r.nombre} for r in encontrados]
             
             if matches:
                 return jsonify(matches)
@@ -3050,20 +4636,310 @@ def reparar_hash_password(hash_actual, password):
     
     return hash_actual
 
+# ======================================
+# ÍNDICES DE REPORTES (MIGRACIÓN GESTIONADA)
+# ======================================
+# Índices compuestos alineados con los patrones de acceso del dashboard BI.
+# "consultas" documenta qué endpoints se benefician de cada índice.
+INDICES_REPORTE = [
+    {
+        "nombre": "idx_colab_alta_area_baja",
+        "tabla": "colaboradores",
+        "columnas": ["fecha_alta", "area_id", "baja"],
+        "consultas": [
+            "api_kpis",
+            "api_contrataciones",
+            "api_contrataciones_comparativa",
+            "api_contrataciones_mes_detalle"
+        ]
+    },
+    {
+        "nombre": "idx_colab_baja_area",
+        "tabla": "colaboradores",
+        "columnas": ["fecha_baja", "area_id"],
+        "consultas": ["api_bajas"]
+    },
+    {
+        "nombre": "idx_colab_reclutador_alta",
+        "tabla": "colaboradores",
+        "columnas": ["reclutador_id", "fecha_alta"],
+        "consultas": [
+            "api_contrataciones_reclutador",
+            "api_contrataciones_detalle_reclutador",
+            "api_reclutadores_comercial"
+        ]
+    },
+    {
+        # Páginas por área/estado recorriendo id descendente (keyset)
+        "nombre": "idx_colab_area_baja_id",
+        "tabla": "colaboradores",
+        "columnas": ["area_id", "baja", "id"],
+        "consultas": [
+            "api_colaboradores_todos"
+        ]
+    },
+    {
+        "nombre": "idx_colab_fecha_actualizacion",
+        "tabla": "colaboradores",
+        "columnas": ["fecha_actualizacion"],
+        "consultas": [
+            "IndiceIdentificadores.sincronizar",
+            "IndiceBusquedaColaboradores.sincronizar"
+        ]
+    },
+    {
+        "nombre": "idx_reclutador_nombre_normalizado",
+        "tabla": "reclutadores",
+        "columnas": ["nombre_normalizado"],
+        "consultas": [
+            "api_buscar_reclutador"
+        ]
+    }
+]
+
+def obtener_indices_existentes(conn, tabla):
+    """Regresa {nombre_indice: [columnas en orden]} de una tabla."""
+    if conn.dialect.name == "mysql":
+        filas = conn.execute(text("""
+            SELECT index_name, column_name
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE()
+                AND table_name = :tabla
+            ORDER BY index_name, seq_in_index
+        """), {"tabla": tabla}).fetchall()
+        
+        indices = {}
+        for fila in filas:
+            indices.setdefault(fila[0], []).append(fila[1])
+        return indices
+    
+    # Otros motores (p. ej. SQLite en pruebas): usar el inspector de SQLAlchemy
+    from sqlalchemy import inspect as sa_inspect
+    return {
+        idx["name"]: list(idx["column_names"])
+        for idx in sa_inspect(conn).get_indexes(tabla)
+    }
+
+# Índices que ya no sirven a ninguna consulta: se eliminan si existen.
+# idx_colab_nombre_normalizado: el filtro q del listado busca por contenido
+# (LIKE '%...%'), así que el índice solo costaba en cada escritura.
+INDICES_RETIRADOS = [
+    ("colaboradores", "idx_colab_nombre_normalizado")
+]
+
+def asegurar_indices_reporte(bind=None):
+    """
+    Crea los índices de INDICES_REPORTE que falten. Un índice se considera
+    cubierto si ya existe con el mismo nombre o si otro índice empieza con
+    las mismas columnas. Regresa un reporte con el estado de cada índice.
+    """
+    bind = bind or engine
+    reporte = []
+    
+    with bind.begin() as conn:
+        existentes_por_tabla = {}
+        
+        for spec in INDICES_REPORTE:
+            tabla = spec["tabla"]
+            if tabla not in existentes_por_tabla:
+                existentes_por_tabla[tabla] = obtener_indices_existentes(conn, tabla)
+            existentes = existentes_por_tabla[tabla]
+            
+            columnas = spec["columnas"]
+            estado = "creado"
+            cubierto_por = None
+            
+            if spec["nombre"] in existentes:
+                estado = "existente"
+                cubierto_por = spec["nombre"]
+            else:
+                for nombre, cols in existentes.items():
+                    if [c.lower() for c in cols[:len(columnas)]] == columnas:
+                        estado = "cubierto"
+                        cubierto_por = nombre
+                        break
+            
+            if estado == "creado":
+                try:
+                    conn.execute(text(
+                        f"CREATE INDEX {spec['nombre']} ON {tabla} ({', '.join(columnas)})"
+                    ))
+                    existentes[spec["nombre"]] = list(columnas)
+                    cubierto_por = spec["nombre"]
+                except SQLAlchemyError as e:
+                    estado = "error"
+                    logger.warning(f"No se pudo crear el índice {spec['nombre']}: {e}")
+            
+            reporte.append({
+                "indice": spec["nombre"],
+                "tabla": tabla,
+                "columnas": columnas,
+                "estado": estado,
+                "cubierto_por": cubierto_por,
+                "consultas": spec["consultas"]
+            })
+        
+        for tabla, nombre in INDICES_RETIRADOS:
+            if tabla not in existentes_por_tabla:
+                existentes_por_tabla[tabla] = obtener_indices_existentes(conn, tabla)
+            if nombre in existentes_por_tabla[tabla]:
+                destino = f" ON {tabla}" if conn.dialect.name == "mysql" else ""
+                conn.execute(text(f"DROP INDEX {nombre}{destino}"))
+                del existentes_por_tabla[tabla][nombre]
+                logger.info(f"Índice retirado {nombre} eliminado de {tabla}")
+    
+    for item in reporte:
+        logger.info(
+            f"Índice {item['indice']} ({', '.join(item['columnas'])}): {item['estado']}"
+            f"{' por ' + item['cubierto_por'] if item['estado'] == 'cubierto' else ''}"
+            f" - sirve a: {', '.join(item['consultas'])}"
+        )
+    
+    return reporte
+
+# ======================================
+# COLUMNAS AGREGADAS (MIGRACIÓN)
+# ======================================
+# Columnas agregadas después de la creación original de las tablas:
+# create_all no las agrega a tablas que ya existen
+COLUMNAS_AGREGADAS = [
+    ("colaboradores", "nombre_normalizado", "VARCHAR(201)"),
+    ("reclutadores", "nombre_normalizado", "VARCHAR(150)"),
+    ("colaboradores", "fecha_actualizacion", "DATETIME")
+]
+
+def asegurar_columnas_agregadas(bind=None):
+    """Agrega las columnas de COLUMNAS_AGREGADAS que falten. Regresa las agregadas."""
+    from sqlalchemy import inspect as sa_inspect
+    bind = bind or engine
+    agregadas = []
+    
+    with bind.begin() as conn:
+        inspector = sa_inspect(conn)
+        for tabla, columna, tipo in COLUMNAS_AGREGADAS:
+            existentes = {c["name"] for c in inspector.get_columns(tabla)}
+            if columna not in existentes:
+                conn.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo} NULL"))
+                agregadas.append(f"{tabla}.{columna}")
+                logger.info(f"Columna {tabla}.{columna} agregada")
+    
+    return agregadas
+
+# ======================================
+# NOMBRES NORMALIZADOS (BACKFILL)
+# ======================================
+def asignar_nombre_normalizado(obj):
+    """Calcula nombre_normalizado de un Colaborador o Reclutador (José Núñez -> jose nunez)."""
+    if isinstance(obj, Colaborador):
+        obj.nombre_normalizado = normalizar_texto(f"{obj.nombre} {obj.apellido}")[:201]
+    else:
+        obj.nombre_normalizado = normalizar_texto(obj.nombre)[:150]
+
+def backfill_nombres_normalizados(lote=1000):
+    """
+    Recalcula nombre_normalizado de colaboradores y reclutadores por lotes
+    (una transacción por lote). Regresa cuántos registros cambiaron por tabla.
+    """
+    actualizados = {}
+    
+    for modelo in (Colaborador, Reclutador):
+        total = 0
+        ultimo_id = 0
+        
+        while True:
+            with get_db() as db:
+                registros = db.query(modelo)\
+                    .filter(modelo.id > ultimo_id)\
+                    .order_by(modelo.id)\
+                    .limit(lote)\
+                    .all()
+                
+                for registro in registros:
+                    anterior = registro.nombre_normalizado
+                    asignar_nombre_normalizado(registro)
+                    if registro.nombre_normalizado != anterior:
+                        total += 1
+                    ultimo_id = registro.id
+            
+            if len(registros) < lote:
+                break
+        
+        actualizados[modelo.__tablename__] = total
+        logger.info(f"Backfill de nombre_normalizado en {modelo.__tablename__}: {total} actualizados")
+    
+    return actualizados
+
+@app.cli.command("normalizar-nombres")
+def cli_normalizar_nombres():
+    """Agrega las columnas que falten y recalcula los nombres normalizados."""
+    asegurar_columnas_agregadas()
+    asegurar_indices_reporte()
+    actualizados = backfill_nombres_normalizados()
+    print(f"✅ Nombres normalizados actualizados: {actualizados}")
+
 # ======================================
 # INICIALIZACIÓN
 # ======================================
 def initialize_app():
-    """Inicializa la aplicación."""
+    """Inicializa la aplicación (base de datos y estado del proceso)."""
+    preparar_base_datos()
+    iniciar_proceso()
+
+def preparar_base_datos():
+    """
+    Tablas, migraciones, datos y usuarios iniciales. Se ejecuta una vez por
+    despliegue (flask --app app inicializar o el maestro de servidor.py), no en cada worker.
+    """
     logger.info("Starting application initialization...")
     
     Base.metadata.create_all(engine)
     logger.info("Database tables verified/created")
     
+    asegurar_columnas_agregadas()
+    asegurar_indices_reporte()
+    
     create_initial_data()
     
+    with get_db() as db:
+        resumen_vacio = db.query(ResumenMensual.id).first() is None
+        hay_colaboradores = db.query(Colaborador.id).first() is not None
+    
+    if resumen_vacio and hay_colaboradores:
+        logger.info("resumen_mensual vacío, reconstruyendo desde colaboradores...")
+        reconstruir_resumen_mensual()
+    
+    with get_db() as db:
+        sin_normalizar = db.query(Colaborador.id).filter(Colaborador.nombre_normalizado.is_(None)).first() is not None \
+            or db.query(Reclutador.id).filter(Reclutador.nombre_normalizado.is_(None)).first() is not None
+    
+    if sin_normalizar:
+        logger.info("Hay nombres sin normalizar, ejecutando backfill...")
+        backfill_nombres_normalizados()
+    
+    crear_usuarios_con_hash_correcto()
+    
     logger.info("Application initialized successfully")
 
+def iniciar_proceso():
+    """Estado en memoria de cada proceso: índices y despachador del outbox."""
+    with get_db() as db:
+        indice_identificadores.reconstruir(db)
+        indice_busqueda.reconstruir(db)
+    
+    despachador_notificaciones.iniciar()
+    logger.info(f"Proceso {os.getpid()} listo")
+
+def detener_proceso(timeout=None):
+    """Cierre ordenado del proceso: termina el envío en curso del outbox."""
+    despachador_notificaciones.detener(timeout)
+    logger.info(f"Proceso {os.getpid()} detenido")
+
+@app.cli.command("inicializar")
+def cli_inicializar():
+    """Prepara la base de datos antes de levantar los workers de producción."""
+    preparar_base_datos()
+    print("✅ Base de datos preparada")
+
 def create_initial_data():
     """Crea datos iniciales si las tablas están vacías."""
     with get_db() as db:
@@ -3112,6 +4988,8 @@ def create_initial_data():
                 Reclutador(nombre="Nilson"),
                 Reclutador(nombre="Erick")
             ]
+            for reclutador in reclutadores:
+                asignar_nombre_normalizado(reclutador)
             db.add_all(reclutadores)
             
             db.commit()
@@ -3138,15 +5016,13 @@ def alta_colaborador_post():
     try:
         db = g.db
         
-        # NUEVA VALIDACIÓN: Verificar RFC antes de procesar
-        rfc = request.form.get("rfc", "").upper().strip()
+        # Verificar duplicados (RFC, CURP, NSS y correo en una sola consulta)
+        duplicados = buscar_duplicados(db, request.form)
         
-        if rfc:
-            # Verificar si RFC ya existe
-            existe_rfc = db.query(Colaborador).filter_by(rfc=rfc).first()
-            if existe_rfc:
-                flash(f"❌ El RFC <strong>{rfc}</strong> ya está registrado para el colaborador: {existe_rfc.nombre} {existe_rfc.apellido}", "error")
-                return redirect(url_for('alta'))
+        if duplicados:
+            for dup in duplicados:
+                flash(f"❌ {dup['campo']} <strong>{dup['valor']}</strong> ya está registrado para el colaborador: {dup['colaborador']}", "error")
+            return redirect(url_for('alta'))
         
         # Validar campos requeridos
         required_fields = ['area', 'nombre', 'apellido', 'correo', 'rfc', 'curp', 'nss', 'fecha_alta']
@@ -3160,41 +5036,14 @@ def alta_colaborador_post():
             flash(f"❌ Campos requeridos faltantes: {', '.join(missing_fields)}", "error")
             return redirect(url_for('alta'))
         
-        # Validar datos únicos
-        rfc = request.form.get("rfc", "").upper()
-        curp = request.form.get("curp", "").upper()
-        nss = request.form.get("nss", "")
-        correo = request.form.get("correo", "")
-        
-        # Verificar duplicados
-        duplicados = []
-        
-        if db.query(Colaborador).filter_by(rfc=rfc).first():
-            duplicados.append(f"RFC: {rfc}")
-        
-        if db.query(Colaborador).filter_by(curp=curp).first():
-            duplicados.append(f"CURP: {curp}")
-        
-        if db.query(Colaborador).filter_by(nss=nss).first():
-            duplicados.append(f"NSS: {nss}")
-        
-        if db.query(Colaborador).filter_by(correo=correo).first():
-            duplicados.append(f"Correo: {correo}")
-        
-        if duplicados:
-            flash(f"❌ Datos duplicados encontrados: {', '.join(duplicados)}", "error")
-            return redirect(url_for('alta'))
-        
         # Crear colaborador - MODIFICADO para obtener solo el ID
         area_id = int(request.form.get("area"))
         colaborador_id = crear_colaborador(db, area_id)  # <-- Ahora retorna solo el ID
         
         # Obtener datos del colaborador para el mensaje flash
+        # (la notificación a Teams se envía en segundo plano desde el outbox)
         colaborador = db.query(Colaborador).get(colaborador_id)
         
-        # ENVIAR NOTIFICACIÓN A SLACK DESPUÉS DE CREAR EL COLABORADOR
-        enviar_notificacion_slack(colaborador, db)
-        
         # Mensaje de éxito con el nombre del colaborador
         flash(f"✅ Colaborador <strong>{colaborador.nombre} {colaborador.apellido}</strong> registrado exitosamente", "success")
         
@@ -3212,77 +5061,247 @@ def alta_colaborador_post():
 # ======================================
 # API PARA OBTENER TODOS LOS COLABORADORES (FIXED)
 # ======================================
+# Campo expuesto -> (columna, serializador)
+CAMPOS_LISTADO_COLABORADORES = {
+    'id': (Colaborador.id, lambda v: v),
+    'nombre': (Colaborador.nombre, lambda v: v or ''),
+    'apellido': (Colaborador.apellido, lambda v: v or ''),
+    'correo': (Colaborador.correo, lambda v: v or ''),
+    'rfc': (Colaborador.rfc, lambda v: v or ''),
+    'curp': (Colaborador.curp, lambda v: v or ''),
+    'nss': (Colaborador.nss, lambda v: v or ''),
+    'fecha_alta': (Colaborador.fecha_alta, lambda v: v.isoformat() if v else None),
+    'telefono': (Colaborador.telefono, lambda v: v or ''),
+    'domicilio': (Colaborador.domicilio, lambda v: v or ''),
+    'sueldo': (Colaborador.sueldo, lambda v: float(v) if v else None),
+    'comentarios': (Colaborador.comentarios, lambda v: v or ''),
+    'baja': (Colaborador.baja, lambda v: bool(v)),
+    'area_id': (Colaborador.area_id, lambda v: v),
+    'area_nombre': (Area.nombre, lambda v: v or 'N/A'),
+    'puesto_nombre': (Puesto.nombre, lambda v: v or 'N/A'),
+    'nombre_coordinador': (Area.nombre_coordinador, lambda v: v or 'N/A'),
+    'correo_coordinador': (Colaborador.correo_coordinador, lambda v: v or 'N/A'),
+    'edad': (Colaborador.edad, lambda v: v or None),
+    'estado_civil': (Colaborador.estado_civil, lambda v: v or 'N/A')
+}
+
+LIMITE_PAGINA_COLABORADORES = 50
+LIMITE_MAXIMO_PAGINA_COLABORADORES = 500
+
+def parse_campos_listado():
+    """Campos pedidos en ?campos=a,b,c (todos por defecto). El id siempre se incluye."""
+    valor = request.args.get('campos', '').strip()
+    if not valor:
+        return list(CAMPOS_LISTADO_COLABORADORES)
+    
+    campos = ['id']
+    for campo in valor.split(','):
+        campo = campo.strip()
+        if not campo or campo in campos:
+            continue
+        if campo not in CAMPOS_LISTADO_COLABORADORES:
+            raise ValueError(f"Campo no válido: {campo}")
+        campos.append(campo)
+    return campos
+
+def filtros_listado_colaboradores():
+    """
+    Filtros del listado desde la query string: area_id, estado (activo/baja),
+    desde/hasta (fecha de alta, inclusivo) y q (texto libre).
+    """
+    filtros = []
+    
+    area_id = request.args.get('area_id', type=int)
+    if area_id:
+        filtros.append(Colaborador.area_id == area_id)
+    
+    estado = request.args.get('estado', '').strip().lower()
+    if estado == 'activo':
+        filtros.append(Colaborador.baja == False)
+    elif estado == 'baja':
+        filtros.append(Colaborador.baja == True)
+    elif estado:
+        raise ValueError("estado debe ser 'activo' o 'baja'")
+    
+    desde = request.args.get('desde', '').strip()
+    hasta = request.args.get('hasta', '').strip()
+    if desde:
+        filtros.append(Colaborador.fecha_alta >= datetime.strptime(desde, "%Y-%m-%d").date())
+    if hasta:
+        # fecha_alta es DATE: <= incluye el día completo (y no desborda con 9999-12-31)
+        filtros.append(Colaborador.fecha_alta <= datetime.strptime(hasta, "%Y-%m-%d").date())
+    
+    texto = request.args.get('q', '').strip()
+    if texto:
+        # Búsqueda por contenido (recorre la tabla, acotada por los demás filtros);
+        # el autocompletado rápido y sin acentos es /api/buscar-colaboradores.
+        # autoescape: % y _ del texto se buscan literalmente
+        filtros.append(or_(
+            Colaborador.nombre.icontains(texto, autoescape=True),
+            Colaborador.apellido.icontains(texto, autoescape=True),
+            Colaborador.correo.icontains(texto, autoescape=True),
+            Colaborador.rfc.icontains(texto, autoescape=True),
+            Colaborador.curp.icontains(texto, autoescape=True),
+            Colaborador.nombre_normalizado.contains(normalizar_texto(texto), autoescape=True)
+        ))
+    
+    return filtros
+
+def consulta_listado_colaboradores(db, campos, filtros):
+    """Consulta solo las columnas pedidas, ordenada por id descendente."""
+    consulta = db.query(
+        *[CAMPOS_LISTADO_COLABORADORES[campo][0].label(campo) for campo in campos]
+    ).select_from(Colaborador).join(
+        Area, Colaborador.area_id == Area.id
+    )
+    
+    if 'puesto_nombre' in campos:
+        consulta = consulta.outerjoin(Puesto, Colaborador.puesto_id == Puesto.id)
+    
+    return consulta.filter(*filtros).order_by(Colaborador.id.desc())
+
+def serializar_fila_listado(fila, campos):
+    return {
+        campo: CAMPOS_LISTADO_COLABORADORES[campo][1](getattr(fila, campo))
+        for campo in campos
+    }
+
 @app.route("/api/colaboradores/todos")
 @login_required
 @area_required([3, 4])
+@lectura_replica
 @require_db
 def api_colaboradores_todos():
-    """API para obtener todos los colaboradores - CORREGIDO CON TODOS LOS CAMPOS."""
+    """
+    API de colaboradores. Con ?limit o ?cursor regresa una página (keyset sobre
+    id descendente) con siguiente_cursor; sin ellos, la lista completa como antes.
+    Filtros: area_id, estado, desde, hasta, q. Opcionales: campos, total=1.
+    """
     try:
         db = g.db
         
-        # Obtener todos los colaboradores con información de área y puesto - CORREGIDO
-        colaboradores = db.query(
-            Colaborador.id,
-            Colaborador.nombre,
-            Colaborador.apellido,
-            Colaborador.correo,
-            Colaborador.rfc,
-            Colaborador.curp,
-            Colaborador.nss,
-            Colaborador.fecha_alta,
-            Colaborador.telefono,
-            Colaborador.domicilio,  # ✅ AGREGADO
-            Colaborador.sueldo,
-            Colaborador.comentarios,  # ✅ AGREGADO
-            Colaborador.baja,
-            Colaborador.area_id,
-            Colaborador.puesto_id,
-            Colaborador.correo_coordinador,
-            Colaborador.edad,  # ✅ AGREGADO
-            Colaborador.estado_civil,  # ✅ AGREGADO
-            Area.nombre.label('area_nombre'),
-            Area.nombre_coordinador,
-            Puesto.nombre.label('puesto_nombre')
-        ).join(
-            Area, Colaborador.area_id == Area.id
-        ).outerjoin(
-            Puesto, Colaborador.puesto_id == Puesto.id
-        ).order_by(
-            Colaborador.id.desc()
-        ).all()
+        try:
+            campos = parse_campos_listado()
+            filtros = filtros_listado_colaboradores()
+            cursor = request.args.get('cursor', type=int)
+            limite = request.args.get('limit', type=int)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        consulta = consulta_listado_colaboradores(db, campos, filtros)
+        
+        # Modo compatible: lista completa sin paginar
+        if cursor is None and limite is None:
+            return jsonify([serializar_fila_listado(col, campos) for col in consulta])
+        
+        limite = max(1, min(limite or LIMITE_PAGINA_COLABORADORES, LIMITE_MAXIMO_PAGINA_COLABORADORES))
+        
+        pagina = consulta
+        if cursor is not None:
+            pagina = pagina.filter(Colaborador.id < cursor)
+        
+        # Se pide un registro extra para saber si hay más páginas
+        filas = pagina.limit(limite + 1).all()
+        hay_mas = len(filas) > limite
+        filas = filas[:limite]
+        
+        respuesta = {
+            "colaboradores": [serializar_fila_listado(col, campos) for col in filas],
+            "siguiente_cursor": filas[-1].id if hay_mas else None,
+            "limit": limite
+        }
         
-        resultados = []
-        for col in colaboradores:
-            resultados.append({
-                'id': col.id,
-                'nombre': col.nombre or '',
-                'apellido': col.apellido or '',
-                'correo': col.correo or '',
-                'rfc': col.rfc or '',
-                'curp': col.curp or '',
-                'nss': col.nss or '',  # ✅ AHORA SÍ VIENE
-                'fecha_alta': col.fecha_alta.isoformat() if col.fecha_alta else None,
-                'telefono': col.telefono or '',
-                'domicilio': col.domicilio or '',  # ✅ AHORA SÍ VIENE
-                'sueldo': float(col.sueldo) if col.sueldo else None,
-                'comentarios': col.comentarios or '',  # ✅ AHORA SÍ VIENE
-                'baja': bool(col.baja),
-                'area_id': col.area_id,
-                'area_nombre': col.area_nombre or 'N/A',
-                'puesto_nombre': col.puesto_nombre or 'N/A',
-                'nombre_coordinador': col.nombre_coordinador or 'N/A',
-                'correo_coordinador': col.correo_coordinador or 'N/A',
-                'edad': col.edad or None,  # ✅ AHORA SÍ VIENE
-                'estado_civil': col.estado_civil or 'N/A'  # ✅ AHORA SÍ VIENE
-            })
+        if request.args.get('total') in ('1', 'true'):
+            respuesta["total"] = db.query(func.count(Colaborador.id)).join(
+                Area, Colaborador.area_id == Area.id
+            ).filter(*filtros).scalar()
         
-        return jsonify(resultados)
+        return jsonify(respuesta)
         
     except Exception as e:
         logger.error(f"Error obteniendo colaboradores: {e}", exc_info=True)
         return jsonify([])
 # ======================================
+# EXPORTACIÓN EN STREAMING DE COLABORADORES
+# ======================================
+LOTE_EXPORTACION = 500  # Filas por lote leído del cursor y por bloque enviado
+
+def generar_exportacion_colaboradores(campos, filtros, formato, replica=False):
+    """
+    Genera la exportación por bloques. Usa su propia sesión con cursor del lado
+    del servidor (yield_per), así que la memoria no crece con el número de filas.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    if formato == 'csv':
+        # Encabezado inmediato para que el primer byte salga sin esperar a la BD
+        buffer.write('\ufeff')  # BOM para que Excel detecte UTF-8
+        writer.writerow(campos)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    
+    total = 0
+    try:
+        with get_db(replica=replica) as db:
+            consulta = consulta_listado_colaboradores(db, campos, filtros).yield_per(LOTE_EXPORTACION)
+            
+            for fila in consulta:
+                datos = serializar_fila_listado(fila, campos)
+                if formato == 'csv':
+                    writer.writerow(['' if datos[c] is None else datos[c] for c in campos])
+                else:
+                    buffer.write(json.dumps(datos, ensure_ascii=False))
+                    buffer.write('\n')
+                
+                total += 1
+                # El primer registro se envía de inmediato; después, por lotes
+                if total == 1 or total % LOTE_EXPORTACION == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+        
+        if buffer.tell():
+            yield buffer.getvalue()
+        
+        logger.info(f"Exportación de colaboradores ({formato}) completada: {total} registros")
+        
+    except Exception as e:
+        logger.error(f"Error exportando colaboradores tras {total} registros: {e}", exc_info=True)
+        raise
+
+@app.route("/api/colaboradores/exportar")
+@login_required
+@area_required([3, 4])
+def api_exportar_colaboradores():
+    """
+    Exporta el padrón completo en streaming. ?formato=ndjson (default) o csv.
+    Acepta los mismos filtros y ?campos que /api/colaboradores/todos.
+    """
+    formato = request.args.get('formato', 'ndjson').strip().lower()
+    if formato not in ('ndjson', 'csv'):
+        return jsonify({"error": "formato debe ser 'ndjson' o 'csv'"}), 400
+    
+    try:
+        campos = parse_campos_listado()
+        filtros = filtros_listado_colaboradores()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    mimetype = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+    nombre_archivo = f"colaboradores_{date.today().isoformat()}.{formato}"
+    
+    return Response(
+        generar_exportacion_colaboradores(campos, filtros, formato, replica=leer_de_replica()),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename={nombre_archivo}",
+            "X-Accel-Buffering": "no"  # Evita que un proxy nginx acumule la respuesta
+        }
+    )
+
+# ======================================
 # RUTA PARA LA VISTA DE COLABORADORES
 # ======================================
 @app.route("/colaboradores")
@@ -3521,11 +5540,15 @@ def api_actualizar_colaborador():
         if not colaborador:
             return jsonify({"error": "Colaborador no encontrado"}), 404
         
+        estado_anterior = estado_resumen(colaborador)
+        
         # Actualizar campos básicos con validación de longitud
         if 'nombre' in data:
             colaborador.nombre = data['nombre'][:100]  # Limitar a 100 caracteres
         if 'apellido' in data:
             colaborador.apellido = data['apellido'][:100]
+        if 'nombre' in data or 'apellido' in data:
+            asignar_nombre_normalizado(colaborador)
         if 'correo' in data:
             colaborador.correo = data['correo'][:150]
         if 'telefono' in data:
@@ -3566,8 +5589,11 @@ def api_actualizar_colaborador():
             elif not data['baja']:
                 colaborador.fecha_baja = None
         
+        actualizar_resumen_mensual(db, estado_anterior, estado_resumen(colaborador))
         db.commit()
         
+        indice_identificadores.agregar(colaborador)
+        
         logger.info(f"Colaborador actualizado: {colaborador.id} - {colaborador.nombre} {colaborador.apellido}")
         
         return jsonify({
@@ -3776,15 +5802,11 @@ def migrar_hashes_existentes():
 
 
 if __name__ == "__main__":
-    app.config['SESSION_COOKIE_SECURE'] = False
-    app.config['SESSION_COOKIE_HTTPONLY'] = True
-    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-    
-    initialize_app()
-    
-
-    # Luego asegurar que todos los usuarios estén creados correctamente
-    crear_usuarios_con_hash_correcto()
+    # Servidor de desarrollo; en producción usar servidor.py o wsgi.py.
+    # Con el reloader este bloque corre en el vigilante y en el proceso que
+    # atiende: solo este último inicializa.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        initialize_app()
     
     app.run(
         host='0.0.0.0',
@@ -0,0 +1,190 @@
+"""
+Cliente HTTP compartido para llamadas salientes (webhooks de Teams / Power Automate).
+
+Mantiene una requests.Session con pool de conexiones keep-alive, timeouts por
+endpoint y un circuit breaker por endpoint: tras varios fallos seguidos deja
+de llamar durante un periodo de enfriamiento en lugar de acumular llamadas lentas.
+"""
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+TIMEOUT_DEFAULT = (3.05, 10)  # (conexión, lectura) en segundos
+
+
+class CircuitoAbierto(Exception):
+    """El circuito del endpoint está abierto; no se hizo la llamada."""
+
+    def __init__(self, endpoint, reintentar_en):
+        super().__init__(f"Circuito abierto para '{endpoint}', reintentar en {reintentar_en:.0f}s")
+        self.endpoint = endpoint
+        self.reintentar_en = reintentar_en
+
+
+class CircuitBreaker:
+    """
+    cerrado -> abierto tras `umbral_fallos` fallos seguidos.
+    abierto -> semiabierto cuando pasa `enfriamiento`; deja pasar una llamada de prueba.
+    semiabierto -> cerrado si la prueba funciona, abierto otra vez si falla.
+    """
+
+    def __init__(self, umbral_fallos=5, enfriamiento=60):
+        self.umbral_fallos = umbral_fallos
+        self.enfriamiento = enfriamiento
+        self._lock = threading.Lock()
+        self._fallos = 0
+        self._abierto_desde = None
+        self._prueba_en_curso = False
+
+    @property
+    def estado(self):
+        with self._lock:
+            return self._estado()
+
+    def _estado(self):
+        if self._abierto_desde is None:
+            return "cerrado"
+        if time.monotonic() - self._abierto_desde >= self.enfriamiento:
+            return "semiabierto"
+        return "abierto"
+
+    def permitir(self):
+        """Regresa 0 si se puede llamar, o los segundos que faltan para reintentar."""
+        with self._lock:
+            estado = self._estado()
+            if estado == "cerrado":
+                return 0
+            if estado == "semiabierto" and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return 0
+            restante = self.enfriamiento - (time.monotonic() - self._abierto_desde)
+            return max(restante, 1)
+
+    def registrar_exito(self):
+        with self._lock:
+            self._fallos = 0
+            self._abierto_desde = None
+            self._prueba_en_curso = False
+
+    def registrar_fallo(self):
+        """Registra un fallo. Regresa True si con este fallo se abrió el circuito."""
+        with self._lock:
+            self._fallos += 1
+            estaba_abierto = self._abierto_desde is not None
+            if self._prueba_en_curso or self._fallos >= self.umbral_fallos:
+                self._abierto_desde = time.monotonic()
+                self._prueba_en_curso = False
+                return not estaba_abierto
+            return False
+
+
+class ClienteHTTP:
+    """Session compartida con pool, timeouts y circuit breaker por endpoint, más métricas."""
+
+    def __init__(self, pool_maxsize=10, timeouts=None, umbral_fallos=5, enfriamiento=60):
+        self.timeouts = dict(timeouts or {})
+        self.umbral_fallos = umbral_fallos
+        self.enfriamiento = enfriamiento
+
+        self.session = requests.Session()
+        # Sin reintentos automáticos: los reintentos los decide quien llama (outbox)
+        adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("https://", adaptador)
+        self.session.mount("http://", adaptador)
+
+        self._lock = threading.Lock()
+        self._circuitos = {}
+        self._metricas = {}
+
+    def _circuito(self, endpoint):
+        with self._lock:
+            if endpoint not in self._circuitos:
+                self._circuitos[endpoint] = CircuitBreaker(self.umbral_fallos, self.enfriamiento)
+                self._metricas[endpoint] = {
+                    "llamadas": 0,
+                    "exitos": 0,
+                    "fallos": 0,
+                    "rechazadas_circuito": 0,
+                    "aperturas_circuito": 0,
+                    "latencia_total_ms": 0.0,
+                    "latencia_max_ms": 0.0,
+                    "ultimo_error": None
+                }
+            return self._circuitos[endpoint]
+
+    def _registrar(self, endpoint, **incrementos):
+        with self._lock:
+            metricas = self._metricas[endpoint]
+            for clave, valor in incrementos.items():
+                if clave == "latencia_ms":
+                    metricas["latencia_total_ms"] += valor
+                    metricas["latencia_max_ms"] = max(metricas["latencia_max_ms"], valor)
+                elif clave == "ultimo_error":
+                    metricas["ultimo_error"] = valor
+                else:
+                    metricas[clave] += valor
+
+    def circuito_abierto(self, endpoint):
+        return self._circuito(endpoint).estado == "abierto"
+
+    def request(self, endpoint, metodo, url, **kwargs):
+        """
+        Hace la llamada con el timeout del endpoint. Las respuestas 5xx/429 y los
+        errores de red cuentan como fallo para el circuito. Lanza CircuitoAbierto
+        sin llamar si el circuito está abierto.
+        """
+        circuito = self._circuito(endpoint)
+        restante = circuito.permitir()
+        if restante:
+            self._registrar(endpoint, rechazadas_circuito=1)
+            raise CircuitoAbierto(endpoint, restante)
+
+        kwargs.setdefault("timeout", self.timeouts.get(endpoint, TIMEOUT_DEFAULT))
+        inicio = time.perf_counter()
+        try:
+            response = self.session.request(metodo, url, **kwargs)
+        except requests.RequestException as e:
+            self._fallo(endpoint, circuito, inicio, str(e))
+            raise
+
+        if response.status_code >= 500 or response.status_code == 429:
+            self._fallo(endpoint, circuito, inicio, f"HTTP {response.status_code}")
+        else:
+            circuito.registrar_exito()
+            self._registrar(
+                endpoint,
+                llamadas=1,
+                exitos=1,
+                latencia_ms=(time.perf_counter() - inicio) * 1000
+            )
+        return response
+
+    def _fallo(self, endpoint, circuito, inicio, error):
+        abierto = circuito.registrar_fallo()
+        self._registrar(
+            endpoint,
+            llamadas=1,
+            fallos=1,
+            aperturas_circuito=1 if abierto else 0,
+            latencia_ms=(time.perf_counter() - inicio) * 1000,
+            ultimo_error=error
+        )
+
+    def post(self, endpoint, url, **kwargs):
+        return self.request(endpoint, "POST", url, **kwargs)
+
+    def metricas(self):
+        """Copia de las métricas por endpoint, con latencia promedio y estado del circuito."""
+        with self._lock:
+            copia = {endpoint: dict(valores) for endpoint, valores in self._metricas.items()}
+            circuitos = dict(self._circuitos)
+
+        for endpoint, valores in copia.items():
+            llamadas = valores["llamadas"]
+            valores["latencia_promedio_ms"] = round(valores["latencia_total_ms"] / llamadas, 2) if llamadas else None
+            valores["latencia_total_ms"] = round(valores["latencia_total_ms"], 2)
+            valores["latencia_max_ms"] = round(valores["latencia_max_ms"], 2)
+            valores["circuito"] = circuitos[endpoint].estado
+        return copia
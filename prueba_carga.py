@@ -0,0 +1,158 @@
+"""
+Prueba de carga contra una o varias instancias en ejecución.
+
+    python app.py                          # servidor de desarrollo en :5000
+    python servidor.py --puerto 8000       # servidor de producción en :8000
+    python prueba_carga.py --url http://localhost:5000 --url http://localhost:8000 \\
+        --correo admin@marnezdesarrollos.com --password '...' --usuarios 50 --duracion 30
+
+Inicia sesión una sola vez por URL (el login tiene límite por IP) y comparte la
+cookie entre los usuarios virtuales, que reparten peticiones GET entre las rutas.
+Reporta peticiones por segundo, latencias y errores, y la comparación entre URLs.
+"""
+import argparse
+import math
+import threading
+import time
+from datetime import date
+
+import requests
+
+
+def rutas_default():
+    anio = date.today().year
+    return [
+        f"/api/kpis?year={anio}",
+        f"/api/contrataciones?year={anio}",
+        "/api/colaboradores/todos?limit=50",
+        "/api/buscar-colaboradores?q=ma",
+        "/api/areas"
+    ]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de alta de colaboradores")
+    parser.add_argument("--url", action="append", required=True, help="Se puede repetir para comparar")
+    parser.add_argument("--ruta", action="append", help="Ruta a consultar (se puede repetir)")
+    parser.add_argument("--usuarios", type=int, default=50, help="Usuarios virtuales simultáneos")
+    parser.add_argument("--duracion", type=float, default=30, help="Segundos por URL")
+    parser.add_argument("--calentamiento", type=float, default=3, help="Segundos iniciales que no se miden")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--correo")
+    parser.add_argument("--password")
+    return parser.parse_args(argv)
+
+
+def iniciar_sesion(url, correo, password, timeout):
+    """Cookies de una sesión autenticada (o vacías si no se dieron credenciales)."""
+    sesion = requests.Session()
+    if correo:
+        respuesta = sesion.post(
+            f"{url}/login",
+            data={"correo": correo, "password": password or ""},
+            allow_redirects=False,
+            timeout=timeout
+        )
+        if "session" not in sesion.cookies:
+            raise SystemExit(f"No se pudo iniciar sesión en {url} (HTTP {respuesta.status_code})")
+    return sesion.cookies
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    return valores[min(len(valores) - 1, math.ceil(len(valores) * p / 100) - 1)]
+
+
+def usuario_virtual(url, rutas, cookies, inicio_medicion, fin, timeout, resultados, desfase):
+    sesion = requests.Session()
+    sesion.cookies.update(cookies)
+    latencias, errores = [], {}
+    i = desfase
+    while True:
+        ahora = time.perf_counter()
+        if ahora >= fin:
+            break
+        ruta = rutas[i % len(rutas)]
+        i += 1
+        try:
+            respuesta = sesion.get(url + ruta, timeout=timeout, allow_redirects=False)
+            estado = respuesta.status_code
+        except requests.RequestException as e:
+            estado = type(e).__name__
+        duracion = time.perf_counter() - ahora
+        if ahora < inicio_medicion:
+            continue
+        if estado == 200:
+            latencias.append(duracion * 1000)
+        else:
+            errores[estado] = errores.get(estado, 0) + 1
+    resultados.append((latencias, errores))
+
+
+def medir(url, args, rutas):
+    cookies = iniciar_sesion(url, args.correo, args.password, args.timeout)
+    inicio = time.perf_counter()
+    inicio_medicion = inicio + args.calentamiento
+    fin = inicio_medicion + args.duracion
+
+    resultados = []
+    hilos = [
+        threading.Thread(
+            target=usuario_virtual,
+            args=(url, rutas, cookies, inicio_medicion, fin, args.timeout, resultados, n)
+        )
+        for n in range(args.usuarios)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    latencias = sorted(valor for lat, _ in resultados for valor in lat)
+    errores = {}
+    for _, err in resultados:
+        for estado, total in err.items():
+            errores[estado] = errores.get(estado, 0) + total
+
+    return {
+        "url": url,
+        "ok": len(latencias),
+        "rps": len(latencias) / args.duracion,
+        "p50": percentil(latencias, 50),
+        "p95": percentil(latencias, 95),
+        "p99": percentil(latencias, 99),
+        "errores": errores
+    }
+
+
+def formato_ms(valor):
+    return f"{valor:8.1f}" if valor is not None else "       -"
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rutas = args.ruta or rutas_default()
+    print(f"{args.usuarios} usuarios virtuales, {args.duracion:.0f}s por URL, rutas: {', '.join(rutas)}\n")
+
+    reportes = []
+    for url in args.url:
+        url = url.rstrip("/")
+        print(f"Midiendo {url} ...")
+        reportes.append(medir(url, args, rutas))
+
+    print(f"\n{'URL':40} {'ok':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  errores")
+    for r in reportes:
+        print(
+            f"{r['url']:40} {r['ok']:8d} {r['rps']:9.1f} {formato_ms(r['p50'])} "
+            f"{formato_ms(r['p95'])} {formato_ms(r['p99'])}  {r['errores'] or '-'}"
+        )
+
+    if len(reportes) > 1 and reportes[0]["rps"]:
+        base = reportes[0]
+        for r in reportes[1:]:
+            print(f"{r['url']} atiende {r['rps'] / base['rps']:.2f}x las peticiones por segundo de {base['url']}")
+
+
+if __name__ == "__main__":
+    main()
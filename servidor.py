@@ -0,0 +1,239 @@
+"""
+Servidor de producción: varios procesos (prefork) con green threads de eventlet.
+
+    REDIS_URL=redis://... python servidor.py --workers 4 --puerto 5000
+    REDIS_URL=redis://... python servidor.py --modo hilos --workers 4   # workers con hilos
+    python servidor.py --modo hilos --workers 1     # un solo proceso, sin Redis
+
+El maestro prepara la base de datos una sola vez (flask --app app inicializar),
+abre el socket y crea los workers; si alguno muere lo reemplaza. El maestro no
+importa la aplicación: cada worker aplica monkey_patch antes de importarla, así
+que no hereda conexiones ni hilos de otro proceso. Sin fork (Windows) corre un
+solo worker en el mismo proceso.
+
+Varios workers (o el modo eventlet) exigen REDIS_URL: sin Redis la cache BI, la
+versión de catálogos, la marca de escritura para la réplica y el límite de
+intentos de login viven en la memoria de cada proceso y no se comparten.
+
+Con SIGTERM/SIGINT cada worker deja de aceptar conexiones, termina las
+peticiones en curso (hasta --timeout-gracia segundos) y detiene el despachador
+del outbox antes de salir.
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de producción de alta de colaboradores")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--puerto", type=int, default=int(os.environ.get("PORT", 5000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 2)))
+    parser.add_argument("--modo", choices=("eventlet", "hilos"), default="eventlet")
+    parser.add_argument(
+        "--conexiones", type=int, default=200,
+        help="Peticiones simultáneas por worker en modo eventlet (green threads)"
+    )
+    parser.add_argument("--log-accesos", action="store_true", help="Una línea por petición en stderr")
+    parser.add_argument(
+        "--timeout-gracia", type=float, default=30,
+        help="Segundos que un worker espera las peticiones en curso al detenerse"
+    )
+    parser.add_argument(
+        "--sin-inicializar", action="store_true",
+        help="No preparar la base de datos (ya se corrió flask --app app inicializar)"
+    )
+    return parser.parse_args(argv)
+
+
+def preparar_base_datos():
+    """Inicialización única en un proceso aparte, antes de crear los workers."""
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "inicializar"], cwd=BASE_DIR, check=True)
+
+
+def abrir_socket(host, puerto):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, puerto))
+    sock.listen(1024)
+    return sock
+
+
+def validar_entorno(args):
+    """Regresa el error que impide arrancar, o None."""
+    if (args.workers > 1 or args.modo == "eventlet") and not os.environ.get("REDIS_URL"):
+        return (
+            "REDIS_URL es obligatorio con --workers > 1 o --modo eventlet: sin Redis la cache, "
+            "sus invalidaciones y el límite de login no se comparten entre procesos. "
+            "Para un solo proceso sin Redis usar --modo hilos --workers 1."
+        )
+    return None
+
+
+def atender(sock, args):
+    """
+    Cuerpo de un worker: atiende peticiones en el socket compartido. Con
+    SIGTERM/SIGINT deja de aceptar, espera las peticiones en curso y sale.
+    """
+    detener = False
+
+    def _al_detener(signum, frame):
+        # Solo marca (sin locks, que con eventlet son green): el cierre se hace fuera
+        nonlocal detener
+        detener = True
+
+    if args.modo == "eventlet":
+        import eventlet
+        eventlet.monkey_patch()
+        import eventlet.wsgi
+        from wsgi import app
+        from app import detener_proceso
+
+        servidor = eventlet.spawn(
+            eventlet.wsgi.server,
+            eventlet.greenio.GreenSocket(sock),
+            app,
+            max_size=args.conexiones,
+            log_output=args.log_accesos
+        )
+        for senal in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(senal, _al_detener)
+
+        while not detener and not servidor.dead:
+            eventlet.sleep(0.5)
+        # SystemExit en el accept: el servidor deja de aceptar y espera sus green threads
+        servidor.kill(SystemExit)
+        with eventlet.Timeout(args.timeout_gracia, False):
+            servidor.wait()
+    else:
+        from werkzeug.serving import make_server
+        from wsgi import app
+        from app import detener_proceso
+
+        servidor = make_server(args.host, args.puerto, app, threaded=True, fd=sock.fileno())
+        # Hilos no daemon: server_close() espera las peticiones en curso
+        servidor.daemon_threads = False
+        servidor.block_on_close = True
+        for senal in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(senal, _al_detener)
+
+        hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+        hilo.start()
+        while not detener and hilo.is_alive():
+            time.sleep(0.5)
+        servidor.shutdown()
+        cierre = threading.Thread(target=servidor.server_close, daemon=True)
+        cierre.start()
+        cierre.join(args.timeout_gracia)
+
+    detener_proceso(timeout=args.timeout_gracia)
+
+
+class Detener(Exception):
+    pass
+
+
+def _detener(signum, frame):
+    raise Detener()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    error = validar_entorno(args)
+    if error:
+        sys.exit(error)
+
+    # La recomendación de tamaño del pool (POOL_AJUSTE) se acota a la concurrencia por
+    # worker y reparte max_connections entre los workers (con varios servidores,
+    # fijar POOL_PROCESOS al total)
+    if args.modo == "eventlet":
+        os.environ.setdefault("POOL_CONCURRENCIA_SERVIDOR", str(args.conexiones))
+    os.environ.setdefault("POOL_PROCESOS", str(args.workers))
+
+    if not args.sin_inicializar:
+        preparar_base_datos()
+
+    sock = abrir_socket(args.host, args.puerto)
+    print(f"Escuchando en http://{args.host}:{args.puerto} ({args.modo}, {args.workers} workers)")
+
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        atender(sock, args)
+        return
+
+    workers = {}
+    senales = {signal.SIGTERM, signal.SIGINT}
+
+    def crear_worker():
+        # Señales bloqueadas durante el fork: el hijo no debe ejecutar el manejador del maestro
+        signal.pthread_sigmask(signal.SIG_BLOCK, senales)
+        pid = os.fork()
+        if pid == 0:
+            for senal in senales:
+                signal.signal(senal, signal.SIG_DFL)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, senales)
+            codigo = 1
+            try:
+                atender(sock, args)
+                codigo = 0
+            finally:
+                os._exit(codigo)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, senales)
+        workers[pid] = time.monotonic()
+
+    signal.signal(signal.SIGTERM, _detener)
+    signal.signal(signal.SIGINT, _detener)
+
+    try:
+        for _ in range(args.workers):
+            crear_worker()
+
+        while True:
+            pid, estado = os.wait()
+            inicio = workers.pop(pid, None)
+            if inicio is None:
+                continue
+            print(f"Worker {pid} terminó (estado {estado}); iniciando reemplazo")
+            # Evita un ciclo de forks si el worker falla al arrancar
+            if time.monotonic() - inicio < 1:
+                time.sleep(1)
+            crear_worker()
+    except Detener:
+        print("Deteniendo workers...")
+    finally:
+        # Una segunda señal no debe interrumpir la espera de los workers
+        for senal in senales:
+            signal.signal(senal, signal.SIG_IGN)
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        # Cada worker termina sus peticiones; al que exceda la gracia se le mata
+        limite = time.monotonic() + args.timeout_gracia + 10
+        pendientes = set(workers)
+        while pendientes and time.monotonic() < limite:
+            for pid in list(pendientes):
+                try:
+                    if os.waitpid(pid, os.WNOHANG)[0]:
+                        pendientes.discard(pid)
+                except ChildProcessError:
+                    pendientes.discard(pid)
+            time.sleep(0.1)
+        for pid in pendientes:
+            print(f"Worker {pid} no terminó a tiempo; se mata")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Telemetría del pool de conexiones de SQLAlchemy.
+
+Escucha los eventos del pool (connect, checkout, checkin, close, invalidate) para
+llevar conexiones en uso/libres, overflow, reciclajes y fallos de pre-ping. La
+espera del checkout no tiene evento propio: la mide QueuePoolMedido alrededor de
+connect(), incluyendo la cola, la creación de la conexión y el pre-ping.
+
+Con las muestras de concurrencia observada se recomienda un pool_size /
+max_overflow acorde a la carga real, acotado por la concurrencia del servidor y
+por el max_connections de la BD repartido entre todos los procesos. El tamaño se
+aplica en la configuración del despliegue, no en caliente: así todos los workers
+quedan iguales y el ajuste sobrevive a un reinicio.
+"""
+import math
+import threading
+import time
+import weakref
+
+from sqlalchemy import event
+from sqlalchemy.exc import DisconnectionError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Límites superiores (ms) de las cubetas del histograma de espera de checkout
+CUBETAS_ESPERA_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class QueuePoolMedido(QueuePool):
+    """QueuePool que reporta a su telemetría cuánto tarda cada checkout y los timeouts."""
+
+    telemetria = None
+
+    def connect(self):
+        if self.telemetria is None:
+            return super().connect()
+
+        inicio = time.perf_counter()
+        try:
+            conexion = super().connect()
+        except PoolTimeoutError:
+            self.telemetria.registrar_timeout((time.perf_counter() - inicio) * 1000)
+            raise
+        self.telemetria.registrar_espera((time.perf_counter() - inicio) * 1000)
+        return conexion
+
+    def recreate(self):
+        # engine.dispose() recrea el pool: el nuevo conserva la telemetría
+        nuevo = super().recreate()
+        nuevo.telemetria = self.telemetria
+        return nuevo
+
+
+class Histograma:
+    """Histograma de cubetas fijas; los percentiles son el límite de la cubeta."""
+
+    def __init__(self, cubetas):
+        self.cubetas = tuple(cubetas)
+        self.conteos = [0] * (len(self.cubetas) + 1)  # la última es "mayor al máximo"
+        self.total = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    def registrar(self, valor):
+        indice = 0
+        while indice < len(self.cubetas) and valor > self.cubetas[indice]:
+            indice += 1
+        self.conteos[indice] += 1
+        self.total += 1
+        self.suma += valor
+        self.maximo = max(self.maximo, valor)
+
+    def percentil(self, p):
+        if not self.total:
+            return None
+        objetivo = math.ceil(self.total * p / 100)
+        acumulado = 0
+        for indice, conteo in enumerate(self.conteos):
+            acumulado += conteo
+            if acumulado >= objetivo:
+                return self.cubetas[indice] if indice < len(self.cubetas) else self.maximo
+        return self.maximo
+
+    def resumen(self):
+        etiquetas = [f"<={c}" for c in self.cubetas] + [f">{self.cubetas[-1]}"]
+        return {
+            "total": self.total,
+            "promedio": round(self.suma / self.total, 2) if self.total else None,
+            "maximo": round(self.maximo, 2),
+            "p50": self.percentil(50),
+            "p95": self.percentil(95),
+            "p99": self.percentil(99),
+            "cubetas": dict(zip(etiquetas, self.conteos))
+        }
+
+
+class TelemetriaPool:
+    """Métricas de un pool instrumentado con instrumentar(engine)."""
+
+    def __init__(self, nombre, recycle=-1):
+        self.nombre = nombre
+        self.recycle = recycle
+        self.engine = None
+        self._lock = threading.Lock()
+        # Registros cuya conexión se cerró por edad; si el mismo registro vuelve
+        # a conectar fue un reciclaje (dispose y el overflow descartan el registro)
+        self._cerradas_por_edad = weakref.WeakKeyDictionary()
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Descarta las muestras acumuladas."""
+        with self._lock:
+            self.desde = time.time()
+            self.espera_ms = Histograma(CUBETAS_ESPERA_MS)
+            # concurrencia[n] = checkouts que encontraron n conexiones en uso (incluida la suya)
+            self.concurrencia = {}
+            self.pico_en_uso = 0
+            self.contadores = {
+                "checkouts": 0,
+                "timeouts": 0,
+                "conexiones_creadas": 0,
+                "conexiones_cerradas": 0,
+                "reciclajes": 0,
+                "invalidaciones": 0,
+                "fallos_pre_ping": 0
+            }
+            self.ultimo_error = None
+
+    @property
+    def pool(self):
+        return self.engine.pool if self.engine is not None else None
+
+    def instrumentar(self, engine):
+        """Registra los eventos en el engine (sobreviven a engine.dispose())."""
+        self.engine = engine
+        if isinstance(engine.pool, QueuePoolMedido):
+            engine.pool.telemetria = self
+        event.listen(engine, "connect", self._al_conectar)
+        event.listen(engine, "checkout", self._al_checkout)
+        event.listen(engine, "close", self._al_cerrar)
+        event.listen(engine, "invalidate", self._al_invalidar)
+        return self
+
+    # -------- eventos del pool --------
+    def _al_conectar(self, dbapi_connection, connection_record):
+        self._incrementar("conexiones_creadas")
+        with self._lock:
+            reciclada = self._cerradas_por_edad.pop(connection_record, False)
+        if reciclada:
+            self._incrementar("reciclajes")
+
+    def _al_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        en_uso = self.pool.checkedout() if hasattr(self.pool, "checkedout") else 1
+        with self._lock:
+            self.contadores["checkouts"] += 1
+            self.concurrencia[en_uso] = self.concurrencia.get(en_uso, 0) + 1
+            self.pico_en_uso = max(self.pico_en_uso, en_uso)
+
+    def _al_cerrar(self, dbapi_connection, connection_record):
+        self._incrementar("conexiones_cerradas")
+        # pool_recycle cierra la conexión en el checkout cuando superó su edad y
+        # reconecta el mismo registro; se cuenta al reconectar (_al_conectar)
+        if connection_record is not None and self.recycle > -1 \
+                and time.time() - connection_record.starttime > self.recycle:
+            with self._lock:
+                self._cerradas_por_edad[connection_record] = True
+
+    def _al_invalidar(self, dbapi_connection, connection_record, exception):
+        self._incrementar("invalidaciones")
+        # El pre-ping fallido invalida la conexión con un DisconnectionError
+        if isinstance(exception, DisconnectionError):
+            self._incrementar("fallos_pre_ping")
+        if exception is not None:
+            with self._lock:
+                self.ultimo_error = f"{type(exception).__name__}: {exception}"
+
+    # -------- llamadas desde QueuePoolMedido --------
+    def registrar_espera(self, ms):
+        with self._lock:
+            self.espera_ms.registrar(ms)
+
+    def registrar_timeout(self, ms):
+        with self._lock:
+            self.contadores["timeouts"] += 1
+            self.espera_ms.registrar(ms)
+            self.ultimo_error = f"Timeout de checkout tras {ms:.0f} ms"
+
+    def _incrementar(self, clave):
+        with self._lock:
+            self.contadores[clave] += 1
+
+    # -------- lectura --------
+    def estado_pool(self):
+        """Gauges actuales: tamaño configurado, conexiones en uso, libres y en overflow."""
+        pool = self.pool
+        if not hasattr(pool, "checkedout"):
+            return {"tipo": type(pool).__name__ if pool is not None else None}
+        return {
+            "tipo": type(pool).__name__,
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+            "en_uso": pool.checkedout(),
+            "libres": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0)
+        }
+
+    def percentil_concurrencia(self, p):
+        with self._lock:
+            muestras = sorted(self.concurrencia.items())
+            total = sum(self.concurrencia.values())
+        if not total:
+            return 0
+        objetivo = math.ceil(total * p / 100)
+        acumulado = 0
+        for en_uso, conteo in muestras:
+            acumulado += conteo
+            if acumulado >= objetivo:
+                return en_uso
+        return muestras[-1][0]
+
+    def metricas(self):
+        with self._lock:
+            datos = {
+                "pool": self.nombre,
+                "desde": self.desde,
+                "contadores": dict(self.contadores),
+                "espera_checkout_ms": self.espera_ms.resumen(),
+                "pico_en_uso": self.pico_en_uso,
+                "ultimo_error": self.ultimo_error
+            }
+        datos["estado"] = self.estado_pool()
+        datos["concurrencia_p95"] = self.percentil_concurrencia(95)
+        return datos
+
+    # -------- dimensionamiento --------
+    def recomendar(self, muestras_minimas=200, concurrencia_servidor=None, espera_aceptable_ms=100,
+                   procesos=1, max_conexiones=None, fraccion_conexiones=0.8):
+        """
+        Propone pool_size/max_overflow por proceso a partir de la concurrencia
+        observada: pool_size cubre el p95 con 25% de margen y el overflow cubre
+        el pico. Si hubo timeouts o esperas altas, el total crece al menos 50%.
+        El total nunca supera la concurrencia del servidor (hilos o green threads
+        por proceso) ni su parte de max_conexiones: `procesos` pools iguales
+        comparten fraccion_conexiones del límite de la BD (el resto queda para
+        administración, réplicas y tareas programadas).
+        """
+        estado = self.estado_pool()
+        if "pool_size" not in estado:
+            return {"recomendacion": None, "motivo": f"Pool {estado['tipo']} sin tamaño configurable"}
+
+        with self._lock:
+            checkouts = self.contadores["checkouts"]
+            timeouts = self.contadores["timeouts"]
+            espera_p95 = self.espera_ms.percentil(95)
+            pico = self.pico_en_uso
+
+        actual = {"pool_size": estado["pool_size"], "max_overflow": estado["max_overflow"]}
+        if checkouts < muestras_minimas:
+            return {
+                "actual": actual,
+                "recomendacion": None,
+                "motivo": f"Muestras insuficientes ({checkouts} de {muestras_minimas} checkouts)"
+            }
+
+        p95 = self.percentil_concurrencia(95)
+        pool_size = max(2, math.ceil(p95 * 1.25))
+        total = max(pool_size + 2, math.ceil(pico * 1.25))
+
+        motivos = [f"concurrencia p95={p95}, pico={pico}"]
+        saturado = timeouts > 0 or (espera_p95 or 0) > espera_aceptable_ms
+        if saturado:
+            total = max(total, math.ceil((actual["pool_size"] + actual["max_overflow"]) * 1.5))
+            motivos.append(f"saturación: {timeouts} timeouts, espera p95={espera_p95} ms")
+
+        if concurrencia_servidor:
+            total = min(total, concurrencia_servidor)
+            pool_size = min(pool_size, total)
+            motivos.append(f"tope por concurrencia del servidor={concurrencia_servidor}")
+
+        procesos = max(procesos or 1, 1)
+        limite = None
+        if max_conexiones:
+            limite = max(math.floor(max_conexiones * fraccion_conexiones / procesos), 1)
+            if total > limite:
+                total = limite
+                pool_size = min(pool_size, total)
+                motivos.append(
+                    f"tope por max_connections={max_conexiones} entre {procesos} procesos={limite}"
+                )
+
+        total_actual = actual["pool_size"] + actual["max_overflow"]
+        return {
+            "actual": actual,
+            "recomendacion": {"pool_size": pool_size, "max_overflow": max(total - pool_size, 0)},
+            "conexiones": {
+                "procesos": procesos,
+                "max_conexiones_bd": max_conexiones,
+                "limite_por_proceso": limite,
+                "total_actual": total_actual * procesos,
+                "total_recomendado": total * procesos,
+                "actual_excede_limite": bool(limite and total_actual > limite)
+            },
+            "motivo": "; ".join(motivos)
+        }
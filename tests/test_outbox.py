@@ -0,0 +1,181 @@
+"""
+Pruebas del outbox de notificaciones contra un webhook local (http.server).
+
+    python -m pytest tests
+
+La BD es SQLite en memoria; el webhook es un servidor en 127.0.0.1 que
+responde con el código que pida cada prueba y cuenta las llamadas recibidas.
+"""
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as aplicacion  # noqa: E402
+from app import NotificacionOutbox, SessionLocal, get_db  # noqa: E402
+from cliente_http import ClienteHTTP  # noqa: E402
+
+
+class WebhookPrueba(ThreadingHTTPServer):
+    """Responde `codigo` a cada POST y guarda los cuerpos recibidos."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ManejadorWebhook)
+        self.codigo = 202
+        self.recibidos = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/webhook"
+
+
+class ManejadorWebhook(BaseHTTPRequestHandler):
+    def do_POST(self):
+        cuerpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.recibidos.append(json.loads(cuerpo))
+        self.send_response(self.server.codigo)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def db_prueba():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    NotificacionOutbox.__table__.create(engine)
+    bind_original = SessionLocal.kw["bind"]
+    SessionLocal.configure(bind=engine)
+    yield engine
+    SessionLocal.configure(bind=bind_original)
+    engine.dispose()
+
+
+@pytest.fixture
+def webhook(monkeypatch):
+    servidor = WebhookPrueba()
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+
+    monkeypatch.setitem(aplicacion.app.config, "WEBHOOK_URL", servidor.url)
+    monkeypatch.setitem(aplicacion.app.config, "NOTIFICACIONES_DIGEST", False)
+    monkeypatch.setitem(aplicacion.app.config, "NOTIFICACIONES_MAX_INTENTOS", 3)
+    # Cliente nuevo por prueba: el circuito no arrastra fallos de otras pruebas
+    monkeypatch.setattr(aplicacion, "cliente_webhooks", ClienteHTTP(
+        timeouts={"teams": 5},
+        umbral_fallos=2,
+        enfriamiento=60
+    ))
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def encolar(tipo="alta", **campos):
+    payload = {"titulo": "Alta", "mensaje": "Colaborador de prueba"}
+    with get_db() as db:
+        notificacion = NotificacionOutbox(tipo=tipo, payload=json.dumps(payload), **campos)
+        db.add(notificacion)
+        db.flush()
+        return notificacion.id
+
+
+def leer(notificacion_id):
+    with get_db() as db:
+        notificacion = db.get(NotificacionOutbox, notificacion_id)
+        db.expunge(notificacion)
+        return notificacion
+
+
+def vencer(notificacion_id):
+    """Adelanta el reintento programado para no esperar el backoff."""
+    with get_db() as db:
+        db.get(NotificacionOutbox, notificacion_id).proximo_intento = datetime.now() - timedelta(seconds=1)
+
+
+def test_respuesta_2xx_marca_enviado(db_prueba, webhook):
+    notificacion_id = encolar()
+
+    assert aplicacion.procesar_outbox() == {"enviado": 1}
+
+    notificacion = leer(notificacion_id)
+    assert notificacion.estado == "enviado"
+    assert notificacion.intentos == 1
+    assert notificacion.enviado_en is not None
+    assert notificacion.ultimo_error is None
+    assert webhook.recibidos == [{"titulo": "Alta", "mensaje": "Colaborador de prueba"}]
+
+
+def test_respuesta_5xx_reprograma_y_luego_fallido(db_prueba, webhook):
+    # Un umbral alto para que el circuito no intervenga en esta prueba
+    aplicacion.cliente_webhooks.umbral_fallos = 10
+    webhook.codigo = 500
+    notificacion_id = encolar()
+
+    antes = datetime.now()
+    assert aplicacion.procesar_notificacion(notificacion_id) == "pendiente"
+    notificacion = leer(notificacion_id)
+    assert notificacion.intentos == 1
+    assert notificacion.proximo_intento >= antes + timedelta(seconds=aplicacion.calcular_backoff(1))
+    assert notificacion.ultimo_error.startswith("500")
+
+    # Mientras no vence el backoff no se vuelve a enviar
+    assert aplicacion.procesar_outbox() == {}
+    assert aplicacion.procesar_notificacion(notificacion_id) is None
+    assert len(webhook.recibidos) == 1
+
+    vencer(notificacion_id)
+    assert aplicacion.procesar_notificacion(notificacion_id) == "pendiente"
+    vencer(notificacion_id)
+    assert aplicacion.procesar_notificacion(notificacion_id) == "fallido"
+
+    notificacion = leer(notificacion_id)
+    assert notificacion.estado == "fallido"
+    assert notificacion.intentos == 3
+    assert len(webhook.recibidos) == 3
+
+    # Dead-letter: ya no se toma aunque venza el reintento
+    vencer(notificacion_id)
+    assert aplicacion.procesar_notificacion(notificacion_id) is None
+
+
+def test_circuito_abierto_pospone_sin_contar_intento(db_prueba, webhook):
+    webhook.codigo = 503
+    primera = encolar(tipo="baja")
+    segunda = encolar(tipo="baja")
+    tercera = encolar(tipo="baja")
+
+    # Dos fallos seguidos abren el circuito; la tercera ni se intenta
+    assert aplicacion.procesar_outbox() == {"pendiente": 2, "pospuestas": 1}
+    assert aplicacion.cliente_webhooks.circuito_abierto("teams")
+    assert len(webhook.recibidos) == 2
+    assert leer(tercera).intentos == 0
+
+    # Procesada directamente con el circuito abierto: se pospone el enfriamiento
+    antes = datetime.now()
+    assert aplicacion.procesar_notificacion(tercera) == "pendiente"
+    notificacion = leer(tercera)
+    assert notificacion.intentos == 0
+    assert notificacion.proximo_intento > antes + timedelta(seconds=30)
+    assert notificacion.ultimo_error.startswith("Circuito abierto")
+    assert len(webhook.recibidos) == 2
+
+    assert leer(primera).intentos == 1
+    assert leer(segunda).intentos == 1
+
+
+def test_proximo_intento_futuro_no_se_envia(db_prueba, webhook):
+    notificacion_id = encolar(proximo_intento=datetime.now() + timedelta(minutes=5))
+
+    assert aplicacion.procesar_notificacion(notificacion_id) is None
+    assert leer(notificacion_id).estado == "pendiente"
+    assert webhook.recibidos == []
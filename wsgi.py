@@ -0,0 +1,18 @@
+"""
+Punto de entrada WSGI para producción.
+
+    flask --app app inicializar      # una vez por despliegue
+    python servidor.py --workers 4   # o cualquier servidor WSGI, p. ej.:
+    gunicorn -k eventlet -w 4 -b 0.0.0.0:5000 wsgi:app
+
+Cada proceso que importa este módulo inicia su propio estado en memoria
+(índices y despachador del outbox); la base de datos se prepara aparte. No
+usar --preload: los hilos iniciados en el maestro no pasan a los workers.
+
+Con más de un worker se requiere REDIS_URL (cache, invalidaciones y límite de
+login compartidos). Al detener un worker fuera de servidor.py, llamar a
+detener_proceso() (p. ej. en el hook worker_exit de gunicorn).
+"""
+from app import app, iniciar_proceso, detener_proceso  # noqa: F401
+
+iniciar_proceso()